@@ -20,3 +20,5 @@ admin.site.register(CourseGroupConfig)
 admin.site.register(GeneralScheduleConfig)
 admin.site.register(Site)
 admin.site.register(CourseTeacherPreference)
+admin.site.register(ScheduleJob)
+admin.site.register(TimetableDocument)
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.utils.benchmark import compare, run_benchmark
+from api.utils.synthetic import SIZES
+
+
+class Command(BaseCommand):
+    help = 'Mide AlgorithmScheduler.generate sobre instancias sintéticas en una base de datos de prueba'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tallas', nargs='+', choices=list(SIZES), default=None, help='Tallas a medir (por defecto todas)')
+        parser.add_argument('--seed', type=int, default=0, help='Semilla de las instancias y del scheduler')
+        parser.add_argument('--starts', type=int, default=1, help='Pasadas multi-start por corrida')
+        parser.add_argument('--sin-memoria', action='store_true', help='No medir memoria pico (evita la corrida extra con tracemalloc)')
+        parser.add_argument('--perfil', action='store_true', help='Incluir en los resultados los tiempos por fase y contadores')
+        parser.add_argument('--salida', default='scheduler_benchmark.json', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--comparar', default=None, help='Línea base JSON contra la que buscar regresiones')
+        parser.add_argument('--tolerancia', type=float, default=0.2, help='Margen relativo para tiempo y memoria (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        # Nunca sobre la base real: se crea y destruye una base de prueba
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            current = run_benchmark(
+                sizes=options['tallas'], seed=options['seed'], starts=options['starts'],
+                memory=not options['sin_memoria'], log=self._log, profile=options['perfil'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+        if baseline is not None:
+            regressions = compare(current, baseline, options['tolerancia'])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.WARNING(f"  {regression}"))
+                raise CommandError(f"{len(regressions)} regresiones frente a {options['comparar']}")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones frente a la línea base."))
+
+    def _log(self, name, result):
+        memory = f" | {result['peak_kb']} KB" if 'peak_kb' in result else ''
+        self.stdout.write(
+            f"{name}: {result['placed']}/{result['groups']} grupos | {result['seconds']} s | "
+            f"{result['queries']} consultas{memory} (construcción {result['build_seconds']} s)"
+        )
@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import AcademicPeriod
+from api.utils import exports
+
+
+class Command(BaseCommand):
+    help = 'Exporta el horario guardado de un periodo (y sus grupos no asignados) a XLSX o CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', type=int, required=True, help='ID del periodo académico')
+        parser.add_argument('--por', choices=list(exports.SHEET_KEYS), default='cycle', help='Una hoja por ciclo, docente o aula (XLSX)')
+        parser.add_argument('--formato', choices=['xlsx', 'csv'], default=None, help='Por defecto se deduce de la extensión de --salida')
+        parser.add_argument('--salida', default=None, help='Archivo de salida (por defecto horario_<periodo>.<formato>)')
+        parser.add_argument('--no-asignados', action='store_true', help='Exportar solo los grupos sin sesiones')
+
+    def handle(self, *args, **options):
+        period = options['periodo']
+        if not AcademicPeriod.objects.filter(pk=period).exists():
+            raise CommandError('Periodo no encontrado')
+
+        output = options['formato']
+        path = options['salida']
+        if output is None:
+            extension = os.path.splitext(path or '')[1].lower().lstrip('.')
+            output = extension if extension in ('xlsx', 'csv') else 'xlsx'
+        if path is None:
+            prefix = 'no_asignados' if options['no_asignados'] else 'horario'
+            path = f"{prefix}_{period}.{output}"
+
+        started = time.perf_counter()
+        if output == 'csv':
+            lines = exports.unassigned_csv(period) if options['no_asignados'] else exports.timetable_csv(period, options['por'])
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+        else:
+            try:
+                exports.write_xlsx(period, path, by=None if options['no_asignados'] else options['por'])
+            except ImportError as e:
+                raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Exportado a {os.path.abspath(path)} en {elapsed:.2f} s"))
@@ -4,19 +4,39 @@ from api.scheduler import OptimizationScheduler
 class Command(BaseCommand):
     help = 'Genera el horario automático usando OR-Tools'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', type=int, default=None, help='ID del periodo (por defecto, el periodo en creación de horarios)')
+        parser.add_argument('--tiempo', type=float, default=60, help='Tiempo máximo de búsqueda en segundos')
+        parser.add_argument('--workers', type=int, default=8, help='Hilos de búsqueda del solver')
+        parser.add_argument('--seed', type=int, default=None, help='Semilla del solver')
+        parser.add_argument('--perfil', nargs='?', const='perfil_horario.json', default=None, help='Guardar tiempos por fase y contadores en este JSON')
+
     def handle(self, *args, **options):
         self.stdout.write("⏳ Iniciando proceso de optimización...")
-        
+
         try:
-            scheduler = OptimizationScheduler()
+            scheduler = OptimizationScheduler(
+                period_id=options['periodo'],
+                time_limit=options['tiempo'],
+                num_workers=options['workers'],
+                seed=options['seed'],
+                profile=options['perfil'] is not None,
+            )
             self.stdout.write(f"📅 Periodo detectado: {scheduler.period}")
-            
+
             success = scheduler.solve()
-            
+
             if success:
+                report = scheduler.report
                 self.stdout.write(self.style.SUCCESS("✅ Horario generado y guardado correctamente."))
+                self.stdout.write(f"Estado: {report['status']} | Agendados: {len(report['created'])} | Sin agendar: {len(report['errors'])}")
+                for error in report['errors']:
+                    self.stdout.write(self.style.WARNING(f"  {error}"))
+                if options['perfil']:
+                    scheduler.profiler.dump(options['perfil'])
+                    self.stdout.write(f"Perfil guardado en {options['perfil']}")
             else:
                 self.stdout.write(self.style.WARNING("⚠️ No se encontró solución factible."))
-        
+
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f"❌ Error: {str(e)}"))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f"❌ Error: {str(e)}"))
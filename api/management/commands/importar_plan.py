@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Plan, School
+from api.utils.plan_import import PlanFileError, import_courses, read_plan_file
+
+
+class Command(BaseCommand):
+    help = 'Crea un plan e importa sus cursos desde la plantilla CSV o XLSX (ver docs/plan_import_instructions.md)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument('--escuela', type=int, required=True, help='ID de la escuela (School)')
+        parser.add_argument('--nombre', required=True, help='Nombre del plan')
+        parser.add_argument('--inicio', type=int, required=True, help='Año de inicio del plan')
+        parser.add_argument('--fin', type=int, default=None, help='Año de fin del plan')
+        parser.add_argument('--descripcion', default='', help='Descripción del plan')
+        parser.add_argument('--inactivo', action='store_true', help='Crear el plan como inactivo')
+
+    def handle(self, *args, **options):
+        school = School.objects.filter(pk=options['escuela']).first()
+        if school is None:
+            raise CommandError('Escuela no encontrada')
+
+        started = time.perf_counter()
+        with open(options['archivo'], 'rb') as f:
+            try:
+                rows = list(read_plan_file(f, options['archivo']))
+            except PlanFileError as e:
+                raise CommandError(str(e))
+            with transaction.atomic():
+                plan = Plan.objects.create(
+                    school=school, name=options['nombre'], description=options['descripcion'],
+                    start_year=options['inicio'], end_year=options['fin'], is_active=not options['inactivo'],
+                )
+                created, errors = import_courses(plan, rows)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Plan {plan.pk} ({plan.name}): {len(created)} cursos creados, {len(errors)} con errores en {elapsed:.1f} s"
+        ))
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f"  Fila {error['index'] + 2} ({error['code']}): {error['error']}"))
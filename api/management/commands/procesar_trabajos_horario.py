@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from api.utils.jobs import claim_next_job, run_job
+
+class Command(BaseCommand):
+    help = 'Worker que ejecuta los trabajos de generación de horarios encolados desde la API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa los trabajos pendientes y termina')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera cuando no hay trabajos')
+        parser.add_argument('--perfil', action='store_true', help='Agregar al reporte de cada trabajo los tiempos por fase y contadores')
+
+    def handle(self, *args, **options):
+        self.stdout.write("⏳ Esperando trabajos de generación de horarios...")
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f"📅 Trabajo {job.pk}: periodo {job.academic_period_id} ({job.mode})")
+            job = run_job(job, profile=options['perfil'])
+            if job.status == 'completado':
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ Trabajo {job.pk} completado: {len(job.report['created'])} agendados, {len(job.report['errors'])} sin agendar"
+                ))
+            elif job.status == 'cancelado':
+                self.stdout.write(self.style.WARNING(f"⚠️ Trabajo {job.pk} cancelado"))
+            else:
+                self.stdout.write(self.style.ERROR(f"❌ Trabajo {job.pk} falló: {job.error}"))
@@ -0,0 +1,125 @@
+"""Instrumentación por request: consultas SQL, tiempo de BD y latencia.
+
+``QueryTimingMiddleware`` cuenta las consultas de cada request con
+``connection.execute_wrapper``, agrega ``Server-Timing`` a la respuesta
+(``db`` y ``app``), registra en el logger ``api.performance`` los requests que
+pasan el presupuesto de consultas o de latencia, y acumula estadísticas por
+endpoint en ``request_stats`` (por proceso), que expone ``/api/request-stats/``.
+
+Ajustes: ``REQUEST_TIMING_ENABLED`` (por defecto True),
+``REQUEST_QUERY_BUDGET`` (consultas, por defecto 50) y
+``REQUEST_TIME_BUDGET_MS`` (por defecto 500).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('api.performance')
+
+
+class RequestStats:
+    """Estadísticas acumuladas por endpoint (método + nombre de la vista)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, elapsed_ms, queries, db_ms, over_budget):
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = self._endpoints[endpoint] = {
+                    'requests': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'max_queries': 0,
+                    'db_ms': 0.0, 'over_budget': 0,
+                }
+            entry['requests'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['queries'] += queries
+            entry['max_queries'] = max(entry['max_queries'], queries)
+            entry['db_ms'] += db_ms
+            entry['over_budget'] += over_budget
+
+    def snapshot(self):
+        """Endpoints ordenados por tiempo total, con promedios."""
+        with self._lock:
+            items = [(endpoint, dict(entry)) for endpoint, entry in self._endpoints.items()]
+        results = []
+        for endpoint, entry in sorted(items, key=lambda item: -item[1]['total_ms']):
+            n = entry['requests']
+            results.append({
+                'endpoint': endpoint,
+                'requests': n,
+                'avg_ms': round(entry['total_ms'] / n, 2),
+                'max_ms': round(entry['max_ms'], 2),
+                'avg_queries': round(entry['queries'] / n, 2),
+                'max_queries': entry['max_queries'],
+                'avg_db_ms': round(entry['db_ms'] / n, 2),
+                'over_budget': entry['over_budget'],
+            })
+        return results
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+request_stats = RequestStats()
+
+
+class _QueryCounter:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class QueryTimingMiddleware:
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+        self.time_budget_ms = getattr(settings, 'REQUEST_TIME_BUDGET_MS', 500)
+
+    def __call__(self, request):
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        db_ms = counter.seconds * 1000
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{counter.count} queries", app;dur={elapsed_ms:.1f}'
+        )
+        endpoint = self._endpoint(request)
+        over_budget = counter.count > self.query_budget or elapsed_ms > self.time_budget_ms
+        if over_budget:
+            logger.warning(
+                "%s excede el presupuesto: %d consultas (%.1f ms en BD), %.1f ms en total [%s]",
+                endpoint, counter.count, db_ms, elapsed_ms, request.get_full_path(),
+            )
+        request_stats.record(endpoint, elapsed_ms, counter.count, db_ms, over_budget)
+        return response
+
+    @staticmethod
+    def _endpoint(request):
+        match = getattr(request, 'resolver_match', None)
+        # Sin ruta (404) se agrupa todo junto para no crear una entrada por URL
+        view = (match.view_name or match._func_path) if match else 'sin_ruta'
+        return f"{request.method} {view}"
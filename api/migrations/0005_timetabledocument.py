@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_schedulejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('teacher', 'Docente'), ('room', 'Aula'), ('cycle', 'Ciclo')], max_length=10)),
+                ('key', models.PositiveIntegerField(help_text='Id del docente o aula, o número de ciclo')),
+                ('data', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('academic_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timetable_documents', to='api.academicperiod')),
+            ],
+            options={
+                'unique_together': {('academic_period', 'kind', 'key')},
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models, transaction
+from django.db import models
 from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
@@ -294,7 +294,31 @@ class Schedule(models.Model):
         return f"{self.course.name} ({self.get_session_type_display()}) - {self.group.code} - {room_name}"
 
 
-# --- 7. SOLICITUDES DE CAMBIO DE HORARIO ---
+# --- 7. HORARIOS MATERIALIZADOS (DOCENTE, AULA Y CICLO) ---
+
+class TimetableDocument(models.Model):
+    """Horario ya armado de un docente, aula o ciclo en un periodo (se lee con una sola consulta).
+
+    Lo mantienen la reconstrucción masiva tras cada corrida del scheduler y, para
+    ediciones puntuales, las señales de Schedule al confirmar la transacción
+    (api/utils/timetables.py).
+    """
+    KIND_CHOICES = [("teacher", "Docente"), ("room", "Aula"), ("cycle", "Ciclo")]
+
+    academic_period = models.ForeignKey('AcademicPeriod', on_delete=models.CASCADE, related_name='timetable_documents')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.PositiveIntegerField(help_text="Id del docente o aula, o número de ciclo")
+    data = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('academic_period', 'kind', 'key'),)
+
+    def __str__(self):
+        return f"{self.academic_period} - {self.get_kind_display()} {self.key}"
+
+
+# --- 8. SOLICITUDES DE CAMBIO DE HORARIO ---
 
 class ScheduleChangeRequest(models.Model):
     REQUEST_TYPES = [
@@ -325,27 +349,53 @@ class ScheduleChangeRequest(models.Model):
         return f"Solicitud {self.get_request_type_display()} por {self.requested_by} - Estado: {self.get_status_display()}"
 
 
-# --- 7. SEÑALES (SIGNALS) ---
+# --- 9. TRABAJOS DE GENERACIÓN DE HORARIOS ---
+
+class ScheduleJob(models.Model):
+    """Corrida de AlgorithmScheduler encolada y ejecutada por un worker (procesar_trabajos_horario)."""
+    MODE_CHOICES = [
+        ("completo", "Completo"),
+        ("incremental", "Incremental"),
+    ]
+    STATUS_CHOICES = [
+        ("pendiente", "Pendiente"),
+        ("en_proceso", "En proceso"),
+        ("completado", "Completado"),
+        ("fallido", "Fallido"),
+        ("cancelado", "Cancelado"),
+    ]
+
+    academic_period = models.ForeignKey('AcademicPeriod', on_delete=models.CASCADE, related_name='schedule_jobs')
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default="completo")
+    starts = models.PositiveIntegerField(default=1, help_text="Pasadas con semillas distintas (multi-start)")
+    seed = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pendiente")
+    # Ejemplo: {"total": 120, "processed": 40, "cycles": {"9": {"total": 10, "processed": 10, "placed": 9}}}
+    progress = models.JSONField(default=dict, blank=True)
+    report = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    cancel_requested = models.BooleanField(default=False)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='schedule_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Lo renueva el worker con cada escritura de progreso; si se atrasa, el worker murió
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Trabajo {self.pk} - {self.academic_period} ({self.get_status_display()})"
 
-@receiver(pre_save, sender=CourseGroupConfig)
-def courseconfig_pre_save(sender, instance, **kwargs):
-    if not instance.pk:
-        instance._old_num_groups = 0
-        return
-    try:
-        old = CourseGroupConfig.objects.get(pk=instance.pk)
-        instance._old_num_groups = getattr(old, 'num_groups', 0)
-    except CourseGroupConfig.DoesNotExist:
-        instance._old_num_groups = 0
+
+# --- 10. SEÑALES (SIGNALS) ---
 
 @receiver(post_save, sender=CourseGroupConfig)
 def courseconfig_post_save(sender, instance, created, **kwargs):
-    new = instance.num_groups
-    course_offering = instance.course_offering
-    with transaction.atomic():
-        CourseGroup.objects.filter(course_offering=course_offering).delete()
-        for i in range(1, new + 1):
-            CourseGroup.objects.create(course_offering=course_offering, code=str(i))
+    # Solo se agregan o quitan los grupos de diferencia; los demás conservan sus horarios
+    from api.utils.offerings import reconcile_groups
+    reconcile_groups(instance.course_offering_id, instance.num_groups)
 
 @receiver(post_delete, sender=CourseGroupConfig)
 def courseconfig_post_delete(sender, instance, **kwargs):
@@ -357,51 +407,35 @@ def create_course_offerings_for_period(sender, instance, created, **kwargs):
     if not created:
         return
 
-    # Solo dos planes activos
-    planes = Plan.objects.filter(is_active=True).order_by('start_year')
-    if planes.count() != 2:
-        return  # No se puede abrir cursos si no hay exactamente dos planes activos
-    plan_antiguo, plan_nuevo = planes[0], planes[1]
-
-    # Calcular ciclo actual del plan nuevo
-    años = instance.year - plan_nuevo.start_year
-    ciclo_nuevo = años * 2 + (1 if instance.period == 'I' else 2)
-    max_ciclo = Course.objects.filter(plan=plan_nuevo).aggregate(models.Max('cycle'))['cycle__max'] or 10
-
-    # Abrir cursos del ciclo actual del plan nuevo
-    cursos_nuevo = Course.objects.filter(plan=plan_nuevo, cycle__lte=ciclo_nuevo)
-    # Abrir cursos del plan antiguo que no están cubiertos por el plan nuevo
-    ciclos_antiguos = [c for c in range(1, max_ciclo+1) if c > ciclo_nuevo]
-    cursos_antiguo = Course.objects.filter(plan=plan_antiguo, cycle__in=ciclos_antiguos)
-
-    # Abrir cursos de nivelación del plan antiguo solo para el ciclo más alto que ya no se dicta normalmente
-    ciclo_nivelacion = ciclo_nuevo - 1 if ciclo_nuevo > 1 else None
-    cursos_nivelacion = Course.objects.filter(plan=plan_antiguo, cycle=ciclo_nivelacion)
-
-    # Crear ofertas para cursos normales
-    for curso in list(cursos_nuevo) + list(cursos_antiguo):
-        offering, _ = CourseOffering.objects.get_or_create(
-            course=curso,
-            academic_period=instance,
-            offering_type="normal",
-            defaults={'capacity': 40}
-        )
-        if not hasattr(offering, 'group_config') and not offering.groups.exists():
-            CourseGroup.objects.create(course_offering=offering, code="1")
-
-    # Crear ofertas para cursos de nivelación
-    for curso in cursos_nivelacion:
-        offering, _ = CourseOffering.objects.get_or_create(
-            course=curso,
-            academic_period=instance,
-            offering_type="nivelacion",
-            defaults={'capacity': 40}
-        )
-        if not hasattr(offering, 'group_config') and not offering.groups.exists():
-            CourseGroup.objects.create(course_offering=offering, code="1")
+    # Solo con exactamente dos planes activos se pueden abrir cursos
+    from api.utils.offerings import bootstrap_offerings, period_offering_targets
+    transition = period_offering_targets(instance)
+    if transition is None:
+        return
+    targets, plan_antiguo, ciclo_nuevo, max_ciclo = transition
+
+    # Ofertas normales y de nivelación, con su grupo por defecto, en bloque
+    bootstrap_offerings(instance, targets)
 
     # Desactivar plan antiguo si el plan nuevo ya cubre todos los ciclos
     if ciclo_nuevo >= max_ciclo:
         plan_antiguo.is_active = False
         plan_antiguo.end_year = instance.year
-        plan_antiguo.save()
\ No newline at end of file
+        plan_antiguo.save()
+
+@receiver(pre_save, sender=Schedule)
+def schedule_pre_save(sender, instance, **kwargs):
+    # Docente/aula/ciclo anteriores: sus horarios también cambian si la sesión se mueve
+    from api.utils.timetables import schedule_document_keys
+    instance._old_timetable_keys = schedule_document_keys(instance.pk) if instance.pk else set()
+
+@receiver(post_save, sender=Schedule)
+def schedule_post_save(sender, instance, using, **kwargs):
+    # Solo se anota la sesión; los documentos se refrescan una vez al confirmar la transacción
+    from api.utils.timetables import queue_schedule
+    queue_schedule(instance, getattr(instance, '_old_timetable_keys', ()), using=using)
+
+@receiver(post_delete, sender=Schedule)
+def schedule_post_delete(sender, instance, using, origin=None, **kwargs):
+    from api.utils.timetables import queue_schedule
+    queue_schedule(instance, origin=origin, using=using)
@@ -71,4 +71,28 @@ router.register(r'course-offerings-with-groups', CourseOfferingWithGroupsViewSet
 # Endpoint para listar cursos que no abrieron en tipo 'normal'
 from api.views.CoursesNotOpenedNormalViewSet import CoursesNotOpenedNormalViewSet
 router.register(r'courses-not-opened-normal', CoursesNotOpenedNormalViewSet, basename='courses-not-opened-normal')
-router.register(r'persons', PersonViewSet, basename='persons')
\ No newline at end of file
+router.register(r'persons', PersonViewSet, basename='persons')
+
+# Generación de horarios en segundo plano (encolar, progreso, reporte y cancelación)
+from api.views.ScheduleJobViewSet import ScheduleJobViewSet
+router.register(r'schedule-jobs', ScheduleJobViewSet, basename='schedule-jobs')
+
+# Horario generado (solo lectura), filtrable y agrupado por docente, aula, sede, ciclo o grupo
+from api.views.TimetableViewSet import TimetableViewSet
+router.register(r'timetable', TimetableViewSet, basename='timetable')
+
+# Horarios materializados por docente, aula o ciclo: /timetable-documents/<periodo>/<teacher|room|cycle>/<id>/
+from api.views.TimetableDocumentViewSet import TimetableDocumentViewSet
+router.register(r'timetable-documents', TimetableDocumentViewSet, basename='timetable-documents')
+
+# Solicitudes de cambio de horario y evaluación de cruces (individual y en lote de pendientes)
+from api.views.ScheduleChangeRequestViewSet import ScheduleChangeRequestViewSet
+router.register(r'schedule-change-requests', ScheduleChangeRequestViewSet, basename='schedule-change-requests')
+
+# Estadísticas de consultas y latencia por endpoint (solo administradores)
+from api.views.RequestStatsViewSet import RequestStatsViewSet
+router.register(r'request-stats', RequestStatsViewSet, basename='request-stats')
+
+# Apertura de cursos en bloque (curso, tipo y número de grupos)
+from api.views.CourseOfferingBulkOpenViewSet import CourseOfferingBulkOpenViewSet
+router.register(r'course-offerings-bulk', CourseOfferingBulkOpenViewSet, basename='course-offerings-bulk')
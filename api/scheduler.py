@@ -0,0 +1,234 @@
+"""Motor de optimización exacta para generar horarios (CP-SAT de OR-Tools).
+
+Modela las mismas restricciones duras que ``AlgorithmScheduler`` (cruces de
+docente, aula y ciclo, indisponibilidad docente, tipo y capacidad de aula y la
+política de sesión juntas/separadas) y maximiza primero la cantidad de grupos
+agendados y después las preferencias de día y docente. Si se acaba el tiempo
+devuelve la mejor solución factible encontrada.
+"""
+from collections import defaultdict
+from datetime import time
+
+from django.db import transaction
+
+from api.models import Schedule
+from api.utils.diagnostics import GroupDiagnostics
+from api.utils.occupancy import hours_mask
+from api.utils.profiling import profiled
+from api.utils.scheduler import AlgorithmScheduler
+from api.utils.timetables import rebuild_period
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # OR-Tools es opcional: solo lo necesita este motor
+    cp_model = None
+
+# Peso de agendar un grupo: domina a cualquier suma de preferencias del grupo
+PLACEMENT_WEIGHT = 1000
+
+
+class OptimizationScheduler(AlgorithmScheduler):
+    """Resuelve el periodo completo con CP-SAT en lugar de la búsqueda greedy."""
+
+    def __init__(self, period_id=None, time_limit=60, num_workers=8, seed=None, warm_start=True, profile=False):
+        super().__init__(period_id=period_id, seed=seed, profile=profile)
+        self.time_limit = time_limit
+        self.num_workers = num_workers
+        # Usar la solución greedy como pista inicial del solver
+        self.warm_start = warm_start
+        self.report = None
+
+    def _blocks(self, group):
+        """Bloques contiguos del grupo, con la misma regla que el motor greedy (``_session_blocks``)."""
+        return self._session_blocks(group.course)
+
+    def solve(self):
+        """Construye y resuelve el modelo; guarda el horario si hay solución factible."""
+        if cp_model is None:
+            raise ImportError("OptimizationScheduler requiere OR-Tools (pip install ortools).")
+        hints = {}
+        if self.warm_start:
+            self._run_search()
+            hints = self.placements
+        self._reset_state()
+        self.prepare_environment()
+        report = {'created': [], 'errors': [], 'diagnostics': [], 'seed': self.seed}
+        model, placed_vars, block_vars = self._build_model(hints, report)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = float(self.time_limit)
+        solver.parameters.num_workers = int(self.num_workers)
+        solver.parameters.random_seed = self.seed % (2 ** 31)
+        with self.profiler.phase('solver'):
+            status = solver.Solve(model)
+        report['status'] = solver.StatusName(status)
+        self.report = report
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self._attach_profile(report)
+            return False
+
+        report['objective'] = solver.ObjectiveValue()
+        for group, starts, room_segments in block_vars:
+            if not solver.Value(placed_vars[group.id]):
+                continue
+            course = group.course
+            teacher, day, start_h = next(key for key, var in starts.items() if solver.Value(var))
+            for session_type, offset, hours, rooms_vars in room_segments:
+                room_id = next(
+                    (room_id for (room_id, d, s), var in rooms_vars.items()
+                     if d == day and s == start_h and solver.Value(var)),
+                    None
+                )
+                self._pending_schedules.append(Schedule(
+                    course_id=course.id,
+                    group_id=group.id,
+                    teacher_id=teacher if course.requires_teacher else None,
+                    day_of_week=day,
+                    room_id=room_id,
+                    start_time=time(start_h + offset, 0),
+                    end_time=time(start_h + offset + hours, 0),
+                    session_type=session_type,
+                ))
+        placed_ids = {gid for gid, var in placed_vars.items() if solver.Value(var)}
+        for group in self.groups:
+            if group.id not in placed_vars:
+                continue
+            if group.id in placed_ids:
+                report['created'].append(group.label)
+            else:
+                report['errors'].append(f"No se pudo agendar: {group.label}")
+                report['diagnostics'].append(GroupDiagnostics(group.label, notes=["sin espacio factible en la mejor solución encontrada"]))
+
+        with self.profiler.phase('save'), transaction.atomic():
+            self._clear_previous_schedule()
+            self._flush_schedules()
+            rebuild_period(self.period.id)
+        report['vacant_slots'] = self._get_vacant_slots()
+        self._attach_profile(report)
+        return True
+
+    @profiled('model')
+    def _build_model(self, hints, report):
+        """Variables, restricciones y objetivo del periodo; los grupos sin docente van a ``report``."""
+        model = cp_model.CpModel()
+        last_hour = self.time_slots[-1] + 1
+        teacher_cells = defaultdict(list)
+        room_cells = defaultdict(list)
+        cycle_cells = defaultdict(list)
+        objective = []
+        placed_vars = {}
+        block_vars = []  # (group, {(docente, dia, inicio): var}, [(tipo, offset, horas, {(aula, dia, inicio): var})])
+
+        for group in self.groups:
+            course = group.course
+            blocks = self._blocks(group)
+            if not blocks:
+                report['created'].append(group.label)
+                continue
+            teachers = self._get_teacher_candidates(course)
+            if not teachers:
+                report['errors'].append(f"No se pudo agendar: {group.label}")
+                report['diagnostics'].append(GroupDiagnostics(group.label, notes=["No hay docentes preferidos asignados para este curso"]))
+                continue
+
+            placed = model.NewBoolVar(f'placed_g{group.id}')
+            placed_vars[group.id] = placed
+            objective.append(PLACEMENT_WEIGHT * placed)
+            # Un solo docente para todos los bloques del grupo
+            chosen = None
+            if teachers != [None]:
+                chosen = {t: model.NewBoolVar(f'teacher_g{group.id}_t{t}') for t in teachers}
+                model.Add(sum(chosen.values()) == placed)
+
+            for b, segments in enumerate(blocks):
+                duration = sum(hours for _, hours in segments)
+                starts = {}
+                for teacher in teachers:
+                    score_teacher = self._score_teacher(course, teacher)
+                    for day in self.days_indices:
+                        score_day = self._score_day(course, day)
+                        for start_h in self.time_slots:
+                            if start_h + duration > last_hour:
+                                continue
+                            if teacher is not None and not self.teacher_occupied.is_free(teacher, day, hours_mask(start_h, duration)):
+                                continue
+                            var = model.NewBoolVar(f'x_g{group.id}_b{b}_t{teacher}_d{day}_h{start_h}')
+                            starts[teacher, day, start_h] = var
+                            if score_day + score_teacher:
+                                objective.append((score_day + score_teacher) * var)
+                            for h in range(start_h, start_h + duration):
+                                if teacher is not None and course.requires_teacher:
+                                    teacher_cells[teacher, day, h].append(var)
+                                cycle_cells[course.cycle, day, h].append(var)
+
+                # Cada bloque se agenda una vez, con el docente elegido para el grupo
+                if chosen is not None:
+                    for teacher, teacher_var in chosen.items():
+                        model.Add(sum(v for (t, _, _), v in starts.items() if t == teacher) == teacher_var)
+                else:
+                    model.Add(sum(starts.values()) == placed)
+
+                # Un aula del tipo y capacidad requeridos por cada tramo del bloque
+                by_slot = defaultdict(list)
+                for (_, day, start_h), var in starts.items():
+                    by_slot[day, start_h].append(var)
+                room_segments = []
+                offset = 0
+                for session_type, hours in segments:
+                    room_type = self._required_room_type(course, session_type)
+                    rooms_vars = {}
+                    if room_type:
+                        rooms = self.room_index.candidates(room_type, group.capacity or 1)
+                        for (day, start_h), slot_vars in by_slot.items():
+                            options = []
+                            for room in rooms:
+                                var = model.NewBoolVar(f'r_g{group.id}_b{b}_{session_type}_r{room.id}_d{day}_h{start_h}')
+                                rooms_vars[room.id, day, start_h] = var
+                                options.append(var)
+                                for h in range(start_h + offset, start_h + offset + hours):
+                                    room_cells[room.id, day, h].append(var)
+                            model.Add(sum(options) == sum(slot_vars))
+                    room_segments.append((session_type, offset, hours, rooms_vars))
+                    offset += hours
+                block_vars.append((group, starts, room_segments))
+                self._add_hint(model, group, b, blocks, hints.get(group.id), starts, room_segments, placed, chosen)
+
+        # Sin cruces: cada docente, aula y ciclo a lo más una sesión por hora
+        for cells in (teacher_cells, room_cells, cycle_cells):
+            for cell_vars in cells.values():
+                if len(cell_vars) > 1:
+                    model.AddAtMostOne(cell_vars)
+        model.Maximize(sum(objective))
+        return model, placed_vars, block_vars
+
+    def _add_hint(self, model, group, block_idx, blocks, proposals, starts, room_segments, placed, chosen):
+        """Sugiere al solver la ubicación greedy del bloque, si coincide con su estructura."""
+        if not proposals:
+            return
+        # Sesiones greedy del grupo en orden: (tipo, dia, inicio, horas, docente, aula)
+        sessions = [
+            (alloc['type'], p['day'], alloc['start'], alloc['duration'], p['teacher'], alloc['room'])
+            for p in proposals for alloc in p['allocation']
+        ]
+        first = sum(len(segments) for segments in blocks[:block_idx])
+        block_sessions = sessions[first:first + len(blocks[block_idx])]
+        if len(block_sessions) != len(blocks[block_idx]):
+            return
+        _, day, start_h, _, teacher, _ = block_sessions[0]
+        offset = 0
+        for s_type, s_day, s_start, s_hours, _, _ in block_sessions:
+            if s_day != day or s_start != start_h + offset:
+                return  # el greedy no las dejó contiguas: no hay pista para este bloque
+            offset += s_hours
+        var = starts.get((teacher, day, start_h))
+        if var is None:
+            return
+        model.AddHint(var, 1)
+        if block_idx == 0:
+            model.AddHint(placed, 1)
+            if chosen is not None and teacher in chosen:
+                model.AddHint(chosen[teacher], 1)
+        for (_, _, _, rooms_vars), session in zip(room_segments, block_sessions):
+            room = session[5]
+            if room is not None and (room.id, day, start_h) in rooms_vars:
+                model.AddHint(rooms_vars[room.id, day, start_h], 1)
@@ -15,24 +15,10 @@ class AcademicPeriodCreateSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        from api.models import Plan, Course, CourseOffering, CourseGroup
+        from api.models import Plan
+        from api.utils.offerings import bootstrap_offerings, parity_offering_targets
         period = AcademicPeriod.objects.create(**validated_data)
-        # Buscar plan activo
+        # Buscar plan activo y abrir sus cursos del ciclo par/impar con un grupo por defecto
         plan = Plan.objects.filter(is_active=True).first()
-        if plan and period.period in ["I", "II"]:
-            # Determinar ciclos a ofertar
-            if period.period == "I":
-                ciclos = [1, 3, 5, 7, 9]
-            else:
-                ciclos = [2, 4, 6, 8, 10]
-            cursos = plan.courses.filter(cycle__in=ciclos)
-            for curso in cursos:
-                offering, created = CourseOffering.objects.get_or_create(
-                    course=curso,
-                    academic_period=period,
-                    offering_type="normal"
-                )
-                # Crear grupo por defecto si no existe
-                if not CourseGroup.objects.filter(course_offering__course=curso, course_offering=offering).exists():
-                    CourseGroup.objects.create(course_offering=offering, code="1")
+        bootstrap_offerings(period, parity_offering_targets(period, plan))
         return period
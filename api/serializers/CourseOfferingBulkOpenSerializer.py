@@ -0,0 +1,30 @@
+from rest_framework import serializers
+from api.models import AcademicPeriod, Course, CourseOffering
+
+
+class CourseOfferingOpenItemSerializer(serializers.Serializer):
+    course_id = serializers.IntegerField(help_text="ID del curso a abrir.")
+    offering_type = serializers.ChoiceField(choices=CourseOffering.OFFERING_TYPES, default='normal')
+    num_groups = serializers.IntegerField(
+        min_value=1, required=False, allow_null=True, default=None,
+        help_text="Número de grupos. Si se omite, los grupos de la oferta no se modifican."
+    )
+
+
+class CourseOfferingBulkOpenSerializer(serializers.Serializer):
+    academic_period_id = serializers.IntegerField(help_text="ID del periodo académico.")
+    courses = CourseOfferingOpenItemSerializer(many=True, allow_empty=False)
+
+    def validate_academic_period_id(self, value):
+        if not AcademicPeriod.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Periodo académico no encontrado.")
+        return value
+
+    def validate_courses(self, value):
+        # Todos los cursos en una sola consulta
+        ids = {item['course_id'] for item in value}
+        found = set(Course.objects.filter(id__in=ids).values_list('id', flat=True))
+        missing = sorted(ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Cursos no encontrados: {', '.join(map(str, missing))}")
+        return value
@@ -16,4 +16,6 @@ class CourseOfferingListSerializer(serializers.ModelSerializer):
         ]
 
     def get_num_groups(self, obj):
-        return obj.groups.count()
+        # Los listados lo anotan con Count('groups'); sin anotación cuesta una consulta
+        num_groups = getattr(obj, 'num_groups', None)
+        return num_groups if num_groups is not None else obj.groups.count()
@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
-from api.models import Plan, Course, School
+from api.models import Plan, School
+from api.utils.plan_import import PlanFileError, import_courses, read_plan_file
 
 
 class CourseInputSerializer(serializers.Serializer):
@@ -32,23 +34,30 @@ class PlanImportSerializer(serializers.Serializer):
         courses_data = validated_data.pop('courses', [])
         school = School.objects.get(pk=school_id)
 
-        plan = Plan.objects.create(school=school, **validated_data)
-
-        created = []
-        errors = []
-        for idx, c in enumerate(courses_data):
-            try:
-                course = Course.objects.create(
-                    code=c.get('code'),
-                    name=c.get('name'),
-                    credits=c.get('credits') or 0,
-                    cycle=c.get('cycle') or 0,
-                    practical_hours=c.get('hours_practice') or 0,
-                    theoretical_hours=c.get('hours_theory') or 0,
-                    plan=plan
-                )
-                created.append({'index': idx, 'id': course.id, 'code': course.code})
-            except Exception as e:
-                errors.append({'index': idx, 'error': str(e), 'code': c.get('code')})
+        # El plan y sus cursos se crean juntos: si algo falla no queda un plan huérfano.
+        # Las filas se validan en import_courses para informar los errores por fila, igual que con archivo
+        with transaction.atomic():
+            plan = Plan.objects.create(school=school, **validated_data)
+            created, errors = import_courses(plan, courses_data)
+        return {'plan': plan, 'created_courses': created, 'errors': errors}
+
+
+class PlanFileImportSerializer(PlanImportSerializer):
+    """Igual que PlanImportSerializer, pero los cursos llegan en un archivo CSV o XLSX (plantilla de docs/)."""
+    courses = None
+    file = serializers.FileField()
 
+    def validate_file(self, value):
+        try:
+            # Se leen y validan las filas acá para responder 400 si el archivo no es una plantilla
+            return list(read_plan_file(value, value.name))
+        except PlanFileError as e:
+            raise serializers.ValidationError(str(e))
+
+    def create(self, validated_data):
+        rows = validated_data.pop('file')
+        school = School.objects.get(pk=validated_data.pop('school'))
+        with transaction.atomic():
+            plan = Plan.objects.create(school=school, **validated_data)
+            created, errors = import_courses(plan, rows)
         return {'plan': plan, 'created_courses': created, 'errors': errors}
@@ -0,0 +1,22 @@
+from rest_framework import serializers
+from api.models import ScheduleChangeRequest
+from api.utils.change_requests import MOVE_REQUEST_TYPES
+
+class ScheduleChangeRequestSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScheduleChangeRequest
+        fields = [
+            'id', 'request_type', 'schedule', 'requested_by', 'target_teacher', 'target_room',
+            'target_day', 'target_time', 'status', 'approvals', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['status', 'approvals', 'created_at', 'updated_at']
+
+    def validate_target_day(self, value):
+        if value is not None and value > 6:
+            raise serializers.ValidationError("El día debe estar entre 0 (lunes) y 6 (domingo).")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('request_type') in MOVE_REQUEST_TYPES and not attrs.get('schedule'):
+            raise serializers.ValidationError("Las solicitudes de cambio deben indicar la sesión.")
+        return attrs
@@ -0,0 +1,30 @@
+from rest_framework import serializers
+from api.models import ScheduleJob
+from api.utils.jobs import fail_stale_jobs
+
+class ScheduleJobSerializer(serializers.ModelSerializer):
+    """Estado y progreso de un trabajo; el reporte completo va en /report/."""
+    academic_period_name = serializers.StringRelatedField(source='academic_period')
+
+    class Meta:
+        model = ScheduleJob
+        fields = [
+            'id', 'academic_period', 'academic_period_name', 'mode', 'starts', 'seed', 'status',
+            'progress', 'error', 'cancel_requested', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'progress', 'error', 'cancel_requested', 'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+        ]
+
+    def validate_starts(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Debe haber al menos una pasada.")
+        return value
+
+    def validate(self, attrs):
+        period = attrs['academic_period']
+        # Un trabajo cuyo worker murió no bloquea el periodo
+        fail_stale_jobs(academic_period=period)
+        if ScheduleJob.objects.filter(academic_period=period, status__in=['pendiente', 'en_proceso']).exists():
+            raise serializers.ValidationError("Ya hay una generación pendiente o en proceso para este periodo.")
+        return attrs
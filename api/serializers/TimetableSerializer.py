@@ -0,0 +1,17 @@
+from rest_framework import serializers
+from api.serializers.ScheduleSerializer import ScheduleSerializer
+
+
+class TimetableSerializer(ScheduleSerializer):
+    """Sesión del horario con los datos de curso, aula y sede ya unidos (ver TimetableViewSet)."""
+    course_code = serializers.CharField(source='course.code', read_only=True)
+    cycle = serializers.IntegerField(source='course.cycle', read_only=True)
+    academic_period = serializers.IntegerField(source='group.course_offering.academic_period_id', read_only=True)
+    room_type = serializers.CharField(source='room.room_type', read_only=True, default=None)
+    site = serializers.IntegerField(source='room.site_id', read_only=True, default=None)
+    site_name = serializers.CharField(source='room.site.name', read_only=True, default=None)
+
+    class Meta(ScheduleSerializer.Meta):
+        fields = ScheduleSerializer.Meta.fields + [
+            'course_code', 'cycle', 'academic_period', 'room_type', 'site', 'site_name',
+        ]
@@ -1,3 +1,1674 @@
+import io
+from collections import Counter
+from datetime import datetime, time, timedelta, timezone
+from time import sleep
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as djtimezone
+from rest_framework.test import APIClient
+
+from api.middleware import request_stats
+from api.models import (
+    AcademicPeriod, Course, CourseDayPreference, CourseGroup, CourseGroupConfig, CourseOffering,
+    CourseSessionPolicy, CourseTeacherPreference, Faculty, GeneralScheduleConfig, Person, Plan, Room,
+    Schedule, ScheduleChangeRequest, ScheduleJob, School, Site, Teacher, TeacherUnavailability, TimetableDocument
+)
+from api.scheduler import OptimizationScheduler
+from api.utils.change_requests import ConflictChecker, evaluate_pending
+from api.utils.exports import timetable_csv, write_xlsx
+from api.utils.jobs import _ProgressWriter, cancel_job, claim_next_job, run_job, stale_jobs
+from api.utils.offerings import bootstrap_offerings, open_offerings, period_offering_targets, reconcile_groups
+from api.utils.ordering import DynamicOrder
+from api.utils.plan_import import import_courses
+from api.utils.profiling import NULL_PROFILER, Profiler
+from api.utils.room_index import RoomIndex
+from api.utils.occupancy import OccupancyGrid, hours_mask
+from api.utils.scheduler import SCORE_NOISE, AlgorithmScheduler, _run_start
+from api.utils.snapshot import DAYS_MAP, RoomInfo
+from api.utils.vacancies import VacancyMap
+
+try:
+    from openpyxl import Workbook, load_workbook
+except ImportError:
+    Workbook = load_workbook = None
+
+
+def _slow_start(*args):
+    """Pasada del multi-start que tarda lo suficiente para que el pool avise varias veces."""
+    sleep(0.2)
+    return _run_start(*args)
+
+
+def create_base_data():
+    """Facultad, escuela, plan, sede con aulas/labs y algunos docentes."""
+    faculty = Faculty.objects.create(name='FISI')
+    school = School.objects.create(name='Ingeniería de Sistemas', faculty=faculty)
+    plan = Plan.objects.create(name='Plan 2020', school=school, start_year=2020)
+    site = Site.objects.create(name='Ciudad Universitaria', address='Av. Venezuela')
+    for i in range(6):
+        Room.objects.create(name=f'A{i}', room_type='aula', capacity=40 + 5 * i, site=site)
+    for i in range(3):
+        Room.objects.create(name=f'L{i}', room_type='laboratorio', capacity=40 + 5 * i, site=site)
+    teachers = []
+    for i in range(6):
+        person = Person.objects.create(
+            first_name=f'Docente{i}', last_name='Apellido', middle_name='Materno',
+            dni=f'4000000{i}', email=f'docente{i}@unap.edu.pe', phone='999999999'
+        )
+        teachers.append(Teacher.objects.create(person=person, contract_type='nombrado', min_weekly_hours=10))
+    TeacherUnavailability.objects.create(teacher=teachers[0], day='mon', start_time=time(7), end_time=time(12))
+    return plan, teachers
+
+
+def create_period(year, period='I'):
+    return AcademicPeriod.objects.create(
+        year=year, period=period,
+        start_schedule_creation=datetime(year, 1, 1, tzinfo=timezone.utc),
+        end_schedule_creation=datetime(year, 2, 1, tzinfo=timezone.utc),
+    )
+
+
+def create_offerings(plan, teachers, period, num_courses, groups_per_course=1, prefix='C'):
+    """Cursos con políticas y preferencias, abiertos en ``period`` con N grupos cada uno."""
+    for i in range(num_courses):
+        course = Course.objects.create(
+            code=f'{prefix}{period.year}{i:03d}', name=f'Curso {i}', cycle=1 + i % 5,
+            theoretical_hours=2, practical_hours=2 if i % 2 else 0, plan=plan, requires_lab=True,
+        )
+        CourseSessionPolicy.objects.create(course=course, mode='juntas' if i % 3 == 0 else 'separadas')
+        CourseDayPreference.objects.create(course=course, day=['mon', 'tue', 'wed'][i % 3])
+        for teacher in (teachers[i % len(teachers)], teachers[(i + 1) % len(teachers)]):
+            CourseTeacherPreference.objects.create(course=course, teacher=teacher)
+        offering = CourseOffering.objects.create(course=course, academic_period=period)
+        for g in range(groups_per_course):
+            CourseGroup.objects.create(course_offering=offering, code=str(g + 1))
+
+
+class AlgorithmSchedulerQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+
+    def _generate_queries(self, period):
+        scheduler = AlgorithmScheduler(period.id)
+        with CaptureQueriesContext(connection) as ctx:
+            report = scheduler.generate()
+        return [q['sql'] for q in ctx.captured_queries], report
+
+    def test_generate_query_count_does_not_grow_with_groups(self):
+        small = create_period(2031)
+        create_offerings(self.plan, self.teachers, small, num_courses=4, groups_per_course=1, prefix='S')
+        large = create_period(2032)
+        create_offerings(self.plan, self.teachers, large, num_courses=12, groups_per_course=2, prefix='L')
+
+        small_queries, small_report = self._generate_queries(small)
+        large_queries, large_report = self._generate_queries(large)
+
+        self.assertTrue(small_report['created'])
+        self.assertGreater(len(large_report['created']), len(small_report['created']))
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_regenerate_replaces_previous_schedule(self):
+        period = create_period(2033)
+        create_offerings(self.plan, self.teachers, period, num_courses=6, groups_per_course=2, prefix='R')
+        AlgorithmScheduler(period.id, seed=1).generate()
+        old_ids = set(Schedule.objects.values_list('id', flat=True))
+        request = ScheduleChangeRequest.objects.create(
+            request_type='cambio_vacio', schedule_id=min(old_ids), requested_by=self.teachers[0]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            AlgorithmScheduler(period.id, seed=2).generate()
+
+        new_ids = set(Schedule.objects.values_list('id', flat=True))
+        self.assertTrue(new_ids)
+        self.assertFalse(old_ids & new_ids)
+        request.refresh_from_db()
+        self.assertIsNone(request.schedule_id)
+        # Los documentos se reconstruyen en bloque, sin refrescos por fila al confirmar
+        self.assertEqual(callbacks, [])
+        documented = {row['id'] for data in TimetableDocument.objects.filter(
+            academic_period=period, kind='cycle').values_list('data', flat=True) for row in data}
+        self.assertEqual(documented, new_ids)
+
+    def test_wipe_is_two_set_based_statements(self):
+        period = create_period(2034)
+        create_offerings(self.plan, self.teachers, period, num_courses=6, groups_per_course=2, prefix='W')
+        AlgorithmScheduler(period.id, seed=1).generate()
+        other = create_period(2035)
+        create_offerings(self.plan, self.teachers, other, num_courses=3, groups_per_course=1, prefix='X')
+        AlgorithmScheduler(other.id, seed=1).generate()
+        kept = Schedule.objects.filter(group__course_offering__academic_period=other).count()
+        schedules = Schedule.objects.filter(group__course_offering__academic_period=period)
+        request = ScheduleChangeRequest.objects.create(
+            request_type='cambio_vacio', schedule=schedules.first(), requested_by=self.teachers[0]
+        )
+
+        scheduler = AlgorithmScheduler(period.id, seed=2)
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks() as callbacks:
+            scheduler._clear_previous_schedule()
+        statements = [query['sql'].split()[0].upper() for query in ctx.captured_queries]
+        # Sin SELECT de las filas de api_schedule ni señales por fila: un UPDATE y un DELETE
+        self.assertEqual(statements, ['UPDATE', 'DELETE'])
+        self.assertEqual(callbacks, [])
+        self.assertFalse(schedules.exists())
+        self.assertEqual(Schedule.objects.filter(group__course_offering__academic_period=other).count(), kept)
+        request.refresh_from_db()
+        self.assertIsNone(request.schedule_id)
+
+
+class TimetableQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.small = create_period(2041)
+        create_offerings(cls.plan, cls.teachers, cls.small, num_courses=3, groups_per_course=1, prefix='S')
+        cls.large = create_period(2042)
+        create_offerings(cls.plan, cls.teachers, cls.large, num_courses=12, groups_per_course=2, prefix='L')
+        AlgorithmScheduler(cls.small.id, seed=1).generate()
+        AlgorithmScheduler(cls.large.id, seed=1).generate()
+
+    def _get(self, url, params):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_list_query_count_does_not_grow_with_rows(self):
+        small, small_queries = self._get('/api/timetable/', {'period': self.small.id, 'page_size': 1000})
+        large, large_queries = self._get('/api/timetable/', {'period': self.large.id, 'page_size': 1000})
+        self.assertGreater(large['count'], small['count'])
+        self.assertEqual(small_queries, large_queries)
+        self.assertTrue(all(row['academic_period'] == self.large.id for row in large['results']))
+        self.assertTrue(any(row['teacher_name'] for row in large['results']))
+
+    def test_grouped_query_count_does_not_grow_with_rows(self):
+        for by in ('teacher', 'room', 'site', 'cycle', 'group'):
+            small, small_queries = self._get('/api/timetable/grouped/', {'period': self.small.id, 'by': by})
+            large, large_queries = self._get('/api/timetable/grouped/', {'period': self.large.id, 'by': by})
+            self.assertEqual(small_queries, large_queries, by)
+            self.assertEqual(large_queries, 1, by)
+
+    def test_invalid_filters_return_400(self):
+        client = APIClient()
+        for params in ({'period': 'abc'}, {'teacher': '1.5'}, {'day': 'lunes'}, {'room': str(10 ** 30)}):
+            response = client.get('/api/timetable/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(list(response.json()), list(params))
+            response = client.get('/api/timetable/grouped/', {**params, 'by': 'room'})
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_export_params_are_validated(self):
+        client = APIClient()
+        for url in ('/api/timetable/export/', '/api/timetable/unassigned/'):
+            for period in ('', 'abc', '²', str(10 ** 30)):
+                self.assertEqual(client.get(url, {'period': period, 'output': 'csv'}).status_code, 400, (url, period))
+            self.assertEqual(client.get(url, {'period': 999999, 'output': 'csv'}).status_code, 404, url)
+            self.assertEqual(client.get(url, {'period': self.small.id, 'output': 'pdf'}).status_code, 400, url)
+            response = client.get(url, {'period': self.small.id, 'output': 'csv'})
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(b''.join(response.streaming_content).startswith('\ufeff'.encode('utf-8')))
+
+
+class OfferingAndPreferenceQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.small = create_period(2051)
+        create_offerings(cls.plan, cls.teachers, cls.small, num_courses=3, groups_per_course=2, prefix='S')
+        # Periodo grande con 1000 ofertas (en bloque para que la prueba sea rápida)
+        cls.large = create_period(2052)
+        courses = Course.objects.bulk_create(
+            Course(code=f'B{i:04d}', name=f'Curso {i}', cycle=1 + i % 10, plan=cls.plan) for i in range(1000)
+        )
+        offerings = CourseOffering.objects.bulk_create(
+            CourseOffering(course=course, academic_period=cls.large) for course in courses
+        )
+        CourseGroup.objects.bulk_create(
+            CourseGroup(course_offering=offering, code=str(g + 1)) for offering in offerings for g in range(2)
+        )
+        CourseDayPreference.objects.bulk_create(CourseDayPreference(course=course, day='mon') for course in courses)
+        CourseTeacherPreference.objects.bulk_create(
+            CourseTeacherPreference(course=course, teacher=cls.teachers[i % len(cls.teachers)])
+            for i, course in enumerate(courses)
+        )
+
+    def _get(self, url, params=None):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_offering_list_counts_groups_without_per_row_queries(self):
+        few, few_queries = self._get('/api/course-offerings/', {'page_size': 5})
+        many, many_queries = self._get('/api/course-offerings/', {'page_size': 1000})
+        self.assertEqual(len(many['results']), 1000)
+        self.assertTrue(all(row['num_groups'] == 2 for row in many['results']))
+        self.assertEqual(few_queries, many_queries)
+
+    def test_offering_detail_prefetches_groups(self):
+        offering = CourseOffering.objects.filter(academic_period=self.large).first()
+        data, queries = self._get(f'/api/course-offerings/detail/{offering.id}/')
+        self.assertEqual([g['code'] for g in data['groups']], ['1', '2'])
+        self.assertEqual(queries, 2)
+
+    def test_group_list_follows_offering_course(self):
+        course = Course.objects.get(code='B0001')
+        few, few_queries = self._get('/api/course-groups/', {'course': course.id})
+        many, many_queries = self._get('/api/course-groups/', {'page_size': 1000})
+        self.assertEqual([row['course_code'] for row in few['results']], ['B0001', 'B0001'])
+        self.assertEqual(len(many['results']), 1000)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_preference_complete_actions_do_not_query_per_row(self):
+        few, few_queries = self._get('/api/course-day-preferences/complete/', {'page_size': 5})
+        many, many_queries = self._get('/api/course-day-preferences/complete/', {'page_size': 1000})
+        self.assertEqual(len(many['results']), 1000)
+        self.assertEqual(few_queries, many_queries)
+
+        teacher = self.teachers[0]
+        few, few_queries = self._get(f'/api/course-teacher-preferences/complete/{teacher.id}/', {'page_size': 5})
+        many, many_queries = self._get(f'/api/course-teacher-preferences/complete/{teacher.id}/', {'page_size': 1000})
+        self.assertGreater(len(many['results']), 5)
+        self.assertTrue(all(row['teacher']['id'] == teacher.id for row in many['results']))
+        self.assertEqual(few_queries, many_queries)
+
+
+class TimetableDocumentSignalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.small = create_period(2061)
+        create_offerings(cls.plan, cls.teachers, cls.small, num_courses=3, groups_per_course=1, prefix='S')
+        cls.large = create_period(2062)
+        create_offerings(cls.plan, cls.teachers, cls.large, num_courses=12, groups_per_course=2, prefix='L')
+        AlgorithmScheduler(cls.small.id, seed=1).generate()
+        AlgorithmScheduler(cls.large.id, seed=1).generate()
+
+    def _document_ids(self, period, kind, key):
+        data = TimetableDocument.objects.filter(academic_period=period, kind=kind, key=key).values_list('data', flat=True).first()
+        return {row['id'] for row in data or ()}
+
+    def test_moving_a_session_refreshes_old_and_new_teacher_on_commit(self):
+        schedule = Schedule.objects.filter(group__course_offering__academic_period=self.large).exclude(teacher=None).first()
+        old_teacher = schedule.teacher_id
+        new_teacher = next(t.id for t in self.teachers if t.id != old_teacher)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            schedule.teacher_id = new_teacher
+            schedule.save()
+            # Antes de confirmar no se tocó ningún documento
+            self.assertIn(schedule.id, self._document_ids(self.large, 'teacher', old_teacher))
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotIn(schedule.id, self._document_ids(self.large, 'teacher', old_teacher))
+        self.assertIn(schedule.id, self._document_ids(self.large, 'teacher', new_teacher))
+
+    def test_cascade_delete_query_count_does_not_grow_with_schedules(self):
+        def delete(period):
+            with CaptureQueriesContext(connection) as ctx:
+                with self.captureOnCommitCallbacks(execute=True):
+                    period.delete()
+            return len(ctx.captured_queries)
+
+        self.assertGreater(
+            Schedule.objects.filter(group__course_offering__academic_period=self.large).count(),
+            Schedule.objects.filter(group__course_offering__academic_period=self.small).count(),
+        )
+        self.assertEqual(delete(self.small), delete(self.large))
+        self.assertFalse(Schedule.objects.exists())
+
+    def test_deleting_an_offering_removes_its_sessions_from_documents(self):
+        schedule = Schedule.objects.filter(group__course_offering__academic_period=self.large).exclude(room=None).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule.group.course_offering.delete()
+        self.assertNotIn(schedule.id, self._document_ids(self.large, 'room', schedule.room_id))
+        self.assertNotIn(schedule.id, self._document_ids(self.large, 'cycle', schedule.course.cycle))
+
+    def test_rolled_back_transaction_leaves_no_pending_keys(self):
+        discarded = Schedule.objects.filter(group__course_offering__academic_period=self.small).first()
+        kept = Schedule.objects.filter(group__course_offering__academic_period=self.large).first()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            discarded.start_time, discarded.end_time = time(20), time(21)
+            discarded.save()
+            raise RuntimeError
+
+        with mock.patch('api.utils.timetables.refresh_keys') as refresh, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+            kept.save()
+            kept.save()
+        # Un solo flush, solo con las claves del periodo confirmado
+        self.assertEqual(len(callbacks), 1)
+        refresh.assert_called_once()
+        self.assertEqual({period_id for period_id, _, _ in refresh.call_args.args[0]}, {self.large.id})
+
+    def test_flush_clears_the_connection_flag(self):
+        schedule = Schedule.objects.filter(group__course_offering__academic_period=self.large).first()
+        with self.captureOnCommitCallbacks(execute=True) as first:
+            schedule.save()
+        with self.captureOnCommitCallbacks(execute=True) as second:
+            schedule.save()
+        # Tras el flush, la siguiente transacción registra su propio callback
+        self.assertEqual((len(first), len(second)), (1, 1))
+
+
+class ReconcileGroupsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2071)
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=4, groups_per_course=3, prefix='G')
+        AlgorithmScheduler(cls.period.id, seed=1).generate()
+
+    def _offering(self, index=0):
+        offering = CourseOffering.objects.filter(academic_period=self.period).order_by('course__code')[index]
+        self.assertEqual(
+            CourseGroup.objects.filter(course_offering=offering, schedules__isnull=False).distinct().count(), 3
+        )
+        return offering
+
+    def _sessions(self, offering):
+        return dict(Schedule.objects.filter(group__course_offering=offering).values_list('id', 'group__code'))
+
+    def test_same_count_keeps_everything_in_one_query(self):
+        offering = self._offering()
+        groups = set(offering.groups.values_list('id', flat=True))
+        sessions = self._sessions(offering)
+        with self.assertNumQueries(1):
+            self.assertEqual(reconcile_groups(offering, 3), (0, 0))
+        self.assertEqual(set(offering.groups.values_list('id', flat=True)), groups)
+        self.assertEqual(self._sessions(offering), sessions)
+
+    def test_adding_groups_keeps_existing_groups_and_schedules(self):
+        offering = self._offering()
+        groups = set(offering.groups.values_list('id', flat=True))
+        sessions = self._sessions(offering)
+        self.assertEqual(reconcile_groups(offering, 5), (2, 0))
+        self.assertEqual(sorted(offering.groups.values_list('code', flat=True)), ['1', '2', '3', '4', '5'])
+        self.assertTrue(groups <= set(offering.groups.values_list('id', flat=True)))
+        self.assertEqual(self._sessions(offering), sessions)
+
+    def test_removing_groups_keeps_schedules_of_the_remaining_ones(self):
+        offering = self._offering()
+        sessions = self._sessions(offering)
+        kept = {sid for sid, code in sessions.items() if code == '1'}
+        removed = set(sessions) - kept
+        self.assertEqual(reconcile_groups(offering, 1), (0, 2))
+        self.assertEqual(list(offering.groups.values_list('code', flat=True)), ['1'])
+        self.assertEqual(set(self._sessions(offering)), kept)
+        # Los documentos ya no listan las sesiones borradas y conservan las que quedan
+        documented = {row['id'] for data in TimetableDocument.objects.filter(
+            academic_period=self.period, kind='cycle', key=offering.course.cycle
+        ).values_list('data', flat=True) for row in data}
+        self.assertTrue(kept <= documented)
+        self.assertFalse(removed & documented)
+
+    def test_removing_scheduled_groups_query_count_does_not_grow(self):
+        one, two = self._offering(0), self._offering(1)
+        with CaptureQueriesContext(connection) as drop_one:
+            reconcile_groups(one, 2)
+        with CaptureQueriesContext(connection) as drop_two:
+            reconcile_groups(two, 1)
+        self.assertEqual(len(drop_one.captured_queries), len(drop_two.captured_queries))
+
+    def test_config_change_reconciles_groups(self):
+        offering = self._offering()
+        sessions = self._sessions(offering)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            config = CourseGroupConfig.objects.create(course_offering=offering, num_groups=3)
+            config.num_groups = 2
+            config.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(sorted(offering.groups.values_list('code', flat=True)), ['1', '2'])
+        self.assertEqual(
+            set(self._sessions(offering)), {sid for sid, code in sessions.items() if code in ('1', '2')}
+        )
+
+
+class OpenOfferingsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2081)
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=8, groups_per_course=3, prefix='O')
+        AlgorithmScheduler(cls.period.id, seed=1).generate()
+        cls.courses = list(
+            Course.objects.filter(offerings__academic_period=cls.period).order_by('code').values_list('id', flat=True)
+        )
+        cls.new_courses = [
+            Course.objects.create(code=f'N{i:03d}', name=f'Nuevo {i}', cycle=1, plan=cls.plan).id for i in range(8)
+        ]
+        cls.user = User.objects.create_user('coordinador', password='x')
+
+    def _scheduled_groups(self, course_ids):
+        return CourseGroup.objects.filter(
+            course_offering__course_id__in=course_ids, course_offering__academic_period=self.period,
+            schedules__isnull=False,
+        ).distinct().count()
+
+    def _open(self, items):
+        with CaptureQueriesContext(connection) as ctx:
+            offerings, created = open_offerings(self.period, items)
+        return offerings, created, len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_when_removing_scheduled_groups(self):
+        few, many = self.courses[:1], self.courses[1:7]
+        self.assertEqual(self._scheduled_groups(few + many), 3 * 7)
+        _, _, few_queries = self._open([(cid, 'normal', 1) for cid in few] + [(self.new_courses[0], 'normal', 2)])
+        offerings, created, many_queries = self._open(
+            [(cid, 'normal', 1) for cid in many] + [(cid, 'normal', 2) for cid in self.new_courses[1:]]
+        )
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(created), 7)
+        self.assertEqual([o.num_groups for o in offerings], [1] * 6 + [2] * 7)
+        self.assertEqual(self._scheduled_groups(many), 6)
+        self.assertEqual(set(CourseGroupConfig.objects.filter(
+            course_offering__in=offerings).values_list('num_groups', flat=True)), {1, 2})
+
+    def test_existing_offerings_without_num_groups_are_left_alone(self):
+        offerings, created, _ = self._open([(self.courses[0], 'normal', None), (self.new_courses[0], 'nivelacion', None)])
+        self.assertEqual([o.num_groups for o in offerings], [3, 0])
+        self.assertEqual(created, {offerings[1].id})
+
+    def test_bulk_endpoint_query_count_does_not_grow(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def post(course_ids):
+            body = {
+                'academic_period_id': self.period.id,
+                'courses': [{'course_id': cid, 'num_groups': 1} for cid in course_ids],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.post('/api/course-offerings-bulk/open_courses/', body, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            return response.json(), len(ctx.captured_queries)
+
+        few, few_queries = post(self.courses[:1])
+        many, many_queries = post(self.courses[1:7])
+        self.assertEqual(few_queries, many_queries)
+        self.assertEqual(len(many['added']), 6)
+        self.assertTrue(all(row['num_groups'] == 1 for row in many['added']))
+        self.assertEqual(many['created'], 0)
+
+    def test_bulk_endpoint_rejects_unknown_courses(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/course-offerings-bulk/open_courses/', {
+            'academic_period_id': self.period.id, 'courses': [{'course_id': 999999}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('courses', response.json())
+
+
+class PlanImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, _ = create_base_data()
+        cls.school = cls.plan.school
+        Course.objects.create(code='EXISTE', name='Curso existente', cycle=1, plan=cls.plan)
+        cls.user = User.objects.create_user('importador', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    # Fila 0 válida, 1 con créditos negativos, 2 con código ya existente, 3 repite la fila 0
+    ROWS = [
+        ('IMP001', 'Cálculo I', 4, 2, 2, 1),
+        ('IMP002', 'Física I', -3, 2, 2, 1),
+        ('EXISTE', 'Repetido', 3, 2, 2, 1),
+        ('IMP001', 'Cálculo bis', 4, 2, 2, 1),
+    ]
+
+    def _plan_data(self, name):
+        return {'name': name, 'school': self.school.id, 'start_year': 2024}
+
+    def _assert_per_row(self, response, name):
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual([row['code'] for row in body['created_courses']], ['IMP001'])
+        self.assertEqual([(row['index'], row['code']) for row in body['errors']], [(1, 'IMP002'), (2, 'EXISTE'), (3, 'IMP001')])
+        self.assertIn('credits', body['errors'][0]['error'])
+        self.assertEqual(list(Plan.objects.get(name=name).courses.values_list('code', flat=True)), ['IMP001'])
+
+    def test_csv_file_reports_bad_rows(self):
+        lines = ['code,name,credits,hours_theory,hours_practice,cycle'] + [','.join(map(str, row)) for row in self.ROWS]
+        upload = SimpleUploadedFile('plan.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/plans/import/file/', {**self._plan_data('Plan CSV'), 'file': upload}, format='multipart')
+        self._assert_per_row(response, 'Plan CSV')
+
+    @skipIf(Workbook is None, 'openpyxl no instalado')
+    def test_xlsx_file_reports_bad_rows(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['code', 'name', 'credits', 'hours_theory', 'hours_practice', 'cycle'])
+        for row in self.ROWS:
+            sheet.append(list(row))
+        content = io.BytesIO()
+        workbook.save(content)
+        upload = SimpleUploadedFile('plan.xlsx', content.getvalue())
+        response = self.client.post('/api/plans/import/file/', {**self._plan_data('Plan XLSX'), 'file': upload}, format='multipart')
+        self._assert_per_row(response, 'Plan XLSX')
+
+    def test_json_and_file_report_the_same_bad_row(self):
+        courses = [
+            dict(zip(('code', 'name', 'credits', 'hours_theory', 'hours_practice', 'cycle'), row)) for row in self.ROWS
+        ]
+        response = self.client.post('/api/plans/import/', {**self._plan_data('Plan JSON'), 'courses': courses}, format='json')
+        self._assert_per_row(response, 'Plan JSON')
+        json_errors = response.json()['errors']
+
+        Course.objects.filter(code='IMP001').delete()
+        lines = ['code,name,credits,hours_theory,hours_practice,cycle'] + [','.join(map(str, row)) for row in self.ROWS]
+        upload = SimpleUploadedFile('plan.csv', '\n'.join(lines).encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/plans/import/file/', {**self._plan_data('Plan CSV'), 'file': upload}, format='multipart')
+        self._assert_per_row(response, 'Plan CSV')
+        self.assertEqual(response.json()['errors'], json_errors)
+        self.assertEqual(json_errors[0]['error'], 'credits: Debe ser mayor o igual a 0.')
+
+    def test_json_reports_duplicated_codes_per_row(self):
+        courses = [{'code': 'IMP010', 'name': 'A', 'cycle': 1}, {'code': 'EXISTE', 'name': 'B', 'cycle': 1}]
+        response = self.client.post('/api/plans/import/', {**self._plan_data('Plan JSON'), 'courses': courses}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual([row['code'] for row in response.json()['created_courses']], ['IMP010'])
+        self.assertEqual([row['index'] for row in response.json()['errors']], [1])
+
+    def test_rows_rejected_by_the_database_are_reported_per_row(self):
+        plan = Plan.objects.create(name='Plan BD', school=self.school, start_year=2024)
+        # Filas ya "validadas" que igual violan el CHECK de PositiveIntegerField
+        rows = [{'code': 'BD001', 'name': 'A', 'cycle': 1}, {'code': 'BD002', 'name': 'B', 'cycle': 1, 'credits': -1},
+                {'code': 'BD003', 'name': 'C', 'cycle': 2}]
+        created, errors = import_courses(plan, rows, validated=True, chunk_size=2)
+        self.assertEqual([row['code'] for row in created], ['BD001', 'BD003'])
+        self.assertEqual([(row['index'], row['code']) for row in errors], [(1, 'BD002')])
+        self.assertEqual(sorted(plan.courses.values_list('code', flat=True)), ['BD001', 'BD003'])
+
+    def test_failure_while_importing_leaves_no_orphan_plan(self):
+        with mock.patch('api.serializers.PlanImportSerializer.import_courses', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post('/api/plans/import/', {
+                    **self._plan_data('Plan roto'), 'courses': [{'code': 'X1', 'name': 'X', 'cycle': 1}],
+                }, format='json')
+        self.assertFalse(Plan.objects.filter(name='Plan roto').exists())
+
+
+class ScheduleJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2091)
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=3, groups_per_course=1, prefix='J')
+        cls.user = User.objects.create_user('programador', password='x')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _running(self, minutes_ago, **fields):
+        beat = djtimezone.now() - timedelta(minutes=minutes_ago)
+        return ScheduleJob.objects.create(
+            academic_period=self.period, status='en_proceso', started_at=beat, heartbeat_at=beat, **fields
+        )
+
+    def test_claim_takes_oldest_pending_job_once(self):
+        first = ScheduleJob.objects.create(academic_period=self.period)
+        second = ScheduleJob.objects.create(academic_period=self.period)
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'en_proceso')
+        self.assertIsNotNone(first.heartbeat_at)
+
+    def test_run_completes_job_and_renews_heartbeat(self):
+        ScheduleJob.objects.create(academic_period=self.period, seed=5)
+        job = claim_next_job()
+        claimed_beat = job.heartbeat_at
+        job = run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completado')
+        self.assertEqual(job.progress['phase'], 'terminado')
+        self.assertEqual(len(job.report['created']) + len(job.report['errors']), 3)
+        self.assertGreaterEqual(job.heartbeat_at, claimed_beat)
+        self.assertTrue(Schedule.objects.filter(group__course_offering__academic_period=self.period).exists())
+
+    def test_cancel_pending_job_finishes_it(self):
+        job = cancel_job(ScheduleJob.objects.create(academic_period=self.period))
+        self.assertEqual(job.status, 'cancelado')
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(claim_next_job())
+
+    def test_cancel_running_job_is_left_to_its_worker(self):
+        ScheduleJob.objects.create(academic_period=self.period)
+        job = claim_next_job()
+        job = cancel_job(job)
+        self.assertEqual((job.status, job.cancel_requested), ('en_proceso', True))
+        job = run_job(job)
+        self.assertEqual(job.status, 'cancelado')
+        self.assertFalse(Schedule.objects.filter(group__course_offering__academic_period=self.period).exists())
+
+    def test_cancel_finalizes_job_without_a_live_worker(self):
+        job = self._running(minutes_ago=30)
+        response = self.client.post(f'/api/schedule-jobs/{job.pk}/cancel/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['status'], 'cancelado')
+        self.assertIsNotNone(response.json()['finished_at'])
+
+    def test_stale_job_does_not_block_new_jobs(self):
+        live = self._running(minutes_ago=1)
+        response = self.client.post('/api/schedule-jobs/', {'academic_period': self.period.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        live.delete()
+        stale = self._running(minutes_ago=30)
+        abandoned_cancel = self._running(minutes_ago=30, cancel_requested=True)
+        response = self.client.post('/api/schedule-jobs/', {'academic_period': self.period.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        stale.refresh_from_db()
+        abandoned_cancel.refresh_from_db()
+        self.assertEqual(stale.status, 'fallido')
+        self.assertTrue(stale.error)
+        self.assertEqual(abandoned_cancel.status, 'cancelado')
+
+    def test_claim_fails_stale_jobs_first(self):
+        stale = self._running(minutes_ago=30)
+        pending = ScheduleJob.objects.create(academic_period=self.period)
+        self.assertEqual(claim_next_job().pk, pending.pk)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'fallido')
+        self.assertIsNotNone(stale.finished_at)
+
+    def test_multi_start_wait_renews_heartbeat(self):
+        job = self._running(minutes_ago=30)
+        writer = _ProgressWriter(job.pk, interval=0)
+        beats = []
+
+        def callback(progress):
+            writer(progress)
+            if progress.get('phase') == 'multi_start':
+                beats.append(ScheduleJob.objects.values_list('heartbeat_at', flat=True).get(pk=job.pk))
+
+        with mock.patch('api.utils.scheduler.POOL_POLL_SECONDS', 0.02), \
+                mock.patch('api.utils.scheduler._run_start', _slow_start):
+            report = AlgorithmScheduler(self.period.id, seed=1, progress_callback=callback).generate(starts=2, workers=2)
+        # El aviso de fase y al menos un tic mientras las pasadas siguen corriendo
+        self.assertGreaterEqual(len(beats), 3)
+        self.assertTrue(all(beat > job.heartbeat_at for beat in beats))
+        self.assertEqual([start['seed'] for start in report['starts']], [1, 2])
+        self.assertFalse(stale_jobs().filter(pk=job.pk).exists())
+
+    def test_run_leaves_a_job_finalized_meanwhile_alone(self):
+        ScheduleJob.objects.create(academic_period=self.period)
+        job = claim_next_job()
+
+        class Finalized(AlgorithmScheduler):
+            def generate(self, starts=1, workers=None, improve_seconds=0):
+                # Mientras corre, otro proceso lo da por abandonado
+                ScheduleJob.objects.filter(pk=job.pk).update(status='fallido', error='abandonado')
+                return super().generate(starts=starts)
+
+        with mock.patch('api.utils.jobs.AlgorithmScheduler', Finalized):
+            job = run_job(job)
+        self.assertEqual((job.status, job.error, job.report), ('fallido', 'abandonado', None))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'fallido')
+
+
+class SessionBlocksTests(TestCase):
+    """El motor CP-SAT arma los bloques con la misma regla que el greedy."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2101)
+        # Curso 0: juntas (2 h teoría), 3: juntas (2+2 h); el resto separadas
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=4, groups_per_course=1, prefix='B')
+        Course.objects.filter(code='B2101003').update(practical_hours=2)
+        cls.no_teacher = Course.objects.create(
+            code='B2101900', name='Tutoría', cycle=1, theoretical_hours=1, practical_hours=2, plan=cls.plan,
+            requires_teacher=False,
+        )
+        CourseSessionPolicy.objects.create(course=cls.no_teacher, mode='juntas')
+        offering = CourseOffering.objects.create(course=cls.no_teacher, academic_period=cls.period)
+        CourseGroup.objects.create(course_offering=offering, code='1')
+
+    def test_juntas_merges_blocks_only_without_teacher(self):
+        scheduler = OptimizationScheduler(self.period.id, seed=1)
+        scheduler.prepare_environment()
+        blocks = {group.course.code: scheduler._blocks(group) for group in scheduler.groups}
+        greedy = {group.course.code: scheduler._session_blocks(group.course) for group in scheduler.groups}
+        self.assertEqual(blocks, greedy)
+        self.assertEqual(blocks['B2101003'], [[('teoria', 2)], [('practica', 2)]])
+        self.assertEqual(blocks['B2101900'], [[('teoria', 1), ('practica', 2)]])
+        order = DynamicOrder(scheduler, scheduler.groups)
+        by_code = {group.course.code: group.id for group in scheduler.groups}
+        self.assertEqual(len(order._blocks[by_code['B2101003']]), 2)
+        self.assertEqual(len(order._blocks[by_code['B2101900']]), 1)
+
+
+class ConflictCheckerTests(TestCase):
+    """Cruces de docente, aula y ciclo, indisponibilidad y solicitudes sin conflicto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2111)
+        cls.rooms = {room.name: room for room in Room.objects.all()}
+        # A y B son del ciclo 1, C del ciclo 2; todas las sesiones de 2 h de teoría
+        cls.a = cls._session('A', 1, cls.teachers[1], 'A0', day=1, start=8)
+        cls.b = cls._session('B', 1, cls.teachers[2], 'A1', day=2, start=8)
+        cls.c = cls._session('C', 2, cls.teachers[3], 'A2', day=3, start=10)
+
+    @classmethod
+    def _session(cls, code, cycle, teacher, room, day, start):
+        course = Course.objects.create(code=f'K{code}', name=code, cycle=cycle, theoretical_hours=2, plan=cls.plan)
+        offering = CourseOffering.objects.create(course=course, academic_period=cls.period)
+        group = CourseGroup.objects.create(course_offering=offering, code='1')
+        return Schedule.objects.create(
+            course=course, group=group, teacher=teacher, room=cls.rooms[room], day_of_week=day,
+            start_time=time(start), end_time=time(start + 2), session_type='teoria',
+        )
+
+    def _request(self, request_type='cambio_vacio', schedule=None, **targets):
+        return ScheduleChangeRequest.objects.create(
+            request_type=request_type, schedule=schedule or self.a, requested_by=self.teachers[1], **targets
+        )
+
+    def _conflicts(self, change_request):
+        result = ConflictChecker(self.period.id).evaluate(change_request)
+        return result['feasible'], [(c['type'], c.get('schedule')) for c in result['conflicts']]
+
+    def test_teacher_clash(self):
+        change_request = self._request(target_day=3, target_time=time(10), target_teacher=self.teachers[3])
+        self.assertEqual(self._conflicts(change_request), (False, [('teacher', self.c.id)]))
+
+    def test_room_clash(self):
+        change_request = self._request(target_day=3, target_time=time(11), target_room=self.rooms['A2'])
+        self.assertEqual(self._conflicts(change_request), (False, [('room', self.c.id)]))
+
+    def test_cycle_clash(self):
+        change_request = self._request(target_day=2, target_time=time(9))
+        self.assertEqual(self._conflicts(change_request), (False, [('cycle', self.b.id)]))
+
+    def test_occupied_slot_request_only_reports_the_displacement(self):
+        change_request = self._request('cambio_ocupado', target_day=2, target_time=time(8))
+        self.assertEqual(self._conflicts(change_request), (True, [('cycle', self.b.id)]))
+
+    def test_teacher_unavailability(self):
+        # create_base_data: el docente 0 no está disponible los lunes de 7 a 12
+        change_request = self._request(target_day=0, target_time=time(11), target_teacher=self.teachers[0])
+        self.assertEqual(self._conflicts(change_request), (False, [('unavailability', None)]))
+
+    def test_out_of_range_and_room_type(self):
+        change_request = self._request(target_day=4, target_time=time(21), target_room=self.rooms['L0'])
+        feasible, conflicts = self._conflicts(change_request)
+        self.assertFalse(feasible)
+        self.assertEqual({kind for kind, _ in conflicts}, {'range', 'room_type'})
+
+    def test_request_without_conflicts_is_approvable(self):
+        change_request = self._request(target_day=4, target_time=time(14), target_room=self.rooms['A3'])
+        response = APIClient().get(f'/api/schedule-change-requests/{change_request.pk}/conflicts/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body['feasible'])
+        self.assertEqual(body['conflicts'], [])
+        self.assertEqual(body['target'], {
+            'day': 4, 'start': 14, 'end': 16, 'teacher': self.teachers[1].id, 'room': self.rooms['A3'].id,
+        })
+
+    def test_evaluate_pending_marks_competing_requests(self):
+        first = self._request(target_day=4, target_time=time(14))
+        second = self._request(schedule=self.b, target_day=4, target_time=time(15), target_room=self.rooms['A0'])
+        other = self._request(target_day=0, target_time=time(16))
+        ScheduleChangeRequest.objects.filter(pk=other.pk).update(status='aprobado')
+        non_move = self._request('abrir_grupo')
+        results = {result['request']: result for result in evaluate_pending(self.period.id)}
+        self.assertEqual(set(results), {first.pk, second.pk, non_move.pk})
+        self.assertEqual(results[first.pk]['competing_requests'], [second.pk])
+        self.assertEqual(results[second.pk]['competing_requests'], [first.pk])
+        self.assertIsNone(results[non_move.pk]['feasible'])
+
+    def test_evaluate_endpoint_query_count_does_not_grow_with_requests(self):
+        client = APIClient()
+
+        def evaluate():
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get('/api/schedule-change-requests/evaluate/', {'period': self.period.id})
+            self.assertEqual(response.status_code, 200)
+            return response.json()['count'], len(ctx.captured_queries)
+
+        for hour in (8, 9, 10):
+            self._request(target_day=4, target_time=time(hour))
+        few = evaluate()
+        for hour in range(11, 20):
+            self._request(target_day=4, target_time=time(hour), target_teacher=self.teachers[hour % 6])
+        many = evaluate()
+        self.assertEqual((few[0], many[0]), (3, 12))
+        self.assertEqual(few[1], many[1])
+        self.assertEqual(client.get('/api/schedule-change-requests/evaluate/', {'period': 'x'}).status_code, 400)
+
+
+class PeriodBootstrapTests(TestCase):
+    """Al crear un periodo se abren las ofertas de la transición entre planes en bloque."""
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = Faculty.objects.create(name='FISI')
+        cls.school = School.objects.create(name='Ingeniería de Sistemas', faculty=faculty)
+        cls.old = Plan.objects.create(name='Plan 2015', school=cls.school, start_year=2015)
+        cls.new = Plan.objects.create(name='Plan 2020', school=cls.school, start_year=2020)
+
+    def _add_courses(self, per_cycle, prefix):
+        Course.objects.bulk_create([
+            Course(code=f'{prefix}{plan.start_year}{cycle:02d}{i}', name='Curso', cycle=cycle, plan=plan)
+            for plan in (self.old, self.new) for cycle in range(1, 11) for i in range(per_cycle)
+        ])
+
+    def _create_period(self, year, period):
+        with CaptureQueriesContext(connection) as ctx:
+            instance = create_period(year, period)
+        return instance, len(ctx.captured_queries)
+
+    def _expected(self, ciclo_nuevo):
+        return {
+            'normal': set(Course.objects.filter(plan=self.new, cycle__lte=ciclo_nuevo).values_list('id', flat=True))
+            | set(Course.objects.filter(plan=self.old, cycle__gt=ciclo_nuevo).values_list('id', flat=True)),
+            'nivelacion': set(Course.objects.filter(plan=self.old, cycle=ciclo_nuevo - 1).values_list('id', flat=True)),
+        }
+
+    def _opened(self, period):
+        opened = {'normal': set(), 'nivelacion': set()}
+        for course_id, offering_type in CourseOffering.objects.filter(academic_period=period).values_list(
+            'course_id', 'offering_type'
+        ):
+            opened[offering_type].add(course_id)
+        return opened
+
+    def test_opens_expected_offerings_with_fixed_queries(self):
+        self._add_courses(1, 'P')
+        small, small_queries = self._create_period(2021, 'I')   # ciclo nuevo 3
+        self.assertEqual(self._opened(small), self._expected(3))
+        self._add_courses(6, 'Q')
+        large, large_queries = self._create_period(2021, 'II')  # ciclo nuevo 4
+        self.assertEqual(small_queries, large_queries)
+
+        self.assertEqual(self._opened(large), self._expected(4))
+        self.assertEqual(CourseOffering.objects.filter(academic_period=large).count(), 7 * 11)
+        groups = CourseGroup.objects.filter(course_offering__academic_period=large)
+        self.assertEqual(groups.count(), 7 * 11)
+        self.assertEqual(set(groups.values_list('code', flat=True)), {'1'})
+        self.old.refresh_from_db()
+        self.assertTrue(self.old.is_active)
+
+    def test_running_bootstrap_twice_creates_no_duplicates(self):
+        self._add_courses(2, 'R')
+        period, _ = self._create_period(2021, 'I')
+        # Una oferta con configuración de grupos propia no recibe el grupo por defecto
+        configured = CourseOffering.objects.filter(academic_period=period).first()
+        configured.groups.all().delete()
+        CourseGroupConfig.objects.bulk_create([CourseGroupConfig(course_offering=configured, num_groups=2)])
+        offerings = CourseOffering.objects.filter(academic_period=period).count()
+        groups = CourseGroup.objects.filter(course_offering__academic_period=period).count()
+
+        targets = period_offering_targets(period)[0]
+        self.assertEqual(bootstrap_offerings(period, targets), (0, 0))
+        self.assertEqual(CourseOffering.objects.filter(academic_period=period).count(), offerings)
+        self.assertEqual(CourseGroup.objects.filter(course_offering__academic_period=period).count(), groups)
+        self.assertFalse(configured.groups.exists())
+
+    def test_last_cycle_deactivates_the_old_plan(self):
+        self._add_courses(1, 'S')
+        period, _ = self._create_period(2024, 'II')  # ciclo nuevo 10
+        self.old.refresh_from_db()
+        self.assertFalse(self.old.is_active)
+        self.assertEqual(self.old.end_year, 2024)
+        self.assertEqual(self._opened(period), self._expected(10))
+
+
+class IncrementalUnavailabilityTests(TestCase):
+    """Modo incremental: si cambia la disponibilidad de un docente solo se mueven sus grupos en conflicto."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2121)
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=10, groups_per_course=1, prefix='U')
+        AlgorithmScheduler(cls.period.id, seed=1).generate()
+
+    def _rows(self):
+        return {
+            row[0]: row[1:] for row in Schedule.objects.filter(
+                group__course_offering__academic_period=self.period
+            ).values_list('id', 'group_id', 'teacher_id', 'day_of_week', 'start_time', 'end_time', 'room_id')
+        }
+
+    def test_only_groups_clashing_with_new_unavailability_are_moved(self):
+        before = self._rows()
+        # La primera sesión del docente 2 queda dentro de su nueva indisponibilidad
+        _, teacher_id, day, start, end, _ = min(row for row in before.values() if row[1] == self.teachers[2].id)
+        TeacherUnavailability.objects.create(teacher_id=teacher_id, day=DAYS_MAP[day], start_time=start, end_time=end)
+        clashing = {
+            group_id for group_id, t_id, d, s, e, _ in before.values()
+            if t_id == teacher_id and d == day and s < end and start < e
+        }
+        self.assertTrue(clashing)
+
+        report = AlgorithmScheduler(self.period.id, seed=1).generate_incremental()
+        after = self._rows()
+        self.assertEqual(report['errors'], [])
+        groups = CourseGroup.objects.filter(course_offering__academic_period=self.period).count()
+        self.assertEqual(report['kept'], groups - len(clashing))
+        self.assertEqual(len(report['moved']), len(clashing))
+
+        # Las filas de los demás grupos siguen intactas (mismo id y mismos datos)
+        kept = {sid: row for sid, row in before.items() if row[0] not in clashing}
+        self.assertEqual({sid: after.get(sid) for sid in kept}, kept)
+        # Los grupos movidos tienen sesiones nuevas fuera de la indisponibilidad
+        for sid, (group_id, t_id, d, s, e, _) in after.items():
+            if group_id in clashing:
+                self.assertNotIn(sid, before)
+                self.assertFalse(t_id == teacher_id and d == day and s < end and start < e)
+        self.assertEqual({row[0] for row in after.values()}, {row[0] for row in before.values()})
+
+
+@skipIf(Workbook is None, 'openpyxl no instalado')
+class TimetableExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2131)
+        create_offerings(cls.plan, cls.teachers, cls.period, num_courses=8, groups_per_course=1, prefix='E')
+        AlgorithmScheduler(cls.period.id, seed=1).generate()
+
+    def _sheets(self, by):
+        output = io.BytesIO()
+        write_xlsx(self.period.id, output, by=by)
+        output.seek(0)
+        workbook = load_workbook(output, read_only=True)
+        sheets = {sheet.title: list(sheet.iter_rows(min_row=2, values_only=True)) for sheet in workbook.worksheets}
+        workbook.close()
+        return sheets
+
+    def test_homonymous_teachers_get_separate_sheets(self):
+        sessions = Schedule.objects.filter(group__course_offering__academic_period=self.period)
+        with_sessions = [t for t in self.teachers if sessions.filter(teacher=t).exists()][:2]
+        self.assertEqual(len(with_sessions), 2)
+        for teacher in with_sessions:
+            Person.objects.filter(pk=teacher.person_id).update(first_name='Ana', last_name='Quispe')
+
+        sheets = self._sheets('teacher')
+        self.assertEqual(
+            [len(sheets['Ana Quispe']), len(sheets['Ana Quispe (2)'])],
+            [sessions.filter(teacher=t).count() for t in sorted(with_sessions, key=lambda t: t.id)],
+        )
+        self.assertEqual(len([title for title in sheets if title.startswith('Ana Quispe')]), 2)
+        self.assertEqual(sum(len(rows) for title, rows in sheets.items() if title != 'No asignados'), sessions.count())
+
+    def test_cycle_sheets_and_csv_bom(self):
+        sheets = self._sheets('cycle')
+        cycles = sorted(set(Schedule.objects.filter(
+            group__course_offering__academic_period=self.period
+        ).values_list('course__cycle', flat=True)))
+        self.assertEqual(list(sheets), [f'Ciclo {c}' for c in cycles] + ['No asignados'])
+        first = next(iter(timetable_csv(self.period.id)))
+        self.assertTrue(first.startswith('\ufeffCiclo,'))
+
+
+class ImprovementPhaseTests(TestCase):
+    """Fase de mejora: cadenas de expulsión sobre la pasada greedy, en memoria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, teachers = create_base_data()
+        cls.period = create_period(2141)
+        # Una sola franja de 2 h por día (8-10)
+        GeneralScheduleConfig.objects.create(day_name='lunes', start_time=time(8), end_time=time(10))
+        shared, spare = teachers[1], teachers[2]
+        # El docente compartido solo puede el lunes; el de reemplazo, cualquier día menos el lunes
+        for day in ('tue', 'wed', 'thu', 'fri', 'sat'):
+            TeacherUnavailability.objects.create(teacher=shared, day=day, start_time=time(7), end_time=time(22))
+        TeacherUnavailability.objects.create(teacher=spare, day='mon', start_time=time(7), end_time=time(22))
+
+        def course(code, cycle, teachers_, monday=False):
+            course = Course.objects.create(code=code, name=code, cycle=cycle, theoretical_hours=2, plan=cls.plan)
+            for teacher in teachers_:
+                CourseTeacherPreference.objects.create(course=course, teacher=teacher)
+            if monday:
+                CourseDayPreference.objects.create(course=course, day='mon')
+            offering = CourseOffering.objects.create(course=course, academic_period=cls.period)
+            CourseGroup.objects.create(course_offering=offering, code='1')
+
+        # X va primero (ciclo mayor) y prefiere el lunes: toma al docente compartido y deja
+        # fuera a Y y Z, que solo tienen a ese docente. Moviendo X al reemplazo entra uno de ellos
+        course('MX', 3, [shared, spare], monday=True)
+        course('MY', 2, [shared])
+        course('MZ', 1, [shared])
+
+    def _greedy(self):
+        scheduler = AlgorithmScheduler(self.period.id, seed=1)
+        report = scheduler._run_search()
+        self.assertEqual(report['created'], ['MX - G1'])
+        return scheduler, report
+
+    def test_places_a_group_left_out_without_touching_the_db(self):
+        scheduler, report = self._greedy()
+        with self.assertNumQueries(0):
+            scheduler._improve(5, report, max_iterations=20)
+        self.assertEqual(report['improvement']['placed_before'], 1)
+        self.assertEqual(report['improvement']['placed_after'], 2)
+        self.assertIn('MX - G1', report['created'])
+        self.assertEqual(len(report['errors']), 1)
+        self.assertFalse(Schedule.objects.exists())
+        self.assertEqual(len(scheduler._pending_schedules), 2)
+
+    def test_stops_at_max_iterations(self):
+        scheduler, report = self._greedy()
+        scheduler._improve(60, report, max_iterations=7)
+        self.assertEqual(report['improvement']['iterations'], 7)
+
+    def test_stops_at_time_limit(self):
+        scheduler, report = self._greedy()
+        scheduler._improve(0.05, report)
+        # Y y Z no entran a la vez: sin la cota de tiempo el bucle no terminaría
+        self.assertGreater(report['improvement']['iterations'], 0)
+        self.assertLess(report['improvement']['seconds'], 1)
+        self.assertEqual(report['improvement']['placed_after'], 2)
+
+    def test_generate_saves_the_improved_schedule(self):
+        report = AlgorithmScheduler(self.period.id, seed=1).generate(improve_seconds=0.2)
+        self.assertEqual(len(report['created']), 2)
+        self.assertEqual(
+            Schedule.objects.filter(group__course_offering__academic_period=self.period).values('group').distinct().count(), 2
+        )
+
+
+class _ExhaustiveCheck(AlgorithmScheduler):
+    """Compara cada búsqueda podada con la mejor combinación factible sin poda."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked = []
+
+    def _exhaustive(self, group, total_duration, structure, force_teacher, temp_occupied):
+        course = group.course
+        teachers = self._get_teacher_candidates(course) if force_teacher is None else [force_teacher]
+        teacher_occ, room_occ, cycle_occ = temp_occupied
+        best = None
+        for day in self.days_indices:
+            for start_h in self.time_slots:
+                if start_h > self.time_slots[-1] + 1 - total_duration:
+                    break
+                for teacher in teachers:
+                    # Mismos sorteos de ruido y en el mismo orden que la búsqueda real
+                    score = (self._score_day(course, day) + self._score_shift(course, start_h)
+                             + self._score_teacher(course, teacher) + self.rng.uniform(0, SCORE_NOISE))
+                    block = hours_mask(start_h, total_duration)
+                    if not cycle_occ.is_free(course.cycle, day, block):
+                        continue
+                    if teacher is not None and not teacher_occ.is_free(teacher, day, block):
+                        continue
+                    offset = 0
+                    feasible = True
+                    for s_type, s_dur in structure:
+                        req_type = self._required_room_type(course, s_type)
+                        if req_type and not self._best_free_room(req_type, day, hours_mask(start_h + offset, s_dur), group, room_occ):
+                            feasible = False
+                            break
+                        offset += s_dur
+                    if feasible and (best is None or score > best[0]):
+                        best = (score, day, start_h, teacher)
+        return best and best[1:]
+
+    def _find_best_slot_and_assign(self, group, total_duration, structure, diagnostics=None, force_teacher=None, temp_occupied=None, proposals=None):
+        state = self.rng.getstate()
+        expected = self._exhaustive(group, total_duration, structure, force_teacher, temp_occupied)
+        self.rng.setstate(state)
+        ok = super()._find_best_slot_and_assign(
+            group, total_duration, structure, diagnostics, force_teacher, temp_occupied, proposals
+        )
+        chosen = None
+        if ok:
+            proposal = proposals[-1]
+            chosen = (proposal['day'], proposal['allocation'][0]['start'], proposal['teacher'])
+        self.checked.append((expected, chosen))
+        return ok
+
+
+class SearchPruningTests(TestCase):
+    """Poda por cota y tope de candidatos en ``_find_best_slot_and_assign``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, cls.teachers = create_base_data()
+        cls.period = create_period(2151)
+        create_offerings(cls.plan, cls.teachers, cls.period, 12, groups_per_course=2)
+
+    def test_pruning_matches_the_exhaustive_search(self):
+        scheduler = _ExhaustiveCheck(self.period.id, seed=3)
+        scheduler._run_search()
+        self.assertGreater(len(scheduler.checked), 0)
+        self.assertTrue(any(chosen for _, chosen in scheduler.checked))
+        for expected, chosen in scheduler.checked:
+            self.assertEqual(chosen, expected)
+        self.assertGreater(scheduler.search_stats['pruned'], 0)
+        # Con la poda solo se evalúa una fracción de las combinaciones
+        self.assertLess(scheduler.search_stats['evaluated'], scheduler.search_stats['pruned'])
+
+    def test_candidate_cap_stops_the_search_and_is_counted(self):
+        teacher = self.teachers[3]
+        # El docente no puede el lunes, justo el día preferido: las mejores combinaciones fallan
+        TeacherUnavailability.objects.create(teacher=teacher, day='mon', start_time=time(7), end_time=time(22))
+        course = Course.objects.create(code='CAP1', name='Tope', cycle=9, theoretical_hours=2, plan=self.plan)
+        CourseTeacherPreference.objects.create(course=course, teacher=teacher)
+        CourseDayPreference.objects.create(course=course, day='mon')
+        offering = CourseOffering.objects.create(course=course, academic_period=self.period)
+        CourseGroup.objects.create(course_offering=offering, code='1')
+
+        capped = AlgorithmScheduler(self.period.id, seed=1, max_candidates=3)
+        capped.prepare_environment()
+        group = next(g for g in capped.groups if g.course.code == 'CAP1')
+        ok, diag = capped._process_group(group, diagnostics=True)
+        self.assertFalse(ok)
+        self.assertEqual(capped.search_stats['evaluated'], 3)
+        self.assertGreater(capped.search_stats['capped'], 0)
+        self.assertEqual(diag.count('limite'), capped.search_stats['capped'])
+        self.assertEqual(diag.count('docente'), 3)
+
+        free = AlgorithmScheduler(self.period.id, seed=1)
+        free.prepare_environment()
+        ok, _ = free._process_group(next(g for g in free.groups if g.course.code == 'CAP1'))
+        self.assertTrue(ok)
+        self.assertEqual(free.search_stats['capped'], 0)
+        self.assertGreater(free.search_stats['evaluated'], 3)
+
+
+class GroupDiagnosticsTests(TestCase):
+    """Motivos agregados de un grupo que no entra en ninguna combinación."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, teachers = create_base_data()
+        cls.period = create_period(2161)
+        # Una sola franja de 2 h por día (8-10): seis combinaciones, una por día
+        GeneralScheduleConfig.objects.create(day_name='lunes', start_time=time(8), end_time=time(10))
+        cls.teacher = teachers[4]
+        for day in ('mon', 'tue'):
+            TeacherUnavailability.objects.create(teacher=cls.teacher, day=day, start_time=time(7), end_time=time(22))
+        cls.course = Course.objects.create(code='DG1', name='Diagnóstico', cycle=7, theoretical_hours=2, plan=cls.plan)
+        CourseTeacherPreference.objects.create(course=cls.course, teacher=cls.teacher)
+        offering = CourseOffering.objects.create(course=cls.course, academic_period=cls.period)
+        CourseGroup.objects.create(course_offering=offering, code='1')
+
+    def _diagnostics(self):
+        scheduler = AlgorithmScheduler(self.period.id, seed=1)
+        scheduler.prepare_environment()
+        block = hours_mask(8, 2)
+        # Miércoles y jueves: el ciclo ya tiene clase; viernes y sábado: todas las aulas ocupadas
+        for day in (2, 3):
+            scheduler.cycle_occupied.occupy(7, day, block)
+        for day in (4, 5):
+            for room in scheduler.snapshot.rooms:
+                if room.room_type == 'aula':
+                    scheduler.room_occupied.occupy(room.id, day, block)
+        group = scheduler.groups[0]
+        ok, diag = scheduler._process_group(group, diagnostics=True)
+        self.assertFalse(ok)
+        return diag
+
+    def test_counts_each_reason(self):
+        diag = self._diagnostics()
+        self.assertEqual(diag.count('docente'), 2)
+        self.assertEqual(diag.count('ciclo'), 2)
+        self.assertEqual(diag.count('aula'), 2)
+        self.assertEqual(diag.count('limite'), 0)
+        self.assertEqual(diag.notes, ['No hay docente preferido disponible'])
+
+    def test_to_dict(self):
+        data = self._diagnostics().to_dict()
+        self.assertEqual(data['group'], 'DG1 - G1')
+        reasons = {reason['category']: reason for reason in data['reasons']}
+        self.assertEqual(set(reasons), {'docente', 'ciclo', 'aula'})
+        self.assertEqual(reasons['docente']['target'], self.teacher.id)
+        self.assertEqual(reasons['docente']['cells'], {'0': [8, 9], '1': [8, 9]})
+        self.assertEqual(reasons['ciclo']['cells'], {'2': [8, 9], '3': [8, 9]})
+        self.assertEqual(reasons['aula']['target'][0], 'aula')
+        self.assertEqual(reasons['aula']['cells'], {'4': [8, 9], '5': [8, 9]})
+        self.assertEqual(data['notes'], ['No hay docente preferido disponible'])
+        self.assertEqual(data['text'], str(self._diagnostics()))
+
+    def test_str_and_repr(self):
+        diag = self._diagnostics()
+        text = str(diag)
+        self.assertTrue(text.startswith('DG1 - G1: No hay docente preferido disponible; '))
+        self.assertIn('Docente ocupado Docente4', text)
+        self.assertIn('(2): Lun 8-10h, Mar 8-10h', text)
+        self.assertIn('Cruce de ciclo (2): Mié 8-10h, Jue 8-10h', text)
+        self.assertIn('No hay aula/lab libre tipo aula', text)
+        self.assertIn('Vie 8-10h, Sáb 8-10h', text)
+        # El reporte impreso como dict muestra el texto, no la dirección del objeto
+        self.assertIn(text, repr({'diagnostics': [diag]}))
+
+
+class RoomIndexTests(TestCase):
+    """Best-fit sobre el índice de aulas ordenado por capacidad."""
+
+    def setUp(self):
+        self.rooms = [
+            RoomInfo(1, 'A60', 'aula', 60, 1, 'CU', 'A60'),
+            RoomInfo(2, 'A40b', 'aula', 40, 1, 'CU', 'A40b'),
+            RoomInfo(3, 'A30', 'aula', 30, 1, 'CU', 'A30'),
+            RoomInfo(4, 'A40a', 'aula', 40, 1, 'CU', 'A40a'),
+            RoomInfo(5, 'L50', 'laboratorio', 50, 1, 'CU', 'L50'),
+        ]
+        self.index = RoomIndex(self.rooms)
+        self.block = hours_mask(8, 2)
+
+    def test_returns_the_smallest_free_room_with_enough_capacity(self):
+        occupied = OccupancyGrid()
+        room = self.index.best_fit('aula', 35, 0, self.block, occupied)
+        # Entre las de 40, la de menor id; nunca la de 30 (no alcanza) ni la de 60
+        self.assertEqual(room.id, 2)
+        self.assertEqual(self.index.best_fit('aula', 30, 0, self.block, occupied).id, 3)
+        self.assertEqual([r.id for r in self.index.candidates('aula', 35)], [2, 4, 1])
+
+    def test_falls_back_to_the_next_free_room(self):
+        occupied = OccupancyGrid()
+        stats = Counter()
+        occupied.occupy(2, 0, hours_mask(9, 1))
+        self.assertEqual(self.index.best_fit('aula', 35, 0, self.block, occupied, stats).id, 4)
+        self.assertEqual(stats['rooms_scanned'], 2)
+        occupied.occupy(4, 0, self.block)
+        self.assertEqual(self.index.best_fit('aula', 35, 0, self.block, occupied).id, 1)
+        # Otro día o un bloque sin cruce vuelven a la más ajustada
+        self.assertEqual(self.index.best_fit('aula', 35, 1, self.block, occupied).id, 2)
+        self.assertEqual(self.index.best_fit('aula', 35, 0, hours_mask(10, 2), occupied).id, 2)
+
+    def test_no_room_when_everything_is_full_or_too_small(self):
+        occupied = OccupancyGrid()
+        stats = Counter()
+        self.assertIsNone(self.index.best_fit('aula', 61, 0, self.block, occupied, stats))
+        self.assertEqual(stats['rooms_scanned'], 0)
+        for room_id in (1, 2, 4):
+            occupied.occupy(room_id, 0, self.block)
+        self.assertIsNone(self.index.best_fit('aula', 35, 0, self.block, occupied, stats))
+        self.assertEqual(stats['rooms_scanned'], 3)
+        self.assertIsNone(self.index.best_fit('auditorio', 1, 0, self.block, occupied))
+        self.assertEqual(self.index.best_fit('laboratorio', 35, 0, self.block, occupied).id, 5)
+        self.assertEqual(self.index.max_capacity('aula'), 60)
+        self.assertEqual(self.index.max_capacity('auditorio'), 0)
+
+
+class MultiStartTests(TestCase):
+    """Semillas reproducibles y elección de la mejor pasada del multi-start."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, teachers = create_base_data()
+        cls.period = create_period(2171)
+        create_offerings(cls.plan, teachers, cls.period, 30, groups_per_course=2)
+
+    @staticmethod
+    def _sessions(schedules):
+        return sorted(
+            (s.group_id, s.day_of_week, s.start_time, s.end_time, s.teacher_id, s.room_id, s.session_type)
+            for s in schedules
+        )
+
+    def _pass(self, seed):
+        scheduler = AlgorithmScheduler(self.period.id, seed=seed)
+        report = scheduler._run_search()
+        return report, self._sessions(scheduler._pending_schedules)
+
+    def test_same_seed_gives_the_same_schedule(self):
+        report, sessions = self._pass(7)
+        again, again_sessions = self._pass(7)
+        self.assertEqual(sessions, again_sessions)
+        self.assertEqual(report['created'], again['created'])
+        self.assertEqual(report['score'], again['score'])
+        # En un proceso del pool la pasada da lo mismo que en memoria
+        start = _run_start(AlgorithmScheduler(self.period.id).snapshot, 7)
+        self.assertEqual(start, {'seed': 7, 'placed': len(report['created']), 'score': report['score']})
+        _, other_sessions = self._pass(8)
+        self.assertNotEqual(sessions, other_sessions)
+
+    def test_saves_the_best_start(self):
+        report = AlgorithmScheduler(self.period.id, seed=20).generate(starts=4, workers=2)
+        starts = report['starts']
+        self.assertEqual([s['seed'] for s in starts], [20, 21, 22, 23])
+        best = max(starts, key=lambda s: (s['placed'], s['score']))
+        self.assertEqual(report['seed'], best['seed'])
+        self.assertEqual(len(report['created']), best['placed'])
+        self.assertEqual(report['score'], best['score'])
+        # Lo guardado es exactamente la pasada de la semilla ganadora
+        _, expected = self._pass(best['seed'])
+        saved = Schedule.objects.filter(group__course_offering__academic_period=self.period)
+        self.assertEqual(self._sessions(saved), expected)
+
+
+class DynamicOrderTests(TestCase):
+    """Orden "más restringido primero" y su actualización tras agendar un grupo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, teachers = create_base_data()
+        cls.period = create_period(2181)
+        # Una sola franja de 2 h por día (8-10): una opción por día y docente
+        GeneralScheduleConfig.objects.create(day_name='lunes', start_time=time(8), end_time=time(10))
+        shared, late, early = teachers[1], teachers[2], teachers[3]
+
+        def unavailable(teacher, days):
+            for day in days:
+                TeacherUnavailability.objects.create(teacher=teacher, day=day, start_time=time(7), end_time=time(22))
+
+        unavailable(shared, ('wed', 'thu', 'fri', 'sat'))  # lun y mar
+        unavailable(late, ('mon', 'tue'))                  # mié a sáb
+        unavailable(early, ('thu', 'fri', 'sat'))          # lun a mié
+
+        def course(code, cycle, teachers_):
+            course = Course.objects.create(code=code, name=code, cycle=cycle, theoretical_hours=2, plan=cls.plan)
+            for teacher in teachers_:
+                CourseTeacherPreference.objects.create(course=course, teacher=teacher)
+            offering = CourseOffering.objects.create(course=course, academic_period=cls.period)
+            CourseGroup.objects.create(course_offering=offering, code='1')
+
+        course('DA', 1, [shared])          # 2 opciones
+        course('DB', 3, [late])            # 4 opciones
+        course('DC', 1, [shared, early])   # 5 opciones; comparte ciclo y docente con DA
+
+    def setUp(self):
+        self.scheduler = AlgorithmScheduler(self.period.id, seed=1, ordering='dynamic')
+        self.scheduler.prepare_environment()
+        self.groups = {g.course.code: g for g in self.scheduler.groups}
+
+    def test_pops_the_most_constrained_group_first(self):
+        order = DynamicOrder(self.scheduler, self.scheduler.groups)
+        self.assertEqual(
+            {code: order.count(group.id) for code, group in self.groups.items()}, {'DA': 2, 'DB': 4, 'DC': 5}
+        )
+        # El orden estático empezaría por el ciclo mayor
+        self.assertEqual(self.scheduler._search_order(self.scheduler.groups)[0].course.code, 'DB')
+        self.assertEqual(order.pop().course.code, 'DA')
+
+    def test_reranks_after_a_placement(self):
+        order = DynamicOrder(self.scheduler, self.scheduler.groups)
+        first = order.pop()
+        ok, _ = self.scheduler._process_group(first)
+        self.assertTrue(ok)
+        order.placed(first, self.scheduler.placements[first.id])
+        # DC pierde el día que DA tomó (mismo ciclo) y pasa delante de DB
+        self.assertEqual(order.count(self.groups['DC'].id), 3)
+        self.assertEqual(order.count(self.groups['DB'].id), 4)
+        self.assertEqual([order.pop().course.code, order.pop().course.code], ['DC', 'DB'])
+        self.assertIsNone(order.pop())
+
+    def test_dynamic_search_places_every_group(self):
+        report = self.scheduler._run_search()
+        self.assertEqual(report['created'], ['DA - G1', 'DC - G1', 'DB - G1'])
+
+
+class OccupancyOverlayTests(TestCase):
+    """Las capas temporales no escriben en la ocupación base hasta ``commit``."""
+
+    def setUp(self):
+        self.base = OccupancyGrid()
+        self.base.occupy(1, 0, hours_mask(8, 2))
+
+    def test_overlay_writes_stay_in_the_layer(self):
+        layer = self.base.overlay()
+        layer.occupy(1, 0, hours_mask(10, 2))
+        layer.occupy(2, 3, hours_mask(7, 1))
+        self.assertEqual(layer.mask(1, 0), hours_mask(8, 4))
+        self.assertFalse(layer.is_free(2, 3, hours_mask(7, 1)))
+        self.assertEqual(self.base.mask(1, 0), hours_mask(8, 2))
+        self.assertTrue(self.base.is_free(2, 3, hours_mask(7, 1)))
+        # Liberar en la capa no toca las horas de la base
+        layer.release(1, 0, hours_mask(8, 4))
+        self.assertEqual(layer.mask(1, 0), hours_mask(8, 2))
+        self.assertEqual(self.base.mask(1, 0), hours_mask(8, 2))
+        # Una capa descartada no deja rastro en los espacios libres
+        rooms = [RoomInfo(1, 'A1', 'aula', 40, 1, 'CU', 'A1'), RoomInfo(2, 'A2', 'aula', 40, 1, 'CU', 'A2')]
+        free = VacancyMap.from_occupancy(rooms, self.base, [0, 3], list(range(7, 22))).free
+        self.assertEqual(free, {1: {0: [(7, 8), (10, 22)], 3: [(7, 22)]}, 2: {0: [(7, 22)], 3: [(7, 22)]}})
+
+    def test_nested_overlays_and_commit(self):
+        outer = self.base.overlay()
+        inner = outer.overlay()
+        inner.occupy(1, 0, hours_mask(12, 1))
+        self.assertEqual(outer.mask(1, 0), hours_mask(8, 2))
+        inner.commit()
+        self.assertEqual(list(inner.items()), [])
+        self.assertEqual(outer.mask(1, 0), hours_mask(8, 2) | hours_mask(12, 1))
+        self.assertEqual(self.base.mask(1, 0), hours_mask(8, 2))
+        outer.commit()
+        self.assertEqual(self.base.mask(1, 0), hours_mask(8, 2) | hours_mask(12, 1))
+
+    def test_copy_is_independent(self):
+        layer = self.base.overlay()
+        layer.occupy(1, 1, hours_mask(9, 1))
+        snapshot = layer.copy()
+        layer.occupy(1, 1, hours_mask(15, 1))
+        self.assertEqual(snapshot.mask(1, 1), hours_mask(9, 1))
+        snapshot.occupy(1, 2, hours_mask(9, 1))
+        self.assertTrue(layer.is_free(1, 2, hours_mask(9, 1)))
+
+    def test_failed_group_leaves_the_global_grids_untouched(self):
+        plan, teachers = create_base_data()
+        period = create_period(2191)
+        course = Course.objects.create(
+            code='OV1', name='Capa', cycle=2, theoretical_hours=2, practical_hours=2, plan=plan, requires_lab=True
+        )
+        CourseSessionPolicy.objects.create(course=course, mode='separadas')
+        CourseTeacherPreference.objects.create(course=course, teacher=teachers[2])
+        offering = CourseOffering.objects.create(course=course, academic_period=period)
+        CourseGroup.objects.create(course_offering=offering, code='1')
+        scheduler = AlgorithmScheduler(period.id, seed=1)
+        scheduler.prepare_environment()
+        # Sin laboratorios libres la teoría se reserva en la capa y la práctica falla
+        for room in scheduler.snapshot.rooms:
+            if room.room_type == 'laboratorio':
+                for day in scheduler.days_indices:
+                    scheduler.room_occupied.occupy(room.id, day, hours_mask(0, 24))
+        grids = [dict(grid.items()) for grid in (scheduler.teacher_occupied, scheduler.room_occupied, scheduler.cycle_occupied)]
+        ok, _ = scheduler._process_group(scheduler.groups[0])
+        self.assertFalse(ok)
+        self.assertGreater(scheduler.search_stats['evaluated'], 1)
+        self.assertEqual(
+            [dict(grid.items()) for grid in (scheduler.teacher_occupied, scheduler.room_occupied, scheduler.cycle_occupied)],
+            grids,
+        )
+        self.assertEqual(scheduler._pending_schedules, [])
+
+
+class ProfilerTests(TestCase):
+    """Tiempos, llamadas y consultas por fase; sin perfil, nada se mide."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan, teachers = create_base_data()
+        cls.period = create_period(2201)
+        create_offerings(cls.plan, teachers, cls.period, 6)
+
+    def test_phases_count_calls_and_nested_queries(self):
+        profiler = Profiler()
+        with profiler.phase('outer'):
+            Plan.objects.count()
+            with profiler.phase('inner'):
+                Plan.objects.count()
+                Room.objects.count()
+            with profiler.phase('inner'):
+                pass
+        profiler.count('choques')
+        profiler.count('choques', 2)
+        data = profiler.to_dict()
+        self.assertEqual(data['phases']['outer']['calls'], 1)
+        self.assertEqual(data['phases']['inner']['calls'], 2)
+        # Inclusivas: las consultas de la fase anidada también suman a la externa
+        self.assertEqual(data['phases']['outer']['queries'], 3)
+        self.assertEqual(data['phases']['inner']['queries'], 2)
+        self.assertGreaterEqual(data['phases']['outer']['seconds'], data['phases']['inner']['seconds'])
+        self.assertEqual(data['counters'], {'queries': 3, 'choques': 3})
+        # Fuera de una fase las consultas ya no se cuentan
+        Plan.objects.count()
+        self.assertEqual(profiler.counters['queries'], 3)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_generate_attaches_the_profile(self):
+        scheduler = AlgorithmScheduler(self.period.id, seed=1, profile=True)
+        report = scheduler.generate()
+        profile = report['profile']
+        self.assertEqual(profile['phases']['search']['calls'], 1)
+        self.assertEqual(profile['phases']['save']['calls'], 1)
+        self.assertGreater(profile['phases']['save']['queries'], 0)
+        # La búsqueda es en memoria
+        self.assertEqual(profile['phases']['search']['queries'], 0)
+        counters = profile['counters']
+        self.assertEqual(counters['slots_evaluated'], report['search']['evaluated'])
+        self.assertEqual(counters['slots_pruned'], report['search']['pruned'])
+        self.assertEqual(counters['commits'], sum(len(proposals) for proposals in scheduler.placements.values()))
+        self.assertGreater(counters['room_probes'], 0)
+
+    def test_disabled_profiler_is_a_no_op(self):
+        scheduler = AlgorithmScheduler(self.period.id, seed=1)
+        self.assertIs(scheduler.profiler, NULL_PROFILER)
+        with NULL_PROFILER.phase('search'):
+            self.assertEqual(connection.execute_wrappers, [])
+        NULL_PROFILER.count('choques')
+        self.assertIsNone(NULL_PROFILER.to_dict())
+        report = scheduler.generate()
+        self.assertNotIn('profile', report)
+        self.assertEqual(len(report['created']), 6)
+
+
+class VacancyMapTests(TestCase):
+    """Intervalos libres: filtros y paginación, en memoria y desde el reporte de un trabajo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rooms = [
+            RoomInfo(1, 'A1', 'aula', 40, 1, 'CU', 'A1'),
+            RoomInfo(2, 'L1', 'laboratorio', 25, 1, 'CU', 'L1'),
+            RoomInfo(3, 'A2', 'aula', 60, 2, 'Anexo', 'A2'),
+        ]
+        occupied = OccupancyGrid()
+        occupied.occupy(1, 0, hours_mask(9, 2))    # A1 lunes: 7-9 y 11-13
+        occupied.occupy(2, 1, hours_mask(7, 6))    # L1 martes: sin espacios
+        occupied.occupy(3, 0, hours_mask(12, 1))   # A2 lunes: 7-12
+        cls.vacancies = VacancyMap.from_occupancy(cls.rooms, occupied, [0, 1], list(range(7, 13)))
+
+    def _intervals(self, **filters):
+        return [(room_id, day, start, end) for room_id, _, day, start, end in self.vacancies.filter(**filters)]
+
+    def test_intervals_and_filters(self):
+        self.assertEqual(self._intervals(), [
+            (1, 0, 7, 9), (1, 0, 11, 13), (1, 1, 7, 13), (2, 0, 7, 13), (3, 0, 7, 12), (3, 1, 7, 13),
+        ])
+        self.assertEqual(self._intervals(room_type='laboratorio'), [(2, 0, 7, 13)])
+        self.assertEqual(self._intervals(day=1), [(1, 1, 7, 13), (3, 1, 7, 13)])
+        self.assertEqual(self._intervals(min_capacity=50), [(3, 0, 7, 12), (3, 1, 7, 13)])
+        # La sede se filtra por id o por nombre
+        self.assertEqual(self._intervals(site='Anexo'), self._intervals(site=2))
+        self.assertEqual(self._intervals(site='CU', room_type='aula', day=0), [(1, 0, 7, 9), (1, 0, 11, 13)])
+        self.assertEqual(self.vacancies.total_hours(), 2 + 2 + 6 + 6 + 5 + 6)
+
+    def test_pages(self):
+        first = self.vacancies.page(page=1, page_size=4)
+        self.assertEqual(first['count'], 6)
+        self.assertEqual([(r['room'], r['day'], r['start']) for r in first['results']], [
+            ('A1', 0, 7), ('A1', 0, 11), ('A1', 1, 7), ('L1', 0, 7),
+        ])
+        second = self.vacancies.page(page=2, page_size=4)
+        self.assertEqual([(r['room'], r['day'], r['start'], r['end']) for r in second['results']], [
+            ('A2', 0, 7, 12), ('A2', 1, 7, 13),
+        ])
+        self.assertEqual(second['results'][0]['site'], 'Anexo')
+        self.assertEqual(self.vacancies.page(page=3, page_size=4)['results'], [])
+        self.assertEqual(self.vacancies.page(page_size=4, room_type='aula', day=0)['count'], 3)
+
+    def test_job_endpoint_pages_the_stored_report(self):
+        period = create_period(2211)
+        data = self.vacancies.to_dict()
+        # El reporte viaja como JSON: claves de texto
+        self.assertEqual(VacancyMap.from_dict(data).free, {room_id: by_day for room_id, by_day in self.vacancies.free.items() if by_day})
+        job = ScheduleJob.objects.create(academic_period=period, status='completado', report={'vacant_slots': data})
+        client = APIClient()
+        url = f'/api/schedule-jobs/{job.pk}/vacancies/'
+        response = client.get(url, {'page': 2, 'page_size': 2, 'room_type': 'aula'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([(r['room'], r['day'], r['start']) for r in response.data['results']], [
+            ('A1', 1, 7), ('A2', 0, 7),
+        ])
+        self.assertEqual(client.get(url, {'day': 'lunes'}).status_code, 400)
+        pending = ScheduleJob.objects.create(academic_period=period)
+        self.assertEqual(client.get(f'/api/schedule-jobs/{pending.pk}/vacancies/').status_code, 409)
+
+
+class QueryTimingMiddlewareTests(TestCase):
+    """Server-Timing, aviso de presupuesto excedido y estadísticas por endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin_stats', password='x', is_staff=True)
+        cls.user = User.objects.create_user('user_stats', password='x')
+
+    def setUp(self):
+        request_stats.reset()
+        self.addCleanup(request_stats.reset)
+
+    def test_server_timing_header(self):
+        response = APIClient().get('/api/schools/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=\d+\.\d;desc="\d+ queries", app;dur=\d+\.\d$')
+
+    def test_logs_requests_over_budget(self):
+        with self.settings(REQUEST_QUERY_BUDGET=0):
+            client = APIClient()
+            with self.assertLogs('api.performance', 'WARNING') as logs:
+                client.get('/api/schools/')
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('excede el presupuesto', logs.output[0])
+        self.assertIn('[/api/schools/]', logs.output[0])
+        stats = {entry['endpoint']: entry for entry in request_stats.snapshot()}
+        self.assertEqual(stats['GET schools-list']['over_budget'], 1)
+
+    def test_within_budget_is_not_logged(self):
+        with self.settings(REQUEST_QUERY_BUDGET=1000, REQUEST_TIME_BUDGET_MS=60000):
+            client = APIClient()
+            with self.assertNoLogs('api.performance', 'WARNING'):
+                client.get('/api/schools/')
+                client.get('/api/schools/')
+        stats = {entry['endpoint']: entry for entry in request_stats.snapshot()}
+        self.assertEqual(stats['GET schools-list']['requests'], 2)
+        self.assertEqual(stats['GET schools-list']['over_budget'], 0)
+
+    def test_stats_are_admin_only(self):
+        client = APIClient()
+        self.assertIn(client.get('/api/request-stats/').status_code, (401, 403))
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/api/request-stats/').status_code, 403)
+        self.assertEqual(client.post('/api/request-stats/reset/').status_code, 403)
 
-# Create your tests here.
+    def test_reset_clears_the_stats(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        client.get('/api/schools/')
+        endpoints = [entry['endpoint'] for entry in client.get('/api/request-stats/').data]
+        self.assertIn('GET schools-list', endpoints)
+        self.assertEqual(client.post('/api/request-stats/reset/').status_code, 204)
+        # Solo queda el propio reset, que el middleware registra al responder
+        self.assertEqual([entry['endpoint'] for entry in request_stats.snapshot()], ['POST request-stats-reset'])
@@ -0,0 +1,96 @@
+"""Medición de ``AlgorithmScheduler.generate`` sobre instancias sintéticas.
+
+Cada talla se construye y se resuelve dentro de una transacción que se revierte,
+así las tallas no se mezclan. Por talla se registra tiempo de pared, memoria
+pico (tracemalloc, en una corrida aparte para no inflar el tiempo), número de
+consultas SQL y grupos agendados. ``compare`` contrasta un resultado con una
+línea base guardada en JSON y devuelve las regresiones.
+"""
+import platform
+import time
+import tracemalloc
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import CourseGroup
+from api.utils.scheduler import AlgorithmScheduler
+from api.utils.synthetic import SIZES, build_instance
+
+BASELINE_VERSION = 1
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _run_size(size, seed, starts, memory, profile=False):
+    """Construye la talla, genera el horario y devuelve las métricas (sin dejar datos)."""
+    result = {}
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            period = build_instance(size, seed=seed)
+            result['build_seconds'] = round(time.perf_counter() - started, 3)
+            result['groups'] = CourseGroup.objects.filter(course_offering__academic_period=period).count()
+
+            sid = transaction.savepoint()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                report = AlgorithmScheduler(period.id, seed=seed, profile=profile).generate(starts=starts)
+                result['seconds'] = round(time.perf_counter() - started, 3)
+            result['queries'] = len(queries.captured_queries)
+            result['placed'] = len(report['created'])
+            if profile:
+                result['profile'] = report['profile']
+            transaction.savepoint_rollback(sid)
+
+            if memory:
+                tracemalloc.start()
+                try:
+                    AlgorithmScheduler(period.id, seed=seed).generate(starts=starts)
+                    result['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+                finally:
+                    tracemalloc.stop()
+            raise _Rollback
+    except _Rollback:
+        pass
+    return result
+
+
+def run_benchmark(sizes=None, seed=0, starts=1, memory=True, log=None, profile=False):
+    """Mide cada talla de ``sizes`` (por defecto todas) y devuelve el documento de resultados.
+
+    Con ``profile`` cada talla incluye el perfil por fases (el tiempo medido sube un poco).
+    """
+    results = {}
+    for name in sizes or list(SIZES):
+        results[name] = _run_size(name, seed, starts, memory, profile)
+        if log:
+            log(name, results[name])
+    return {
+        'version': BASELINE_VERSION,
+        'seed': seed,
+        'starts': starts,
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Regresiones de ``current`` frente a ``baseline``: tiempo o memoria por encima de la tolerancia,
+    más consultas o menos grupos agendados que la línea base."""
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        for metric in ('seconds', 'peak_kb'):
+            if metric in now and metric in before and now[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]} -> {now[metric]}")
+        if now.get('queries', 0) > before.get('queries', 0):
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+        if now.get('placed', 0) < before.get('placed', 0):
+            regressions.append(f"{name}: placed {before['placed']} -> {now['placed']}")
+    return regressions
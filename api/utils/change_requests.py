@@ -0,0 +1,203 @@
+"""Evaluación de conflictos de solicitudes de cambio de horario.
+
+``ConflictChecker`` arma una sola vez el índice de ocupación del periodo
+(docente, aula y ciclo por día y hora, con la sesión que ocupa cada celda) y
+con él responde, para cada solicitud ``cambio_vacio`` / ``cambio_ocupado``, qué
+cruces provocaría mover la sesión al día, hora, docente o aula pedidos. Evaluar
+cientos de solicitudes cuesta las mismas pocas consultas que evaluar una.
+"""
+from collections import defaultdict
+
+from django.db.models import F
+
+from api.models import GeneralScheduleConfig, Room, Schedule, ScheduleChangeRequest, TeacherUnavailability
+from api.utils.snapshot import DAY_INDEX
+
+MOVE_REQUEST_TYPES = ('cambio_vacio', 'cambio_ocupado')
+KIND_LABELS = {'teacher': 'docente', 'room': 'aula', 'cycle': 'ciclo'}
+
+
+class ConflictChecker:
+
+    def __init__(self, period_id):
+        self.period_id = period_id
+        config = GeneralScheduleConfig.objects.first()
+        self.start_h = config.start_time.hour if config else 7
+        self.end_h = config.end_time.hour if config else 22
+
+        # Sesiones del periodo: datos propios y ocupación por (tipo, entidad, dia, hora)
+        self.sessions = {}
+        self._owners = {}
+        rows = Schedule.objects.filter(
+            group__course_offering__academic_period_id=period_id
+        ).values_list(
+            'id', 'teacher_id', 'room_id', 'course__cycle', 'day_of_week', 'start_time', 'end_time',
+            'session_type', 'course__code', 'group__code', 'course__requires_lab', 'course__requires_room',
+            'group__capacity', 'group__course_offering__capacity',
+        )
+        for (sid, teacher_id, room_id, cycle, day, start_t, end_t, s_type, course_code, group_code,
+             requires_lab, requires_room, group_cap, offering_cap) in rows:
+            session = {
+                'id': sid, 'teacher': teacher_id, 'room': room_id, 'cycle': cycle, 'day': day,
+                'start': start_t.hour, 'end': end_t.hour, 'session_type': s_type,
+                'label': f"{course_code} - G{group_code}", 'requires_lab': requires_lab,
+                'requires_room': requires_room,
+                'capacity': group_cap if group_cap is not None else offering_cap,
+            }
+            self.sessions[sid] = session
+            for kind, entity in self._entities(session['teacher'], session['room'], cycle):
+                for h in range(session['start'], session['end']):
+                    self._owners[kind, entity, day, h] = sid
+
+        # Indisponibilidad docente: (docente, dia) -> [(inicio, fin)]
+        self.unavailable = defaultdict(list)
+        for teacher_id, day, start_t, end_t in TeacherUnavailability.objects.values_list(
+            'teacher_id', 'day', 'start_time', 'end_time'
+        ):
+            if day in DAY_INDEX:
+                self.unavailable[teacher_id, DAY_INDEX[day]].append((start_t.hour, end_t.hour))
+
+        self.rooms = {
+            rid: {'name': name, 'room_type': room_type, 'capacity': capacity}
+            for rid, name, room_type, capacity in Room.objects.values_list('id', 'name', 'room_type', 'capacity')
+        }
+
+    @staticmethod
+    def _entities(teacher_id, room_id, cycle):
+        if teacher_id is not None:
+            yield 'teacher', teacher_id
+        if room_id is not None:
+            yield 'room', room_id
+        yield 'cycle', cycle
+
+    @staticmethod
+    def _required_room_type(session):
+        # Misma regla que AlgorithmScheduler._required_room_type
+        if session['session_type'] == 'practica' and session['requires_lab']:
+            return 'laboratorio'
+        if session['requires_room']:
+            return 'aula'
+        return None
+
+    def target(self, change_request):
+        """Sesión resultante (día, horas, docente, aula) si se aprueba la solicitud."""
+        session = self.sessions.get(change_request.schedule_id)
+        if session is None:
+            return None
+        duration = session['end'] - session['start']
+        start = change_request.target_time.hour if change_request.target_time else session['start']
+        return {
+            'day': change_request.target_day if change_request.target_day is not None else session['day'],
+            'start': start,
+            'end': start + duration,
+            'teacher': change_request.target_teacher_id or session['teacher'],
+            'room': change_request.target_room_id or session['room'],
+        }
+
+    def evaluate(self, change_request):
+        """Cruces que provocaría la solicitud. ``feasible`` es None si el tipo no mueve sesiones."""
+        result = {'request': change_request.pk, 'request_type': change_request.request_type, 'conflicts': []}
+        if change_request.request_type not in MOVE_REQUEST_TYPES:
+            result['feasible'] = None
+            return result
+        session = self.sessions.get(change_request.schedule_id)
+        target = self.target(change_request)
+        if target is None:
+            result['feasible'] = False
+            result['conflicts'].append({'type': 'schedule', 'detail': "La sesión no existe o no es de este periodo"})
+            return result
+        conflicts = result['conflicts']
+        result['target'] = target
+        day, start, end = target['day'], target['start'], target['end']
+
+        if day not in DAY_INDEX.values() or start < self.start_h or end > self.end_h:
+            conflicts.append({'type': 'range', 'detail': f"Fuera del horario permitido ({self.start_h}-{self.end_h}h)"})
+
+        # Cruces con otras sesiones (la propia sesión no cuenta)
+        seen = set()
+        for kind, entity in self._entities(target['teacher'], target['room'], session['cycle']):
+            for h in range(start, end):
+                owner = self._owners.get((kind, entity, day, h))
+                if owner is not None and owner != session['id'] and (kind, owner) not in seen:
+                    seen.add((kind, owner))
+                    other = self.sessions[owner]
+                    conflicts.append({
+                        'type': kind, 'schedule': owner,
+                        'detail': f"Cruce de {KIND_LABELS[kind]} con {other['label']} ({other['start']}-{other['end']}h)",
+                    })
+
+        teacher = target['teacher']
+        for u_start, u_end in self.unavailable.get((teacher, day), ()):
+            if u_start < end and start < u_end:
+                conflicts.append({'type': 'unavailability', 'detail': f"Docente no disponible {u_start}-{u_end}h"})
+
+        room = self.rooms.get(target['room'])
+        if room is not None:
+            required = self._required_room_type(session)
+            if required and room['room_type'] != required:
+                conflicts.append({'type': 'room_type', 'detail': f"{room['name']} no es del tipo {required}"})
+            if session['capacity'] and room['capacity'] < session['capacity']:
+                conflicts.append({
+                    'type': 'capacity',
+                    'detail': f"{room['name']} tiene capacidad {room['capacity']} < {session['capacity']}",
+                })
+        # En cambio_ocupado los cruces con sesiones son el desplazamiento pedido, no un error
+        blocking = [
+            c for c in conflicts
+            if not (change_request.request_type == 'cambio_ocupado' and c['type'] in ('teacher', 'room', 'cycle'))
+        ]
+        result['feasible'] = not blocking
+        return result
+
+    def evaluate_many(self, change_requests):
+        """Evalúa varias solicitudes y marca las que compiten por las mismas celdas de docente o aula."""
+        results = [self.evaluate(cr) for cr in change_requests]
+        claims = defaultdict(set)
+        for result in results:
+            target = result.get('target')
+            if not target:
+                continue
+            for kind in ('teacher', 'room'):
+                if target[kind] is None:
+                    continue
+                for h in range(target['start'], target['end']):
+                    claims[kind, target[kind], target['day'], h].add(result['request'])
+        for result in results:
+            target = result.get('target')
+            competing = set()
+            if target:
+                for kind in ('teacher', 'room'):
+                    for h in range(target['start'], target['end']):
+                        competing |= claims.get((kind, target[kind], target['day'], h), set())
+            competing.discard(result['request'])
+            result['competing_requests'] = sorted(competing)
+        return results
+
+
+def evaluate_pending(period_id=None):
+    """Evalúa las solicitudes pendientes (de un periodo o de todos) con un índice por periodo."""
+    requests = ScheduleChangeRequest.objects.filter(status='pendiente').annotate(
+        period_id=F('schedule__group__course_offering__academic_period_id')
+    ).only(
+        'id', 'request_type', 'schedule_id', 'target_teacher_id', 'target_room_id', 'target_day', 'target_time',
+    ).order_by('created_at', 'id')
+    if period_id is not None:
+        requests = requests.filter(period_id=period_id)
+    by_period = defaultdict(list)
+    for change_request in requests:
+        by_period[change_request.period_id].append(change_request)
+    results = []
+    for pid, items in by_period.items():
+        if pid is not None:
+            results.extend(ConflictChecker(pid).evaluate_many(items))
+            continue
+        # Sin sesión: solo aplica a los tipos que no mueven sesiones
+        for change_request in items:
+            moves = change_request.request_type in MOVE_REQUEST_TYPES
+            results.append({
+                'request': change_request.pk, 'request_type': change_request.request_type,
+                'feasible': False if moves else None,
+                'conflicts': [{'type': 'schedule', 'detail': "La solicitud no tiene sesión"}] if moves else [],
+                'competing_requests': [],
+            })
+    return results
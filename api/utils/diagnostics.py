@@ -0,0 +1,112 @@
+"""Diagnóstico compacto de por qué un grupo no se pudo agendar.
+
+En lugar de armar un texto por cada combinación bloqueada, cada motivo se
+acumula en un contador y una matriz día×hora (un bitmask por día) por
+categoría: cruce de ciclo, docente ocupado, falta de aula de un tipo o tope de
+candidatos. Registrar un bloqueo es un incremento y un OR; el texto se arma solo
+al pedirlo (``str`` o ``to_dict``).
+"""
+from api.utils.occupancy import mask_hours
+
+CYCLE = 'ciclo'
+TEACHER = 'docente'
+ROOM = 'aula'
+LIMIT = 'limite'
+
+DAY_NAMES = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+
+class GroupDiagnostics:
+    """Motivos de fallo de un grupo, agregados por (categoría, objetivo).
+
+    El objetivo es el id del docente para ``docente``, el tipo de aula y la
+    capacidad pedida para ``aula`` y None para el resto.
+    """
+    __slots__ = ('label', '_reasons', 'notes', '_teacher_label')
+
+    def __init__(self, label, teacher_label=None, notes=None):
+        self.label = label
+        # (categoria, objetivo) -> [cantidad, {dia: bitmask de horas bloqueadas}]
+        self._reasons = {}
+        self.notes = list(notes or [])
+        self._teacher_label = teacher_label
+
+    def block(self, category, day, mask, target=None):
+        """Registra una combinación bloqueada en ``day`` para las horas de ``mask``."""
+        entry = self._reasons.get((category, target))
+        if entry is None:
+            entry = self._reasons[(category, target)] = [0, {}]
+        entry[0] += 1
+        days = entry[1]
+        days[day] = days.get(day, 0) | mask
+
+    def skip(self, count):
+        """Combinaciones no evaluadas por el tope de candidatos."""
+        if count:
+            entry = self._reasons.setdefault((LIMIT, None), [0, {}])
+            entry[0] += count
+
+    def add_note(self, text):
+        self.notes.append(text)
+
+    def __bool__(self):
+        return bool(self._reasons or self.notes)
+
+    def count(self, category):
+        return sum(entry[0] for (cat, _), entry in self._reasons.items() if cat == category)
+
+    def _describe(self, category, target):
+        if category == CYCLE:
+            return "Cruce de ciclo"
+        if category == TEACHER:
+            name = self._teacher_label(target) if self._teacher_label else target
+            return f"Docente ocupado {name}"
+        if category == ROOM:
+            room_type, capacity = target
+            return f"No hay aula/lab libre tipo {room_type} con capacidad >= {capacity}"
+        return "Se alcanzó el límite de candidatos evaluados para el grupo"
+
+    def _sorted_reasons(self):
+        return sorted(self._reasons.items(), key=lambda item: -item[1][0])
+
+    def to_dict(self):
+        reasons = []
+        for (category, target), (count, days) in self._sorted_reasons():
+            reasons.append({
+                'category': category,
+                'target': list(target) if isinstance(target, tuple) else target,
+                'message': self._describe(category, target),
+                'count': count,
+                'cells': {str(day): mask_hours(mask) for day, mask in sorted(days.items())},
+            })
+        return {'group': self.label, 'reasons': reasons, 'notes': list(self.notes), 'text': str(self)}
+
+    def __str__(self):
+        parts = list(self.notes)
+        for (category, target), (count, days) in self._sorted_reasons():
+            cells = ', '.join(
+                f"{DAY_NAMES[day]} {_hour_ranges(mask_hours(mask))}" for day, mask in sorted(days.items())
+            )
+            parts.append(f"{self._describe(category, target)} ({count}){': ' + cells if cells else ''}")
+        return f"{self.label}: {'; '.join(parts)}"
+
+    def __repr__(self):
+        # Los reportes son dicts que se imprimen tal cual: que se lea el motivo, no la dirección
+        return f"GroupDiagnostics({str(self)!r})"
+
+
+def _hour_ranges(hours):
+    """[7, 8, 9, 12] -> '7-10h, 12-13h' (rangos de horas de reloj)."""
+    ranges = []
+    start = prev = None
+    for h in hours:
+        if start is None:
+            start = prev = h
+        elif h == prev + 1:
+            prev = h
+        else:
+            ranges.append(f"{start}-{prev + 1}h")
+            start = prev = h
+    if start is not None:
+        ranges.append(f"{start}-{prev + 1}h")
+    return ', '.join(ranges)
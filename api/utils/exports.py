@@ -0,0 +1,173 @@
+"""Exportación del horario de un periodo y de sus grupos sin agendar (CSV / XLSX).
+
+Las filas salen de una sola consulta ``values_list(...).iterator(chunk_size=...)``
+y se escriben a medida que llegan: el CSV se genera línea por línea (para
+``StreamingHttpResponse``) y el XLSX usa openpyxl en modo ``write_only``, con
+una hoja por ciclo, docente o aula (la consulta viene ordenada por esa clave,
+así cada hoja se escribe de corrido). La memoria no depende del tamaño del
+periodo.
+"""
+import csv
+import re
+import tempfile
+
+from api.models import CourseGroup, Schedule, ScheduleJob
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl es opcional: solo hace falta para exportar .xlsx
+    Workbook = None
+
+CHUNK_SIZE = 2000
+
+DAY_LABELS = {0: 'Lunes', 1: 'Martes', 2: 'Miércoles', 3: 'Jueves', 4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}
+
+TIMETABLE_HEADER = [
+    'Ciclo', 'Código', 'Curso', 'Grupo', 'Tipo', 'Día', 'Inicio', 'Fin', 'Docente', 'Aula', 'Sede',
+]
+UNASSIGNED_HEADER = ['Ciclo', 'Código', 'Curso', 'Grupo', 'Capacidad', 'Motivo']
+
+# Hojas del XLSX: orden de la consulta (agrupa las filas de cada hoja), clave que identifica
+# la hoja y rótulo. Docentes y aulas se separan por id: dos homónimos no comparten hoja
+SHEET_KEYS = {
+    'cycle': (('course__cycle',), lambda row: row['cycle'], lambda row: f"Ciclo {row['cycle']}"),
+    'teacher': (
+        ('teacher__person__last_name', 'teacher__person__first_name', 'teacher_id'),
+        lambda row: row['teacher_id'],
+        lambda row: row['teacher'] or 'Sin docente',
+    ),
+    'room': (('room__name', 'room_id'), lambda row: row['room_id'], lambda row: row['room'] or 'Sin aula'),
+}
+
+_TIMETABLE_FIELDS = (
+    'course__cycle', 'course__code', 'course__name', 'group__code', 'session_type', 'day_of_week',
+    'start_time', 'end_time', 'teacher_id', 'teacher__person__first_name', 'teacher__person__last_name',
+    'room_id', 'room__name', 'room__site__name',
+)
+
+
+def timetable_rows(period_id, by='cycle'):
+    """Sesiones del periodo como diccionarios, ordenadas por la clave de hoja ``by``."""
+    order = SHEET_KEYS[by][0]
+    queryset = Schedule.objects.filter(
+        group__course_offering__academic_period_id=period_id
+    ).order_by(*order, 'day_of_week', 'start_time', 'course__code', 'group__code').values_list(*_TIMETABLE_FIELDS)
+    for (cycle, code, name, group, s_type, day, start_t, end_t, teacher_id, first_name, last_name,
+         room_id, room, site) in queryset.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'cycle': cycle, 'code': code, 'course': name, 'group': group, 'session_type': s_type,
+            'day': DAY_LABELS.get(day, day), 'start': start_t.strftime('%H:%M'),
+            'end': end_t.strftime('%H:%M'),
+            'teacher_id': teacher_id,
+            'teacher': f"{first_name} {last_name}" if first_name is not None else None,
+            'room_id': room_id, 'room': room, 'site': site,
+        }
+
+
+def _timetable_values(row):
+    return [
+        row['cycle'], row['code'], row['course'], row['group'], row['session_type'], row['day'],
+        row['start'], row['end'], row['teacher'] or '', row['room'] or '', row['site'] or '',
+    ]
+
+
+def _last_reasons(period_id):
+    """Motivos por grupo del último trabajo completado del periodo (si hay uno)."""
+    diagnostics = ScheduleJob.objects.filter(
+        academic_period_id=period_id, status='completado'
+    ).order_by('-finished_at').values_list('report__diagnostics', flat=True).first()
+    return {d['group']: d['text'] for d in diagnostics or () if isinstance(d, dict) and 'group' in d}
+
+
+def unassigned_rows(period_id):
+    """Grupos del periodo sin ninguna sesión, con el motivo del último trabajo si se conoce."""
+    reasons = _last_reasons(period_id)
+    queryset = CourseGroup.objects.filter(
+        course_offering__academic_period_id=period_id, schedules__isnull=True
+    ).order_by('course_offering__course__cycle', 'course_offering__course__code', 'code').values_list(
+        'course_offering__course__cycle', 'course_offering__course__code', 'course_offering__course__name',
+        'code', 'capacity', 'course_offering__capacity',
+    )
+    for cycle, code, name, group, capacity, offering_capacity in queryset.iterator(chunk_size=CHUNK_SIZE):
+        label = f"{code} - G{group}"
+        reason = reasons.get(label, '')
+        yield [
+            cycle, code, name, group, capacity if capacity is not None else offering_capacity,
+            reason[len(label) + 2:] if reason.startswith(label + ': ') else reason,
+        ]
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    """Líneas CSV (con BOM para que Excel reconozca UTF-8) generadas de a una."""
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def timetable_csv(period_id, by='cycle'):
+    return csv_lines(TIMETABLE_HEADER, (_timetable_values(row) for row in timetable_rows(period_id, by)))
+
+
+def unassigned_csv(period_id):
+    return csv_lines(UNASSIGNED_HEADER, unassigned_rows(period_id))
+
+
+def _sheet_title(label, used):
+    """Nombre de hoja válido para Excel: sin []:*?/\\, hasta 31 caracteres y único."""
+    base = re.sub(r'[\[\]:*?/\\]', '-', str(label)).strip() or 'Hoja'
+    title = base[:31]
+    n = 2
+    while title.lower() in used:
+        suffix = f" ({n})"
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def write_xlsx(period_id, output, by='cycle', unassigned=True):
+    """Escribe el libro en ``output`` (ruta o archivo): una hoja por ``by`` y otra de no agendados.
+
+    Con ``by=None`` el libro solo tiene la hoja de no agendados.
+    """
+    if Workbook is None:
+        raise ImportError("Para exportar .xlsx hace falta openpyxl (pip install openpyxl).")
+    workbook = Workbook(write_only=True)
+    used = set()
+    sheet = current = None
+    _, key, label = SHEET_KEYS[by] if by else (None, None, None)
+    for row in timetable_rows(period_id, by) if by else ():
+        if sheet is None or key(row) != current:
+            # Nueva hoja cuando cambia la clave; el rótulo repetido se desambigua con "(2)"
+            current = key(row)
+            sheet = workbook.create_sheet(_sheet_title(label(row), used))
+            sheet.append(TIMETABLE_HEADER)
+        sheet.append(_timetable_values(row))
+    if unassigned:
+        sheet = workbook.create_sheet(_sheet_title('No asignados', used))
+        sheet.append(UNASSIGNED_HEADER)
+        for row in unassigned_rows(period_id):
+            sheet.append(row)
+    if not workbook.worksheets:
+        workbook.create_sheet('Horario').append(TIMETABLE_HEADER)
+    workbook.save(output)
+
+
+def timetable_xlsx_file(period_id, by='cycle', unassigned=True):
+    """Archivo temporal (ya rebobinado) con el XLSX; se borra al cerrarlo."""
+    output = tempfile.TemporaryFile(suffix='.xlsx')
+    write_xlsx(period_id, output, by, unassigned)
+    output.seek(0)
+    return output
+
+
+def unassigned_xlsx_file(period_id):
+    return timetable_xlsx_file(period_id, by=None)
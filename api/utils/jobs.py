@@ -0,0 +1,145 @@
+"""Ejecución de ``ScheduleJob`` fuera del proceso web.
+
+Los trabajos se encolan desde la API y los toma el comando
+``procesar_trabajos_horario``. El worker reclama un trabajo pendiente con
+``select_for_update(skip_locked=True)`` (varios workers no toman el mismo),
+corre ``AlgorithmScheduler`` y va guardando el progreso. La cancelación se
+revisa en cada actualización de progreso y corta la búsqueda antes de escribir
+el horario, así que un trabajo cancelado no modifica la BD.
+
+Cada escritura de progreso renueva ``heartbeat_at`` (también durante la espera
+del multi-start, que avisa cada ``POOL_POLL_SECONDS``). Un trabajo 'en_proceso' cuyo
+latido tiene más de ``STALE_AFTER`` quedó huérfano (el worker murió): se marca
+como fallido (``fail_stale_jobs``) antes de reclamar trabajos y de validar uno
+nuevo, y cancelarlo lo cierra en el acto en lugar de esperar a un worker que ya
+no existe.
+"""
+import time as _time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import ScheduleJob
+from api.utils.scheduler import AlgorithmScheduler
+
+# Segundos mínimos entre escrituras de progreso (y revisiones de cancelación)
+PROGRESS_INTERVAL = 1.0
+# Sin latido durante este tiempo, un trabajo en proceso se da por abandonado
+STALE_AFTER = timedelta(minutes=10)
+
+
+class ScheduleJobCancelled(Exception):
+    """Se pidió cancelar el trabajo mientras se ejecutaba."""
+
+
+def stale_jobs(now=None):
+    """Trabajos 'en_proceso' sin latido reciente (su worker ya no corre)."""
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    return ScheduleJob.objects.filter(status='en_proceso').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+
+
+def fail_stale_jobs(**filters):
+    """Cierra los trabajos abandonados: 'cancelado' si se había pedido cancelarlos, si no 'fallido'.
+
+    ``filters`` limita los trabajos (p. ej. ``academic_period=...``). Devuelve cuántos se cerraron.
+    """
+    now = timezone.now()
+    stale = stale_jobs(now).filter(**filters)
+    cancelled = stale.filter(cancel_requested=True).update(status='cancelado', finished_at=now)
+    failed = stale.update(
+        status='fallido', finished_at=now,
+        error="El worker dejó de responder; el trabajo se dio por fallido.",
+    )
+    return cancelled + failed
+
+
+def claim_next_job():
+    """Marca como 'en_proceso' el trabajo pendiente más antiguo y lo devuelve (o None).
+
+    Antes cierra los trabajos abandonados por workers caídos.
+    """
+    fail_stale_jobs()
+    with transaction.atomic():
+        job = (
+            ScheduleJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pendiente')
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'en_proceso'
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+    return job
+
+
+class _ProgressWriter:
+    """Callback de progreso: guarda el avance cada ``interval`` segundos y revisa la cancelación."""
+
+    def __init__(self, job_id, interval=PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self._last = 0.0
+        self._phase = None
+
+    def __call__(self, progress):
+        now = _time.monotonic()
+        # Los cambios de fase se guardan siempre
+        if now - self._last < self.interval and progress.get('phase') == self._phase:
+            return
+        self._last = now
+        self._phase = progress.get('phase')
+        ScheduleJob.objects.filter(pk=self.job_id).update(progress=progress, heartbeat_at=timezone.now())
+        if ScheduleJob.objects.filter(pk=self.job_id, cancel_requested=True).exists():
+            raise ScheduleJobCancelled()
+
+
+def run_job(job, profile=False):
+    """Ejecuta un trabajo ya reclamado y deja su estado final en la BD (con ``profile``, el reporte incluye el perfil)."""
+    callback = _ProgressWriter(job.pk)
+    try:
+        scheduler = AlgorithmScheduler(job.academic_period_id, seed=job.seed, progress_callback=callback, profile=profile)
+        if job.mode == 'incremental':
+            report = scheduler.generate_incremental()
+        else:
+            report = scheduler.generate(starts=job.starts)
+    except ScheduleJobCancelled:
+        job.status = 'cancelado'
+        job.progress = scheduler.progress
+    except Exception as e:
+        job.status = 'fallido'
+        job.error = str(e)
+    else:
+        job.status = 'completado'
+        # Los diagnósticos se guardan estructurados (contadores y celdas día/hora)
+        report['diagnostics'] = [diag.to_dict() for diag in report['diagnostics']]
+        job.report = report
+        job.seed = report['seed']
+        job.progress = dict(scheduler.progress, phase='terminado')
+    job.finished_at = job.heartbeat_at = timezone.now()
+    # Solo si sigue en proceso: un trabajo que otro ya cerró (abandonado o cancelado) no se pisa
+    fields = ['status', 'progress', 'report', 'error', 'seed', 'heartbeat_at', 'finished_at']
+    updated = ScheduleJob.objects.filter(pk=job.pk, status='en_proceso').update(
+        **{field: getattr(job, field) for field in fields}
+    )
+    if not updated:
+        job.refresh_from_db()
+    return job
+
+
+def cancel_job(job):
+    """Cancela un trabajo pendiente o abandonado al instante; si un worker lo está
+    ejecutando, lo marca para que él lo corte."""
+    now = timezone.now()
+    pending = ScheduleJob.objects.filter(pk=job.pk, status='pendiente')
+    abandoned = stale_jobs(now).filter(pk=job.pk)
+    if not (pending.update(status='cancelado', cancel_requested=True, finished_at=now)
+            or abandoned.update(status='cancelado', cancel_requested=True, finished_at=now)):
+        ScheduleJob.objects.filter(pk=job.pk, status__in=['pendiente', 'en_proceso']).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
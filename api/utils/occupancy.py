@@ -0,0 +1,82 @@
+"""Ocupación compacta por entidad y día usando bitmasks de horas.
+
+Cada (entidad, día) guarda un entero donde el bit ``h`` indica que la hora ``h``
+está ocupada. Verificar un bloque completo es un único AND contra la máscara del
+bloque, y las simulaciones (ocupación temporal) se apilan como capas sin copiar
+el estado global.
+"""
+
+
+def hours_mask(start_h, duration):
+    """Máscara de bits para las horas [start_h, start_h + duration)."""
+    return ((1 << duration) - 1) << start_h
+
+
+def mask_hours(mask):
+    """Lista de horas marcadas en una máscara (solo para reportes)."""
+    hours = []
+    h = 0
+    while mask:
+        if mask & 1:
+            hours.append(h)
+        mask >>= 1
+        h += 1
+    return hours
+
+
+class OccupancyGrid:
+    """Mapa (id_entidad, dia) -> bitmask de horas ocupadas.
+
+    Si se crea con ``base`` funciona como una capa temporal: las lecturas
+    combinan la capa con la base y las escrituras quedan solo en la capa hasta
+    llamar a ``commit()``.
+    """
+    __slots__ = ('_masks', '_base')
+
+    def __init__(self, base=None):
+        self._masks = {}
+        self._base = base
+
+    def mask(self, entity_id, day):
+        m = self._masks.get((entity_id, day), 0)
+        if self._base is not None:
+            m |= self._base.mask(entity_id, day)
+        return m
+
+    def is_free(self, entity_id, day, block):
+        return not (self.mask(entity_id, day) & block)
+
+    def occupy(self, entity_id, day, block):
+        key = (entity_id, day)
+        self._masks[key] = self._masks.get(key, 0) | block
+
+    def release(self, entity_id, day, block):
+        """Libera las horas de ``block`` (solo en esta capa)."""
+        key = (entity_id, day)
+        remaining = self._masks.get(key, 0) & ~block
+        if remaining:
+            self._masks[key] = remaining
+        else:
+            self._masks.pop(key, None)
+
+    def copy(self):
+        """Copia independiente de las máscaras de esta capa (para puntos de restauración)."""
+        grid = OccupancyGrid(base=self._base)
+        grid._masks = dict(self._masks)
+        return grid
+
+    def overlay(self):
+        """Capa temporal sobre esta ocupación (no copia el estado)."""
+        return OccupancyGrid(base=self)
+
+    def commit(self):
+        """Vuelca la capa temporal sobre su base y la deja vacía."""
+        if self._base is None:
+            return
+        for (entity_id, day), block in self._masks.items():
+            self._base.occupy(entity_id, day, block)
+        self._masks.clear()
+
+    def items(self):
+        """Máscaras propias de esta capa: ((id_entidad, dia), mask)."""
+        return self._masks.items()
@@ -0,0 +1,240 @@
+"""Apertura masiva de ofertas (CourseOffering) y de su grupo por defecto.
+
+``bootstrap_offerings`` recibe el conjunto de ofertas que debe existir en un
+periodo y lo completa con un número fijo de consultas: inserta las ofertas que
+faltan con ``bulk_create(ignore_conflicts=True)`` (la unicidad la garantiza
+``unique_together``), relee sus ids junto con si ya tienen grupos o
+configuración de grupos, e inserta el grupo "1" donde haga falta. El costo no
+depende de cuántos cursos se abran.
+
+``reconcile_groups`` ajusta la cantidad de grupos de una oferta agregando o
+quitando solo la diferencia, sin tocar los grupos (ni los horarios) que quedan.
+``open_offerings`` abre un lote de cursos con su número de grupos de una vez.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from api.models import Course, CourseGroup, CourseGroupConfig, CourseOffering, Plan, Schedule
+from api.utils.timetables import delete_schedules, groups_document_keys, manual_refresh, refresh_keys
+
+DEFAULT_CAPACITY = 40
+DEFAULT_GROUP_CODE = "1"
+
+
+def bootstrap_offerings(period, targets, capacity=DEFAULT_CAPACITY):
+    """Crea en ``period`` las ofertas ``targets`` (pares (course_id, offering_type)) que falten
+    y un grupo por defecto en las que no tengan grupos ni configuración de grupos.
+
+    Las ofertas que ya existían se respetan tal cual. Devuelve (ofertas creadas, grupos creados).
+    """
+    targets = set(targets)
+    if not targets:
+        return 0, 0
+    period_id = getattr(period, 'pk', period)
+    course_ids = {course_id for course_id, _ in targets}
+    with transaction.atomic():
+        existing = _offerings(period_id, course_ids)
+        missing = targets - set(existing)
+        CourseOffering.objects.bulk_create(
+            [
+                CourseOffering(course_id=course_id, academic_period_id=period_id, offering_type=offering_type, capacity=capacity)
+                for course_id, offering_type in sorted(missing)
+            ],
+            ignore_conflicts=True,
+        )
+        offerings = _offerings(period_id, course_ids) if missing else existing
+        groups = [
+            CourseGroup(course_offering_id=offering_id, code=DEFAULT_GROUP_CODE)
+            for key, (offering_id, has_groups) in offerings.items()
+            if key in targets and not has_groups
+        ]
+        CourseGroup.objects.bulk_create(groups, ignore_conflicts=True)
+    return len(missing), len(groups)
+
+
+def _offerings(period_id, course_ids):
+    """{(course_id, offering_type): (offering_id, tiene grupos o configuración)} en una consulta."""
+    queryset = CourseOffering.objects.filter(
+        academic_period_id=period_id, course_id__in=course_ids
+    ).annotate(
+        has_groups=Exists(CourseGroup.objects.filter(course_offering=OuterRef('pk'))),
+        has_config=Exists(CourseGroupConfig.objects.filter(course_offering=OuterRef('pk'))),
+    ).values_list('course_id', 'offering_type', 'id', 'has_groups', 'has_config')
+    return {
+        (course_id, offering_type): (offering_id, has_groups or has_config)
+        for course_id, offering_type, offering_id, has_groups, has_config in queryset
+    }
+
+
+def period_offering_targets(period):
+    """Ofertas a abrir al crear ``period`` con la transición entre los dos planes activos.
+
+    Devuelve (targets, plan_antiguo, ciclo_nuevo, max_ciclo), o None si no hay exactamente
+    dos planes activos. Del plan nuevo se abren los ciclos hasta el actual, del antiguo los
+    ciclos posteriores y, como nivelación, el ciclo anterior al actual.
+    """
+    planes = list(Plan.objects.filter(is_active=True).order_by('start_year')[:3])
+    if len(planes) != 2:
+        return None
+    plan_antiguo, plan_nuevo = planes
+
+    años = period.year - plan_nuevo.start_year
+    ciclo_nuevo = años * 2 + (1 if period.period == 'I' else 2)
+    ciclo_nivelacion = ciclo_nuevo - 1 if ciclo_nuevo > 1 else None
+
+    courses = list(Course.objects.filter(plan__in=planes).values_list('id', 'plan_id', 'cycle'))
+    max_ciclo = max((cycle for _, plan_id, cycle in courses if plan_id == plan_nuevo.id), default=None) or 10
+
+    targets = set()
+    for course_id, plan_id, cycle in courses:
+        if plan_id == plan_nuevo.id:
+            if cycle <= ciclo_nuevo:
+                targets.add((course_id, 'normal'))
+        else:
+            if ciclo_nuevo < cycle <= max_ciclo:
+                targets.add((course_id, 'normal'))
+            if cycle == ciclo_nivelacion:
+                targets.add((course_id, 'nivelacion'))
+    return targets, plan_antiguo, ciclo_nuevo, max_ciclo
+
+
+def parity_offering_targets(period, plan):
+    """Cursos del plan en los ciclos impares (periodo I) o pares (periodo II)."""
+    if plan is None or period.period not in ('I', 'II'):
+        return set()
+    ciclos = [1, 3, 5, 7, 9] if period.period == 'I' else [2, 4, 6, 8, 10]
+    return {(course_id, 'normal') for course_id in plan.courses.filter(cycle__in=ciclos).values_list('id', flat=True)}
+
+
+def _code_key(code):
+    """Orden natural de códigos de grupo: "2" antes que "10" y los numéricos antes que el resto."""
+    return (0, int(code), '') if code.isdigit() else (1, 0, code)
+
+
+def _group_delta(groups, num_groups):
+    """(códigos a crear, ids a borrar) para dejar ``groups`` ((id, code)) en ``num_groups`` grupos.
+
+    Se conservan los primeros en orden natural de código; los que faltan toman los
+    códigos numéricos libres más bajos.
+    """
+    groups = sorted(groups, key=lambda group: _code_key(group[1]))
+    keep, extra = groups[:num_groups], groups[num_groups:]
+    used = {code for _, code in keep}
+    codes = []
+    candidate = 1
+    while len(keep) + len(codes) < num_groups:
+        if str(candidate) not in used:
+            codes.append(str(candidate))
+        candidate += 1
+    return codes, [group_id for group_id, _ in extra]
+
+
+def reconcile_groups(offering, num_groups):
+    """Deja ``offering`` con exactamente ``num_groups`` grupos tocando solo la diferencia.
+
+    Se conservan los grupos que quedan (con sus horarios); si sobran se borran los
+    últimos. Sin cambios cuesta una consulta. Devuelve (grupos creados, grupos borrados).
+    """
+    offering_id = getattr(offering, 'pk', offering)
+    codes, extra = _group_delta(
+        CourseGroup.objects.filter(course_offering_id=offering_id).values_list('id', 'code'), num_groups
+    )
+    if not codes and not extra:
+        return 0, 0
+    with transaction.atomic():
+        if extra:
+            drop_groups(extra)
+        CourseGroup.objects.bulk_create(
+            [CourseGroup(course_offering_id=offering_id, code=code) for code in codes], ignore_conflicts=True
+        )
+    return len(codes), len(extra)
+
+
+def drop_groups(group_ids):
+    """Borra los grupos ``group_ids`` y sus horarios con borrados por conjunto.
+
+    Los documentos de horario afectados se refrescan una sola vez al final (no por
+    sesión desde las señales de Schedule).
+    """
+    keys = groups_document_keys(group_ids)
+    delete_schedules(Schedule.objects.filter(group_id__in=group_ids))
+    with manual_refresh():
+        CourseGroup.objects.filter(id__in=group_ids).delete()
+    refresh_keys(keys)
+
+
+def open_offerings(period, items, capacity=DEFAULT_CAPACITY):
+    """Abre en bloque en ``period`` las ofertas ``items``: tuplas (course_id, offering_type, num_groups).
+
+    Las ofertas existentes se resuelven con una consulta ``IN`` y las que faltan se insertan
+    con ``bulk_create``. Si ``num_groups`` no es None se fija la configuración de grupos
+    (``CourseGroupConfig``) y los grupos se reconcilian en bloque; con None los grupos no se
+    tocan. El número de consultas no depende de cuántos cursos se abran.
+
+    Devuelve (ofertas en el orden pedido, con ``num_groups`` anotado; ids de las creadas).
+    """
+    period_id = getattr(period, 'pk', period)
+    requested = {}
+    for course_id, offering_type, num_groups in items:
+        requested[(course_id, offering_type)] = num_groups
+    if not requested:
+        return [], set()
+    course_ids = {course_id for course_id, _ in requested}
+    with transaction.atomic():
+        existing = _offerings(period_id, course_ids)
+        missing = [key for key in requested if key not in existing]
+        CourseOffering.objects.bulk_create(
+            [
+                CourseOffering(course_id=course_id, academic_period_id=period_id, offering_type=offering_type, capacity=capacity)
+                for course_id, offering_type in missing
+            ],
+            ignore_conflicts=True,
+        )
+        offerings = _offerings(period_id, course_ids) if missing else existing
+        ids = {key: offerings[key][0] for key in requested}
+        created = {ids[key] for key in missing}
+        counts = {ids[key]: num_groups for key, num_groups in requested.items() if num_groups is not None}
+        if counts:
+            _set_group_counts(counts)
+
+    position = {offering_id: i for i, offering_id in enumerate(ids.values())}
+    queryset = CourseOffering.objects.filter(id__in=position).select_related(
+        'course', 'academic_period'
+    ).annotate(num_groups=Count('groups'))
+    return sorted(queryset, key=lambda offering: position[offering.id]), created
+
+
+def _set_group_counts(counts):
+    """Fija ``num_groups`` ({offering_id: n}) en CourseGroupConfig y reconcilia los grupos en bloque.
+
+    Las operaciones en bloque no disparan la señal de CourseGroupConfig, por eso los grupos
+    se ajustan aquí con la misma regla que ``reconcile_groups``.
+    """
+    configs = dict(
+        CourseGroupConfig.objects.filter(course_offering_id__in=counts).values_list('course_offering_id', 'id')
+    )
+    CourseGroupConfig.objects.bulk_create([
+        CourseGroupConfig(course_offering_id=offering_id, num_groups=n)
+        for offering_id, n in counts.items() if offering_id not in configs
+    ])
+    CourseGroupConfig.objects.bulk_update([
+        CourseGroupConfig(id=configs[offering_id], course_offering_id=offering_id, num_groups=n)
+        for offering_id, n in counts.items() if offering_id in configs
+    ], ['num_groups'])
+
+    groups = defaultdict(list)
+    for offering_id, group_id, code in CourseGroup.objects.filter(
+        course_offering_id__in=counts
+    ).values_list('course_offering_id', 'id', 'code'):
+        groups[offering_id].append((group_id, code))
+    new_groups = []
+    extra = []
+    for offering_id, n in counts.items():
+        codes, surplus = _group_delta(groups[offering_id], n)
+        new_groups.extend(CourseGroup(course_offering_id=offering_id, code=code) for code in codes)
+        extra.extend(surplus)
+    if extra:
+        drop_groups(extra)
+    CourseGroup.objects.bulk_create(new_groups, ignore_conflicts=True)
@@ -0,0 +1,162 @@
+"""Orden dinámico "más restringido primero" para la pasada greedy.
+
+``DynamicOrder`` mantiene, para cada grupo sin agendar, el conjunto de opciones
+factibles (día, hora de inicio, docente) de cada uno de sus bloques, contra la
+ocupación global del scheduler; una opción cuenta solo si además hay un aula
+libre del tipo y capacidad requeridos. El grupo siguiente es el que tiene menos
+opciones en su bloque más restringido.
+
+Los conteos se actualizan de forma incremental: al agendar un grupo solo se
+revisan los grupos que comparten su ciclo, alguno de sus docentes o un tipo de
+aula con capacidad suficiente (índices invertidos), y de ellos solo las horas de
+inicio cuyo bloque se cruza con las horas ocupadas ese día. Como durante la
+pasada la ocupación solo crece, basta con volver a verificar las opciones que
+seguían siendo factibles. La cola es un heap con entradas perezosas (versión).
+"""
+import heapq
+from collections import defaultdict
+
+from api.utils.occupancy import hours_mask
+
+
+class DynamicOrder:
+
+    def __init__(self, scheduler, groups):
+        self.scheduler = scheduler
+        self._groups = {g.id: g for g in groups}
+        # Desempate: el orden estático (ciclo y horas)
+        self._rank = {g.id: i for i, g in enumerate(scheduler._search_order(groups))}
+        self._blocks = {}      # group_id -> [(duracion, [(tipo_aula, offset, horas)])]
+        self._options = {}     # (group_id, bloque) -> {dia: set((inicio, docente))}
+        self._version = {}
+        self._by_cycle = defaultdict(set)
+        self._by_teacher = defaultdict(set)
+        self._by_room_type = defaultdict(list)  # tipo_aula -> [(capacidad_minima, group_id)]
+        self._heap = []
+        for group in groups:
+            self._index(group)
+            self._push(group.id)
+
+    # --- construcción ---
+
+    def _group_blocks(self, group):
+        """Bloques tal como los agenda ``_process_group``."""
+        course = group.course
+        s = self.scheduler
+        blocks = []
+        for structure in s._session_blocks(course):
+            rooms = []
+            offset = 0
+            for s_type, hours in structure:
+                rooms.append((s._required_room_type(course, s_type), offset, hours))
+                offset += hours
+            blocks.append((offset, rooms))
+        return blocks
+
+    def _index(self, group):
+        s = self.scheduler
+        course = group.course
+        teachers = s._get_teacher_candidates(course)
+        blocks = self._blocks[group.id] = self._group_blocks(group)
+        self._by_cycle[course.cycle].add(group.id)
+        for teacher in teachers:
+            if teacher is not None:
+                self._by_teacher[teacher].add(group.id)
+        min_capacity = group.capacity or 1
+        for room_type in {rt for _, rooms in blocks for rt, _, _ in rooms if rt}:
+            self._by_room_type[room_type].append((min_capacity, group.id))
+        for b, (duration, _) in enumerate(blocks):
+            per_day = {}
+            for day in s.days_indices:
+                per_day[day] = {
+                    (start_h, teacher)
+                    for start_h in s.time_slots if start_h + duration <= s.time_slots[-1] + 1
+                    for teacher in teachers
+                    if self._feasible(group, b, day, start_h, teacher)
+                }
+            self._options[group.id, b] = per_day
+
+    def _feasible(self, group, b, day, start_h, teacher):
+        s = self.scheduler
+        course = group.course
+        duration, rooms = self._blocks[group.id][b]
+        block = hours_mask(start_h, duration)
+        if not s.cycle_occupied.is_free(course.cycle, day, block):
+            return False
+        if teacher is not None and not s.teacher_occupied.is_free(teacher, day, block):
+            return False
+        for room_type, offset, hours in rooms:
+            if room_type and s._best_free_room(room_type, day, hours_mask(start_h + offset, hours), group, s.room_occupied) is None:
+                return False
+        return True
+
+    # --- cola ---
+
+    def count(self, group_id):
+        """Opciones del bloque más restringido del grupo."""
+        blocks = self._blocks[group_id]
+        if not blocks:
+            return 0
+        return min(
+            sum(len(starts) for starts in self._options[group_id, b].values())
+            for b in range(len(blocks))
+        )
+
+    def _push(self, group_id):
+        version = self._version.get(group_id, 0) + 1
+        self._version[group_id] = version
+        heapq.heappush(self._heap, (self.count(group_id), self._rank[group_id], group_id, version))
+
+    def pop(self):
+        """Siguiente grupo a agendar (menos opciones primero) o None si no quedan."""
+        while self._heap:
+            _, _, group_id, version = heapq.heappop(self._heap)
+            if self._version.get(group_id) == version and group_id in self._groups:
+                return self._discard(group_id)
+        return None
+
+    def _discard(self, group_id):
+        group = self._groups.pop(group_id)
+        self._version.pop(group_id, None)
+        return group
+
+    # --- actualización incremental ---
+
+    def placed(self, group, proposals):
+        """Actualiza los conteos tras agendar ``proposals`` de ``group``."""
+        course = group.course
+        touched = defaultdict(set)  # dia -> grupos afectados
+        masks = defaultdict(int)    # dia -> horas ocupadas ese día
+        for proposal in proposals:
+            day = proposal['day']
+            masks[day] |= proposal['block']
+            touched[day] |= self._by_cycle[course.cycle]
+            if proposal['teacher'] is not None and course.requires_teacher:
+                touched[day] |= self._by_teacher[proposal['teacher']]
+            for alloc in proposal['allocation']:
+                room = alloc['room']
+                if room is not None:
+                    masks[day] |= hours_mask(alloc['start'], alloc['duration'])
+                    touched[day].update(gid for cap, gid in self._by_room_type[room.room_type] if cap <= room.capacity)
+        changed = set()
+        for day, group_ids in touched.items():
+            mask = masks[day]
+            low = (mask & -mask).bit_length() - 1
+            high = mask.bit_length() - 1
+            for group_id in group_ids:
+                other = self._groups.get(group_id)
+                if other is None:
+                    continue
+                for b, (duration, _) in enumerate(self._blocks[group_id]):
+                    starts = self._options[group_id, b][day]
+                    # Solo inicios cuyo bloque se cruza con [low, high]
+                    stale = [
+                        (start_h, teacher) for start_h, teacher in starts
+                        if start_h <= high and start_h + duration - 1 >= low
+                        and not self._feasible(other, b, day, start_h, teacher)
+                    ]
+                    if stale:
+                        starts.difference_update(stale)
+                        changed.add(group_id)
+        for group_id in changed:
+            self._push(group_id)
@@ -0,0 +1,182 @@
+"""Importación masiva de cursos de un plan desde CSV o XLSX.
+
+Las filas se leen en streaming (``csv`` o openpyxl en modo ``read_only``), se
+validan en memoria con ``CourseInputSerializer``, la unicidad de ``Course.code``
+se verifica con una sola consulta y los cursos válidos se insertan con
+``bulk_create`` por lotes. Si la base rechaza un lote (p. ej. un código insertado
+en paralelo) ese lote se reintenta fila por fila para informar el error de cada
+una. Los errores por fila tienen la misma forma que en la importación JSON:
+``{'index', 'code', 'error'}``.
+"""
+import csv
+import io
+import os
+
+from django.db import DataError, IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+
+from api.models import Course
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # openpyxl es opcional: solo hace falta para archivos .xlsx
+    load_workbook = None
+
+COLUMNS = ('code', 'name', 'credits', 'hours_theory', 'hours_practice', 'cycle')
+REQUIRED_COLUMNS = ('code', 'name')
+# Columnas que van a PositiveIntegerField: un negativo es error de la fila, no de la BD
+NON_NEGATIVE_COLUMNS = ('credits', 'hours_theory', 'hours_practice', 'cycle')
+CHUNK_SIZE = 1000
+
+
+class PlanFileError(ValueError):
+    """El archivo no se puede leer como plantilla de plan."""
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    # Excel guarda los números como float: 4.0 -> 4
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _rows(header, values_iter):
+    """Diccionarios por fila con las columnas conocidas; se saltan las filas vacías."""
+    header = [_clean(h).lower() for h in header]
+    missing = [c for c in REQUIRED_COLUMNS if c not in header]
+    if missing:
+        raise PlanFileError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+    positions = [(column, header.index(column)) for column in COLUMNS if column in header]
+    for values in values_iter:
+        row = {column: _clean(values[i]) if i < len(values) else '' for column, i in positions}
+        if any(row.values()):
+            yield row
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if header is None:
+        raise PlanFileError("El archivo está vacío")
+    yield from _rows(header, reader)
+
+
+def read_xlsx(file):
+    if load_workbook is None:
+        raise PlanFileError("Para importar .xlsx hace falta openpyxl (pip install openpyxl)")
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        values = workbook.active.iter_rows(values_only=True)
+        header = next(values, None)
+        if header is None:
+            raise PlanFileError("El archivo está vacío")
+        yield from _rows(header, values)
+    finally:
+        workbook.close()
+
+
+def read_plan_file(file, filename=None):
+    """Filas del archivo según su extensión (.csv o .xlsx)."""
+    extension = os.path.splitext(filename or getattr(file, 'name', '') or '')[1].lower()
+    if extension == '.csv':
+        return read_csv(file)
+    if extension == '.xlsx':
+        return read_xlsx(file)
+    raise PlanFileError("Formato no soportado: use .csv o .xlsx")
+
+
+def import_courses(plan, rows, validated=False, chunk_size=CHUNK_SIZE):
+    """Crea los cursos de ``rows`` en ``plan``. Devuelve (created, errors).
+
+    ``rows`` son diccionarios con las columnas de la plantilla; con
+    ``validated=True`` ya vienen validados (p. ej. desde ``PlanImportSerializer``).
+    """
+    from api.serializers.PlanImportSerializer import CourseInputSerializer
+
+    errors = []
+    valid = []
+    # Los campos del serializer se construyen una vez (instanciarlo por fila es lo caro)
+    fields = CourseInputSerializer().fields
+    for idx, row in enumerate(rows):
+        if validated:
+            valid.append((idx, row))
+            continue
+        data, row_errors = _validate_row(fields, row)
+        if row_errors:
+            errors.append({'index': idx, 'error': _flatten(row_errors), 'code': row.get('code')})
+        else:
+            valid.append((idx, data))
+
+    # Unicidad de Course.code: una consulta contra la BD y control de repetidos en el archivo
+    existing = set(Course.objects.filter(code__in={c['code'] for _, c in valid}).values_list('code', flat=True))
+    seen = set()
+    pending = []
+    for idx, c in valid:
+        code = c['code']
+        if code in existing or code in seen:
+            errors.append({'index': idx, 'error': f"Ya existe un curso con el código {code}", 'code': code})
+            continue
+        seen.add(code)
+        pending.append((idx, Course(
+            code=code,
+            name=c.get('name'),
+            credits=c.get('credits') or 0,
+            cycle=c.get('cycle') or 0,
+            practical_hours=c.get('hours_practice') or 0,
+            theoretical_hours=c.get('hours_theory') or 0,
+            plan=plan,
+        )))
+
+    created = []
+    with transaction.atomic():
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            try:
+                with transaction.atomic():
+                    Course.objects.bulk_create([course for _, course in chunk])
+            except (IntegrityError, DataError):
+                chunk = _insert_one_by_one(chunk, errors)
+            created.extend({'index': idx, 'id': course.id, 'code': course.code} for idx, course in chunk)
+    errors.sort(key=lambda e: e['index'])
+    return created, errors
+
+
+def _insert_one_by_one(chunk, errors):
+    """Inserta las filas de un lote rechazado de a una; devuelve las que se guardaron."""
+    saved = []
+    for idx, course in chunk:
+        course.pk = None
+        try:
+            with transaction.atomic():
+                course.save(force_insert=True)
+        except (IntegrityError, DataError) as e:
+            errors.append({'index': idx, 'error': str(e), 'code': course.code})
+        else:
+            saved.append((idx, course))
+    return saved
+
+
+def _validate_row(fields, row):
+    """Lo mismo que ``CourseInputSerializer(data=row).is_valid()``, reutilizando los campos."""
+    data = {}
+    errors = {}
+    for name, field in fields.items():
+        value = row.get(name, '')
+        try:
+            data[name] = field.run_validation(empty if value == '' else value)
+        except SkipField:
+            pass
+        except ValidationError as e:
+            errors[name] = e.detail
+    for name in NON_NEGATIVE_COLUMNS:
+        if data.get(name) is not None and data[name] < 0:
+            errors[name] = ["Debe ser mayor o igual a 0."]
+    return data, errors
+
+
+def _flatten(errors):
+    return '; '.join(f"{field}: {' '.join(str(m) for m in messages)}" for field, messages in errors.items())
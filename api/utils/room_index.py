@@ -0,0 +1,51 @@
+"""Índice de aulas por tipo, ordenado por capacidad, para asignación best-fit."""
+from bisect import bisect_left
+
+
+class RoomIndex:
+    """Aulas/labs particionados por ``room_type`` y ordenados por capacidad.
+
+    ``best_fit`` devuelve el aula libre más pequeña que alcanza la capacidad
+    pedida, así las aulas grandes quedan disponibles para los grupos grandes.
+    """
+
+    def __init__(self, rooms):
+        self._rooms = {}
+        self._capacities = {}
+        for room in rooms:
+            self._rooms.setdefault(room.room_type, []).append(room)
+        for room_type, type_rooms in self._rooms.items():
+            type_rooms.sort(key=lambda r: (r.capacity, r.id))
+            self._capacities[room_type] = [r.capacity for r in type_rooms]
+
+    def candidates(self, room_type, min_capacity):
+        """Aulas del tipo con capacidad >= min_capacity, de menor a mayor."""
+        type_rooms = self._rooms.get(room_type)
+        if not type_rooms:
+            return []
+        start = bisect_left(self._capacities[room_type], min_capacity)
+        return type_rooms[start:]
+
+    def best_fit(self, room_type, min_capacity, day, block, occupied, stats=None):
+        """Aula libre más pequeña del tipo con capacidad suficiente para ``block``.
+
+        Con ``stats`` (un ``Counter``) suma en ``rooms_scanned`` las aulas revisadas.
+        """
+        type_rooms = self._rooms.get(room_type)
+        if not type_rooms:
+            return None
+        first = bisect_left(self._capacities[room_type], min_capacity)
+        found = None
+        i = first
+        for i in range(first, len(type_rooms)):
+            room = type_rooms[i]
+            if occupied.is_free(room.id, day, block):
+                found = room
+                break
+        if stats is not None:
+            stats['rooms_scanned'] += (i + 1 if found else len(type_rooms)) - first
+        return found
+
+    def max_capacity(self, room_type):
+        capacities = self._capacities.get(room_type)
+        return capacities[-1] if capacities else 0
@@ -1,19 +1,45 @@
 import random
-from datetime import time, datetime, timedelta
+import time as _time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import time
+import django
 from django.db import transaction
-from django.db.models import Q
 
 # Ajusta el import según el nombre de tu app
-from api.models import (
-    AcademicPeriod, CourseGroup, Schedule, Room, Teacher, 
-    TeacherUnavailability, CourseTeacherPreference, GeneralScheduleConfig,
-    CourseDayPreference, CourseSessionPolicy
-)
+from api.models import AcademicPeriod, Schedule
+from api.utils.occupancy import OccupancyGrid, hours_mask
+from api.utils.diagnostics import GroupDiagnostics, CYCLE, TEACHER, ROOM
+from api.utils.ordering import DynamicOrder
+from api.utils.profiling import NULL_PROFILER, Profiler, profiled
+from api.utils.room_index import RoomIndex
+from api.utils.vacancies import VacancyMap
+from api.utils.timetables import delete_schedules, rebuild_period
+from api.utils.snapshot import ProblemSnapshot, DAYS_MAP, DAY_INDEX
+
+# Ruido aleatorio máximo que se suma al puntaje de una propuesta (desempate)
+SCORE_NOISE = 0.5
+# Segundos entre avisos de progreso mientras se espera al pool del multi-start
+# (mantienen vivo el latido del trabajo y permiten cancelarlo)
+POOL_POLL_SECONDS = 5.0
+
+
+def _run_start(snapshot, seed, max_candidates=None, ordering='static'):
+    """Una pasada greedy en memoria (se ejecuta en un proceso del pool)."""
+    scheduler = AlgorithmScheduler(snapshot=snapshot, seed=seed, max_candidates=max_candidates, ordering=ordering)
+    report = scheduler._run_search()
+    return {'seed': seed, 'placed': len(report['created']), 'score': report['score']}
+
 
 class AlgorithmScheduler:
-    def __init__(self, period_id=None):
+    def __init__(self, period_id=None, seed=None, snapshot=None, progress_callback=None, max_candidates=None,
+                 ordering='static', profile=False):
         from django.utils import timezone
-        if period_id is not None:
+        # Tiempos por fase y contadores; se adjuntan al reporte como 'profile'
+        self.profiler = Profiler() if profile else NULL_PROFILER
+        if snapshot is not None:
+            # Ejecución solo en memoria (p. ej. dentro del pool de multi-start): no guarda en BD
+            self.period = None
+        elif period_id is not None:
             self.period = AcademicPeriod.objects.get(pk=period_id)
         else:
             now = timezone.now()
@@ -23,298 +49,855 @@ class AlgorithmScheduler:
             ).order_by('-start_schedule_creation').first()
             if not self.period:
                 raise ValueError("No hay un periodo académico activo para la creación de horarios.")
-        # Traemos datos optimizados con select_related para evitar N+1 queries
-        self.groups = CourseGroup.objects.filter(
-            course_offering__academic_period=self.period
-        ).select_related(
-            'course_offering__course', 
-            'course_offering__course__session_policy'
-        )
-        
-        # --- MEMORIA RAM DE OCUPACIÓN (Para velocidad) ---
-        # Estructura: set((id_entidad, dia_int, hora_int))
-        self.teacher_occupied = set()
-        self.room_occupied = set()
-        self.cycle_occupied = set()  # Evita cruces de alumnos del mismo ciclo
-        
+        # Foto en memoria del periodo: la búsqueda no vuelve a consultar la BD
+        if snapshot is None:
+            with self.profiler.phase('snapshot'):
+                snapshot = ProblemSnapshot.load(self.period)
+        self.snapshot = snapshot
+        self.groups = self.snapshot.groups
+        # Aulas por tipo ordenadas por capacidad (best-fit sin consultar la BD)
+        self.room_index = RoomIndex(self.snapshot.rooms)
+
+        # Semilla de los desempates aleatorios: se reporta para reproducir la corrida
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        # Recibe self.progress tras cada grupo; puede lanzar una excepción para abortar la corrida
+        self.progress_callback = progress_callback
+        # Tope de combinaciones (día, hora, docente) evaluadas por grupo; None = sin tope
+        self.max_candidates = max_candidates
+        self._group_budget = None
+        # 'static': por ciclo y horas; 'dynamic': el grupo con menos opciones libres primero
+        if ordering not in ('static', 'dynamic'):
+            raise ValueError(f"Orden de grupos desconocido: {ordering}")
+        self.ordering = ordering
+        self.progress = {}
+        self._reset_state()
+
         # --- CONFIGURACIÓN DE TIEMPO ---
-        self.days_map = {0: 'mon', 1: 'tue', 2: 'wed', 3: 'thu', 4: 'fri', 5: 'sat', 6: 'sun'}
-        self.days_indices = [0, 1, 2, 3, 4, 5] # Lunes a Sábado
-        self.time_slots = self._load_time_slots() # Lista de enteros [7, 8, ..., 22]
+        self.days_map = DAYS_MAP
+        self.days_indices = self.snapshot.days_indices # Lunes a Sábado
+        self.time_slots = self.snapshot.time_slots # Lista de enteros [7, 8, ..., 22]
 
-    def _load_time_slots(self):
-        """Genera el rango de horas operativas basado en GeneralScheduleConfig"""
-        config = GeneralScheduleConfig.objects.first()
-        start = config.start_time.hour if config else 7
-        end = config.end_time.hour if config else 22
-        return list(range(start, end)) # range no incluye el último número, ajusta si necesario
+    def _reset_state(self):
+        """Estado de búsqueda vacío para una nueva pasada con ``self.seed``."""
+        self.rng = random.Random(self.seed)
+        # --- MEMORIA RAM DE OCUPACIÓN (Para velocidad) ---
+        # Estructura: (id_entidad, dia_int) -> bitmask de horas (bit h = hora h ocupada)
+        self.teacher_occupied = OccupancyGrid()
+        self.room_occupied = OccupancyGrid()
+        self.cycle_occupied = OccupancyGrid()  # Evita cruces de alumnos del mismo ciclo
+        # Sesiones aceptadas pendientes de guardar (un solo bulk_create al final)
+        self._pending_schedules = []
+        self.total_score = 0
+        # Contadores de la búsqueda: candidatos evaluados, podados por cota y cortados por el tope
+        self.search_stats = {'evaluated': 0, 'pruned': 0, 'capped': 0}
+        # Propuestas aceptadas por grupo: {group_id: [propuesta, ...]}
+        self.placements = {}
+        # Grupos movidos respecto del horario cargado (modo incremental y fase de mejora)
+        self._dirty = set()
 
+    @profiled('prepare_environment')
     def prepare_environment(self):
-        """Limpia horarios previos y carga restricciones duras"""
-        # 1. Limpiar horario actual del periodo
-        Schedule.objects.filter(group__in=self.groups).delete()
-        
-        # 2. Cargar Indisponibilidad de Docentes (TeacherUnavailability)
-        unavails = TeacherUnavailability.objects.all()
-        for u in unavails:
-            day_idx = self._get_day_index(u.day)
-            if day_idx is not None:
-                # Marcar cada hora del rango como ocupada
-                h_start = u.start_time.hour
-                h_end = u.end_time.hour
-                for h in range(h_start, h_end):
-                    self.teacher_occupied.add((u.teacher.id, day_idx, h))
+        """Carga restricciones duras en memoria (los horarios previos se limpian al guardar)"""
+        # Cargar Indisponibilidad de Docentes (TeacherUnavailability)
+        for teacher_id, day_idx, h_start, h_end in self.snapshot.unavailabilities:
+            # Marcar el rango de horas como ocupado
+            if h_end > h_start:
+                self.teacher_occupied.occupy(teacher_id, day_idx, hours_mask(h_start, h_end - h_start))
 
     def _get_day_index(self, day_code):
-        reverse_map = {v: k for k, v in self.days_map.items()}
-        return reverse_map.get(day_code)
-
-    def generate(self):
-        from collections import defaultdict
-        with transaction.atomic():
-            self.prepare_environment()
-            # Agrupar grupos por ciclo
-            groups_by_cycle = defaultdict(list)
-            for group in self.groups:
-                cycle = group.course_offering.course.cycle
-                groups_by_cycle[cycle].append(group)
-            # Procesar de mayor a menor ciclo
-            sorted_cycles = sorted(groups_by_cycle.keys(), reverse=True)
-            report = {'created': [], 'errors': [], 'diagnostics': []}
-            self._vacant_slots = []  # Para guardar espacios vacíos
-            for cycle in sorted_cycles:
-                # Ordenar dentro del ciclo por tamaño de bloque (opcional, como antes)
-                cycle_groups = sorted(
-                    groups_by_cycle[cycle],
-                    key=lambda g: g.course_offering.course.theoretical_hours + g.course_offering.course.practical_hours,
-                    reverse=True
-                )
-                for group in cycle_groups:
-                    success, reason = self._process_group(group, diagnostics=True)
-                    if success:
-                        report['created'].append(str(group))
-                    else:
-                        report['errors'].append(f"No se pudo agendar: {group}")
-                        report['diagnostics'].append(f"{group}: {reason}")
-            # Al final, imprimir espacios vacíos
-            report['vacant_slots'] = self._get_vacant_slots()
-            return report
+        return DAY_INDEX.get(day_code)
+
+    def generate(self, starts=1, workers=None, improve_seconds=0):
+        """Genera y guarda el horario del periodo.
+
+        Con ``starts > 1`` ejecuta esa cantidad de pasadas greedy con semillas
+        distintas en un pool de procesos y guarda solo la ganadora (más grupos
+        agendados; a igualdad, mayor puntaje total). Con ``improve_seconds > 0``
+        la pasada ganadora se mejora en memoria durante ese tiempo antes de guardar.
+        """
+        starts_summary = None
+        if starts > 1:
+            self._set_phase('multi_start')
+            starts_summary = self._select_best_seed(starts, workers)
+        report = self._run_search()
+        if starts_summary is not None:
+            report['starts'] = starts_summary
+        if improve_seconds > 0:
+            self._set_phase('mejora')
+            self._improve(improve_seconds, report)
+        self._set_phase('guardando')
+        # Guardar todo de una vez: limpiar el horario previo y un solo bulk_create
+        with self.profiler.phase('save'), transaction.atomic():
+            self._clear_previous_schedule()
+            self._flush_schedules()
+            rebuild_period(self.period.id)
+        # Al final, imprimir espacios vacíos
+        report['vacant_slots'] = self._get_vacant_slots()
+        self._attach_profile(report)
+        return report
+
+    def _attach_profile(self, report):
+        """Agrega al reporte el perfil de la corrida (si está activo) con los contadores de búsqueda."""
+        profile = self.profiler.to_dict()
+        if profile is None:
+            return
+        counters = profile['counters']
+        counters['slots_evaluated'] = self.search_stats['evaluated']
+        counters['slots_pruned'] = self.search_stats['pruned']
+        counters['slots_capped'] = self.search_stats['capped']
+        counters['room_probes'] = profile['phases'].get('find_free_room', {}).get('calls', 0)
+        counters['commits'] = profile['phases'].get('commit_schedule', {}).get('calls', 0)
+        report['profile'] = profile
+
+    @profiled('multi_start')
+    def _select_best_seed(self, starts, workers=None):
+        """Corre ``starts`` pasadas en paralelo y deja en ``self.seed`` la semilla ganadora."""
+        seeds = [self.seed + i for i in range(starts)]
+        self.progress['starts'] = {'total': starts, 'done': 0}
+        # django.setup en cada proceso por si el pool usa 'spawn' en lugar de 'fork'
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = [pool.submit(_run_start, self.snapshot, seed, self.max_candidates, self.ordering) for seed in seeds]
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=POOL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                    self.progress['starts']['done'] += len(done)
+                    self._notify_progress()
+            except BaseException:
+                # Cancelación (o error) durante la espera: no arrancar las pasadas que faltan
+                pool.shutdown(cancel_futures=True)
+                raise
+            results = [future.result() for future in futures]
+        best = max(results, key=lambda r: (r['placed'], r['score']))
+        self.seed = best['seed']
+        return results
+
+    @profiled('search')
+    def _run_search(self):
+        """Pasada greedy completa en memoria (no escribe en la BD)."""
+        self._reset_state()
+        self.prepare_environment()
+        report = {'created': [], 'errors': [], 'diagnostics': [], 'seed': self.seed}
+        self._start_progress(self.groups)
+        for group in self._group_sequence(self.groups):
+            success, diag = self._process_group(group, diagnostics=True)
+            self._report_progress(group, success)
+            if success:
+                report['created'].append(group.label)
+            else:
+                report['errors'].append(f"No se pudo agendar: {group.label}")
+                report['diagnostics'].append(diag)
+        report['score'] = self.total_score
+        report['search'] = dict(self.search_stats)
+        return report
+
+    def _group_sequence(self, groups):
+        """Grupos en el orden en que se agendan: fijo o, en modo dinámico, recalculado tras cada grupo."""
+        if self.ordering != 'dynamic':
+            yield from self._search_order(groups)
+            return
+        order = DynamicOrder(self, groups)
+        group = order.pop()
+        while group is not None:
+            yield group
+            # El generador se reanuda después de procesar el grupo. Los vecinos que
+            # mueve el modo incremental no se descuentan: los conteos solo guían el orden
+            if group.id in self.placements:
+                order.placed(group, self.placements[group.id])
+            group = order.pop()
+
+    def _search_order(self, groups):
+        """De mayor a menor ciclo y, dentro del ciclo, por tamaño de bloque (orden estable)."""
+        return sorted(
+            groups,
+            key=lambda g: (-g.course.cycle, -(g.course.theoretical_hours + g.course.practical_hours))
+        )
+
+    # --- PROGRESO ---
+
+    def _start_progress(self, groups):
+        """Reinicia el progreso: grupos a procesar en total y por ciclo."""
+        cycles = {}
+        for group in groups:
+            counts = cycles.setdefault(str(group.course.cycle), {'total': 0, 'processed': 0, 'placed': 0})
+            counts['total'] += 1
+        self.progress = {'phase': 'busqueda', 'total': len(groups), 'processed': 0, 'placed': 0, 'cycles': cycles}
+        self._notify_progress()
+
+    def _report_progress(self, group, placed):
+        counts = self.progress['cycles'][str(group.course.cycle)]
+        counts['processed'] += 1
+        self.progress['processed'] += 1
+        if placed:
+            counts['placed'] += 1
+            self.progress['placed'] += 1
+        self._notify_progress()
+
+    def _set_phase(self, phase):
+        self.progress['phase'] = phase
+        self._notify_progress()
+
+    def _notify_progress(self):
+        if self.progress_callback is not None:
+            self.progress_callback(self.progress)
+
+    # --- MODO INCREMENTAL ---
+
+    def generate_incremental(self, max_neighbours=4):
+        """Reprograma solo los grupos afectados por cambios, sin regenerar el periodo.
+
+        El horario guardado se carga como ocupación fija. Los grupos cuyas sesiones
+        ya no cumplen las restricciones (grupos nuevos, horas o política cambiadas,
+        docente no disponible o no preferido, aula inadecuada, cruces) se descartan
+        y solo esos se vuelven a agendar. Si uno no entra, se liberan hasta
+        ``max_neighbours`` grupos vecinos que compiten por sus recursos y se
+        reintenta; si el intento falla se restaura el estado anterior.
+        """
+        self._reset_state()
+        self.prepare_environment()
+        report = {'mode': 'incremental', 'created': [], 'errors': [], 'diagnostics': [], 'seed': self.seed}
+        existing, stale_rows = self._load_existing_placements()
+
+        invalid = []
+        for group in self.groups:  # por id: los cruces se resuelven siempre igual
+            proposals = existing.get(group.id, [])
+            problem = self._adopt_existing(group, proposals)
+            if problem:
+                invalid.append(group)
+                stale_rows.update(p['row_id'] for p in proposals)
+                report['diagnostics'].append(GroupDiagnostics(group.label, notes=[f"se reprograma ({problem})"]))
+        report['kept'] = len(self.placements)
+
+        self._start_progress(invalid)
+        for group in self._group_sequence(invalid):
+            ok, diag = self._place_group(group)
+            if not ok and max_neighbours:
+                ok = self._repair_with_neighbours(group, max_neighbours, diag)
+            self._report_progress(group, ok)
+            if ok:
+                report['created'].append(group.label)
+            else:
+                report['errors'].append(f"No se pudo agendar: {group.label}")
+                report['diagnostics'].append(diag)
+
+        # Guardar solo la diferencia: filas de grupos movidos o inválidos fuera, sesiones nuevas dentro
+        groups_by_id = {g.id: g for g in self.groups}
+        self._pending_schedules = []
+        for group_id in self._dirty:
+            stale_rows.update(p['row_id'] for p in existing.get(group_id, ()))
+            for proposal in self.placements.get(group_id, ()):
+                self._commit_schedule(groups_by_id[group_id], proposal)
+        self._set_phase('guardando')
+        with self.profiler.phase('save'), transaction.atomic():
+            if stale_rows:
+                self._delete_schedules(Schedule.objects.filter(id__in=stale_rows))
+            self._flush_schedules()
+            rebuild_period(self.period.id)
+        report['moved'] = sorted(groups_by_id[gid].label for gid in self._dirty)
+        report['removed_rows'] = len(stale_rows)
+        report['score'] = self.total_score
+        report['search'] = dict(self.search_stats)
+        report['vacant_slots'] = self._get_vacant_slots()
+        self._attach_profile(report)
+        return report
+
+    @profiled('load_existing')
+    def _load_existing_placements(self):
+        """Horario guardado del periodo como propuestas por grupo (una por fila).
+
+        Devuelve ({group_id: [propuesta, ...]}, ids de filas de grupos que ya no existen).
+        """
+        rooms_by_id = {room.id: room for room in self.snapshot.rooms}
+        group_ids = {group.id for group in self.groups}
+        existing = {}
+        orphan_rows = set()
+        rows = Schedule.objects.filter(
+            group__course_offering__academic_period=self.period
+        ).values_list(
+            'id', 'group_id', 'course_id', 'teacher_id', 'day_of_week', 'room_id',
+            'start_time', 'end_time', 'session_type',
+        ).order_by('group_id', 'day_of_week', 'start_time')
+        for row_id, group_id, course_id, teacher_id, day, room_id, start_t, end_t, s_type in rows:
+            if group_id not in group_ids:
+                orphan_rows.add(row_id)
+                continue
+            duration = end_t.hour - start_t.hour
+            existing.setdefault(group_id, []).append({
+                'day': day,
+                'teacher': teacher_id,
+                'allocation': [{
+                    'room': rooms_by_id.get(room_id),
+                    'type': s_type,
+                    'start': start_t.hour,
+                    'duration': duration,
+                }],
+                'block': hours_mask(start_t.hour, duration) if duration > 0 else 0,
+                'score': 0,
+                'row_id': row_id,
+                'course_id': course_id,
+                'room_id': room_id,
+                'on_grid': not (start_t.minute or end_t.minute),
+            })
+        return existing, orphan_rows
+
+    def _adopt_existing(self, group, proposals):
+        """Fija las sesiones guardadas del grupo si siguen siendo válidas.
+
+        Devuelve '' si se adoptaron o el motivo por el que el grupo debe reprogramarse.
+        """
+        course = group.course
+        if not proposals:
+            return 'sin sesiones en el horario' if course.theoretical_hours + course.practical_hours else ''
+        hours = {'teoria': 0, 'practica': 0}
+        for p in proposals:
+            alloc = p['allocation'][0]
+            if p['course_id'] != course.id:
+                return 'la sesión es de otro curso'
+            if (not p['on_grid'] or alloc['duration'] <= 0 or p['day'] not in self.days_indices
+                    or alloc['start'] < self.time_slots[0] or alloc['start'] + alloc['duration'] > self.time_slots[-1] + 1):
+                return 'sesión fuera del rango horario'
+            if alloc['type'] not in hours:
+                return f"tipo de sesión desconocido {alloc['type']}"
+            hours[alloc['type']] += alloc['duration']
+        if hours['teoria'] != course.theoretical_hours or hours['practica'] != course.practical_hours:
+            return 'las horas no coinciden con el curso'
+        # Misma regla que _process_group: sin docente, la política juntas es un solo bloque
+        if self._joins_sessions(course) and len(proposals) > 1:
+            ordered = sorted(proposals, key=lambda p: (p['day'], p['allocation'][0]['start']))
+            for prev, nxt in zip(ordered, ordered[1:]):
+                prev_alloc = prev['allocation'][0]
+                if nxt['day'] != prev['day'] or nxt['allocation'][0]['start'] != prev_alloc['start'] + prev_alloc['duration']:
+                    return 'la política juntas exige un solo bloque'
+        if course.requires_teacher:
+            teachers = {p['teacher'] for p in proposals}
+            if len(teachers) != 1 or None in teachers:
+                return 'sin un único docente asignado'
+            if teachers.pop() not in self._get_teacher_candidates(course):
+                return 'el docente ya no es preferido para el curso'
+        min_capacity = group.capacity or 1
+        for p in proposals:
+            alloc = p['allocation'][0]
+            req_type = self._required_room_type(course, alloc['type'])
+            room = alloc['room']
+            if req_type and (room is None or room.room_type != req_type or room.capacity < min_capacity):
+                return f"el aula no es del tipo {req_type} o no alcanza la capacidad {min_capacity}"
+            if p['room_id'] is not None and room is None:
+                return 'el aula ya no existe'
+
+        # Sin cruces con indisponibilidades ni con los grupos ya fijados
+        temp_occupied = self._new_overlay()
+        teacher_occ, room_occ, cycle_occ = temp_occupied
+        for p in proposals:
+            alloc = p['allocation'][0]
+            day = p['day']
+            if course.requires_teacher and not teacher_occ.is_free(p['teacher'], day, p['block']):
+                return f"docente {self._teacher_label(p['teacher'])} ocupado o no disponible el día {day}"
+            if alloc['room'] and (course.requires_room or course.requires_lab) and not room_occ.is_free(alloc['room'].id, day, p['block']):
+                return f"cruce de aula {alloc['room'].name} el día {day}"
+            if not cycle_occ.is_free(course.cycle, day, p['block']):
+                return f"cruce de ciclo el día {day}"
+            p['score'] = self._score_day(course, day) + self._score_teacher(course, p['teacher'])
+            self._reserve(course, p, temp_occupied)
+        for layer in temp_occupied:
+            layer.commit()
+        self.placements[group.id] = list(proposals)
+        self.total_score += sum(p['score'] for p in proposals)
+        return ''
+
+    def _place_group(self, group, diagnostics=True):
+        ok, diag = self._process_group(group, diagnostics=diagnostics)
+        if ok:
+            self._dirty.add(group.id)
+        return ok, diag
+
+    def _unplace(self, group):
+        """Quita al grupo del horario en memoria y libera su ocupación."""
+        for proposal in self.placements.pop(group.id, ()):
+            self._release(group.course, proposal)
+            self.total_score -= proposal['score']
+        self._dirty.add(group.id)
+
+    def _release(self, course, proposal):
+        """Inverso de ``_reserve`` sobre la ocupación global."""
+        day = proposal['day']
+        teacher = proposal['teacher']
+        if teacher and course.requires_teacher:
+            self.teacher_occupied.release(teacher, day, proposal['block'])
+        if course.requires_room or course.requires_lab:
+            for alloc in proposal['allocation']:
+                if alloc['room']:
+                    self.room_occupied.release(alloc['room'].id, day, hours_mask(alloc['start'], alloc['duration']))
+        self.cycle_occupied.release(course.cycle, day, proposal['block'])
+
+    def _checkpoint(self):
+        return (
+            self.teacher_occupied.copy(), self.room_occupied.copy(), self.cycle_occupied.copy(),
+            dict(self.placements), set(self._dirty), self.total_score,
+        )
+
+    def _restore(self, state):
+        (self.teacher_occupied, self.room_occupied, self.cycle_occupied,
+         self.placements, self._dirty, self.total_score) = state
+
+    def _conflict_neighbours(self, group, limit, exclude=None):
+        """Grupos fijados que compiten con ``group`` por ciclo, docente o tipo de aula.
+
+        Se prefieren los que comparten más recursos y, a igualdad, los de menos
+        horas (más fáciles de reubicar). Los grupos de ``exclude`` (por defecto,
+        los ya movidos) no se tocan.
+        """
+        if exclude is None:
+            exclude = self._dirty
+        course = group.course
+        teachers = set(self._get_teacher_candidates(course)) - {None}
+        room_types = set()
+        if course.theoretical_hours:
+            room_types.add(self._required_room_type(course, 'teoria'))
+        if course.practical_hours:
+            room_types.add(self._required_room_type(course, 'practica'))
+        room_types.discard(None)
+        groups_by_id = {g.id: g for g in self.groups}
+        ranked = []
+        for group_id, proposals in self.placements.items():
+            if group_id == group.id or group_id in exclude:
+                continue
+            other = groups_by_id[group_id]
+            shared = 0
+            if other.course.cycle == course.cycle:
+                shared += 2
+            if other.course.requires_teacher and proposals[0]['teacher'] in teachers:
+                shared += 2
+            if any(a['room'] and a['room'].room_type in room_types for p in proposals for a in p['allocation']):
+                shared += 1
+            if shared:
+                hours = other.course.theoretical_hours + other.course.practical_hours
+                ranked.append((-shared, hours, group_id))
+        ranked.sort()
+        return [groups_by_id[group_id] for _, _, group_id in ranked[:limit]]
+
+    def _repair_with_neighbours(self, group, limit, diag):
+        """Libera vecinos en conflicto, agenda ``group`` y los reubica; si falla, deshace.
+
+        El motivo del fallo se anota en ``diag`` (el diagnóstico del primer intento).
+        """
+        neighbours = self._conflict_neighbours(group, limit)
+        if not neighbours:
+            return False
+        saved = self._checkpoint()
+        for neighbour in neighbours:
+            self._unplace(neighbour)
+        ok, _ = self._place_group(group)
+        if not ok:
+            diag.add_note(f"tampoco entra liberando {len(neighbours)} grupos vecinos")
+        else:
+            for neighbour in self._search_order(neighbours):
+                n_ok, _ = self._place_group(neighbour)
+                if not n_ok:
+                    ok = False
+                    diag.add_note(f"al liberar vecinos no se pudo reubicar {neighbour.label}")
+                    break
+        if not ok:
+            self._restore(saved)
+        return ok
+
+    # --- FASE DE MEJORA (BÚSQUEDA LOCAL) ---
+
+    @profiled('improve')
+    def _improve(self, time_limit, report, max_eject=3, tabu_tenure=10, max_iterations=None):
+        """Intenta agendar los grupos que quedaron fuera con cadenas de expulsión y reinserción.
+
+        Cada movimiento toma un grupo sin agendar, expulsa de 1 a ``max_eject``
+        grupos vecinos que compiten por sus recursos, lo agenda y reubica a los
+        expulsados (reubicar un grupo equivale a moverlo o intercambiarlo de
+        franja). Se acepta si no baja la cantidad de agendados; si queda un
+        expulsado sin lugar, pasa a ser el siguiente a reinsertar (cadena). Los
+        grupos recién insertados quedan tabú ``tabu_tenure`` iteraciones para no
+        deshacer el movimiento. Todo ocurre en memoria; al terminar se deja el
+        mejor estado visto y se recalcula el reporte. No escribe en la BD.
+        """
+        deadline = _time.monotonic() + time_limit
+        started = _time.monotonic()
+        # Solo grupos con horas y con algún docente posible pueden entrar
+        pending = [
+            g for g in self.groups
+            if g.id not in self.placements
+            and g.course.theoretical_hours + g.course.practical_hours > 0
+            and self._get_teacher_candidates(g.course)
+        ]
+        placed_before = len(self.placements)
+        best_key = (len(self.placements), self.total_score)
+        best_state = self._checkpoint()
+        tabu = {}  # group_id -> iteración hasta la que no se puede expulsar
+        iteration = accepted = 0
+        while pending and _time.monotonic() < deadline:
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+            iteration += 1
+            self._notify_progress()  # permite cancelar un trabajo durante la mejora
+            group = pending.pop(self.rng.randrange(len(pending)))
+            ok, _ = self._place_group(group, diagnostics=False)
+            if ok:
+                accepted += 1
+                tabu[group.id] = iteration + tabu_tenure
+            else:
+                exclude = {gid for gid, until in tabu.items() if until >= iteration}
+                neighbours = self._conflict_neighbours(group, max_eject * 3, exclude=exclude)
+                if not neighbours:
+                    pending.append(group)
+                    continue
+                victims = self.rng.sample(neighbours, self.rng.randint(1, min(max_eject, len(neighbours))))
+                saved = self._checkpoint()
+                for victim in victims:
+                    self._unplace(victim)
+                ok, _ = self._place_group(group, diagnostics=False)
+                homeless = []
+                if ok:
+                    for victim in self._search_order(victims):
+                        if not self._place_group(victim, diagnostics=False)[0]:
+                            homeless.append(victim)
+                if ok and len(homeless) <= 1:
+                    # Mejora (nadie quedó fuera) o movimiento lateral (uno queda fuera y sigue la cadena)
+                    accepted += 1
+                    tabu[group.id] = iteration + tabu_tenure
+                    pending.extend(homeless)
+                else:
+                    self._restore(saved)
+                    pending.append(group)
+            key = (len(self.placements), self.total_score)
+            if key > best_key:
+                best_key = key
+                best_state = self._checkpoint()
+        self._restore(best_state)
+
+        # Sesiones a guardar y reporte según el mejor estado
+        self._pending_schedules = []
+        created, errors, diagnostics = [], [], []
+        old_diagnostics = {diag.label: diag for diag in report['diagnostics']}
+        for group in self._search_order(self.groups):
+            proposals = self.placements.get(group.id)
+            if proposals is not None:
+                for proposal in proposals:
+                    self._commit_schedule(group, proposal)
+                created.append(group.label)
+            elif group.course.theoretical_hours + group.course.practical_hours == 0:
+                created.append(group.label)
+            else:
+                errors.append(f"No se pudo agendar: {group.label}")
+                diagnostics.append(old_diagnostics.get(group.label) or GroupDiagnostics(
+                    group.label, notes=["desplazado durante la fase de mejora"]
+                ))
+        report.update(created=created, errors=errors, diagnostics=diagnostics, score=self.total_score)
+        report['improvement'] = {
+            'iterations': iteration,
+            'accepted': accepted,
+            'placed_before': placed_before,
+            'placed_after': len(self.placements),
+            'seconds': round(_time.monotonic() - started, 3),
+        }
+        return report
+
+    @profiled('clear_previous')
+    def _clear_previous_schedule(self):
+        """Borra el horario del periodo con un borrado por conjunto."""
+        return self._delete_schedules(Schedule.objects.filter(group__course_offering__academic_period=self.period))
+
+    def _delete_schedules(self, schedules):
+        """Borra las sesiones del queryset por conjunto (``delete_schedules``), sin cargarlas.
+
+        Quien llama reconstruye los documentos del periodo con ``rebuild_period`` en la
+        misma transacción.
+        """
+        return delete_schedules(schedules)
+
+    @profiled('flush')
+    def _flush_schedules(self):
+        """Inserta las sesiones pendientes en un solo bulk_create."""
+        created = Schedule.objects.bulk_create(self._pending_schedules)
+        self._pending_schedules = []
+        return created
+
+    @staticmethod
+    def _joins_sessions(course):
+        """La política juntas une teoría y práctica en un solo bloque solo si el curso no
+        requiere docente; con docente, ``_process_group`` las agenda como bloques separados."""
+        return course.policy == 'juntas' and not course.requires_teacher
+
+    def _session_blocks(self, course):
+        """Bloques contiguos tal como los agenda ``_process_group``: listas de (tipo_sesion, horas)."""
+        segments = []
+        if course.theoretical_hours > 0:
+            segments.append(('teoria', course.theoretical_hours))
+        if course.practical_hours > 0:
+            segments.append(('practica', course.practical_hours))
+        if self._joins_sessions(course):
+            return [segments] if segments else []
+        return [[segment] for segment in segments]
 
     def _process_group(self, group, diagnostics=False):
-        """Decide la estrategia según la política de sesión (Juntas o Separadas). Siempre el mismo docente para todas las horas del grupo."""
-        course = group.course_offering.course
-        try:
-            policy = course.session_policy.mode
-        except:
-            policy = 'separadas'
+        """Decide la estrategia según la política de sesión (Juntas o Separadas). Siempre el mismo docente para todas las horas del grupo.
+
+        Retorna (ok, diag): con diagnostics=True, ``diag`` es un ``GroupDiagnostics``
+        con los motivos acumulados de todos los intentos; si no, None.
+        """
+        course = group.course
+        policy = course.policy
         h_teo = course.theoretical_hours
         h_prac = course.practical_hours
-        reason = ''
+        diag = GroupDiagnostics(group.label, self._teacher_label) if diagnostics else None
+        self._group_budget = self.max_candidates
         # Si no requiere docente, usar lógica original
         if not course.requires_teacher:
+            temp_occupied = self._new_overlay()
+            proposals = []
             if policy == 'juntas':
                 total_duration = h_teo + h_prac
                 if total_duration == 0:
-                    return True, ''
+                    return True, diag
                 structure = []
                 if h_teo > 0: structure.append(('teoria', h_teo))
                 if h_prac > 0: structure.append(('practica', h_prac))
                 # Forzar que el docente sea None
-                ok, reason = self._find_best_slot_and_assign(group, total_duration, structure, diagnostics=diagnostics, force_teacher=None)
-                return ok, reason
+                ok = self._find_best_slot_and_assign(group, total_duration, structure, diagnostics=diag, force_teacher=None, temp_occupied=temp_occupied, proposals=proposals)
             else:
-                ok_teo, reason_teo = True, ''
-                ok_prac, reason_prac = True, ''
+                ok = True
                 if h_teo > 0:
-                    ok_teo, reason_teo = self._find_best_slot_and_assign(group, h_teo, [('teoria', h_teo)], diagnostics=diagnostics, force_teacher=None)
-                if h_prac > 0:
-                    ok_prac, reason_prac = self._find_best_slot_and_assign(group, h_prac, [('practica', h_prac)], diagnostics=diagnostics, force_teacher=None)
-                ok = ok_teo and ok_prac
-                reason = f"Teoría: {reason_teo}; Práctica: {reason_prac}" if not ok else ''
-                return ok, reason
+                    ok = self._find_best_slot_and_assign(group, h_teo, [('teoria', h_teo)], diagnostics=diag, force_teacher=None, temp_occupied=temp_occupied, proposals=proposals)
+                if ok and h_prac > 0:
+                    ok = self._find_best_slot_and_assign(group, h_prac, [('practica', h_prac)], diagnostics=diag, force_teacher=None, temp_occupied=temp_occupied, proposals=proposals)
+            if ok:
+                self._accept_group(group, proposals, temp_occupied)
+            return ok, diag
         # Si requiere docente, buscar un docente que pueda cubrir todas las horas (teoría y práctica)
         # 1. Buscar solo con docentes preferidos
         teacher_candidates = self._get_teacher_candidates(course)
         if not teacher_candidates:
             # No hay docentes preferidos para este curso
-            return False, "No hay docentes preferidos asignados para este curso"
-        
+            if diag is not None:
+                diag.add_note("No hay docentes preferidos asignados para este curso")
+            return False, diag
+
         for teacher in teacher_candidates:
             if teacher is None:
                 continue
             # Intentar agendar teoría y práctica con el mismo docente
-            ok_teo, reason_teo = True, ''
-            ok_prac, reason_prac = True, ''
-            # Guardar ocupación temporal para rollback si falla
-            temp_teacher_occupied = set()
-            temp_room_occupied = set()
-            temp_cycle_occupied = set()
+            ok = True
+            # Capas de ocupación temporal sobre la global (se descartan si falla)
+            temp_occupied = self._new_overlay()
+            proposals = []
             # Teoría
             if h_teo > 0:
-                ok_teo, reason_teo = self._find_best_slot_and_assign(group, h_teo, [('teoria', h_teo)], diagnostics=diagnostics, force_teacher=teacher, temp_occupied=(temp_teacher_occupied, temp_room_occupied, temp_cycle_occupied))
-            # Práctica
-            if h_prac > 0:
-                ok_prac, reason_prac = self._find_best_slot_and_assign(group, h_prac, [('practica', h_prac)], diagnostics=diagnostics, force_teacher=teacher, temp_occupied=(temp_teacher_occupied, temp_room_occupied, temp_cycle_occupied))
-            ok = ok_teo and ok_prac
+                ok = self._find_best_slot_and_assign(group, h_teo, [('teoria', h_teo)], diagnostics=diag, force_teacher=teacher, temp_occupied=temp_occupied, proposals=proposals)
+            # Práctica (si la teoría ya falló con este docente no hace falta probarla)
+            if ok and h_prac > 0:
+                ok = self._find_best_slot_and_assign(group, h_prac, [('practica', h_prac)], diagnostics=diag, force_teacher=teacher, temp_occupied=temp_occupied, proposals=proposals)
             if ok:
                 # Si ambos bloques se pudieron agendar, registrar ocupación definitiva
-                self.teacher_occupied.update(temp_teacher_occupied)
-                self.room_occupied.update(temp_room_occupied)
-                self.cycle_occupied.update(temp_cycle_occupied)
-                return True, ''
+                self._accept_group(group, proposals, temp_occupied)
+                return True, diag
         # Si no se pudo con ningún docente preferido
-        reason = f"No hay docente preferido disponible. Últimos motivos: Teoría: {reason_teo}; Práctica: {reason_prac}"
-        return False, reason
+        if diag is not None:
+            diag.add_note("No hay docente preferido disponible")
+        return False, diag
+
+    def _new_overlay(self):
+        """Capas temporales (docente, aula, ciclo) sobre la ocupación global."""
+        return (
+            self.teacher_occupied.overlay(),
+            self.room_occupied.overlay(),
+            self.cycle_occupied.overlay(),
+        )
+
+    def _accept_group(self, group, proposals, temp_occupied):
+        """El grupo quedó completo: vuelca su ocupación temporal y encola sus sesiones."""
+        for layer in temp_occupied:
+            layer.commit()
+        for proposal in proposals:
+            self._commit_schedule(group, proposal)
+            self.total_score += proposal['score']
+        self.placements[group.id] = list(proposals)
 
-    def _find_best_slot_and_assign(self, group, total_duration, structure, diagnostics=False, force_teacher=None, temp_occupied=None):
+    @profiled('search_slots')
+    def _find_best_slot_and_assign(self, group, total_duration, structure, diagnostics=None, force_teacher=None, temp_occupied=None, proposals=None):
         """
         Núcleo del Algoritmo:
-        1. Intenta agendar con docentes preferidos y días preferidos.
-        2. Si no encuentra con días preferidos, intenta con cualquier día disponible.
-        Si diagnostics=True, retorna (ok, reason) con el motivo del fallo.
+        Recorre las combinaciones (día, hora de inicio, docente) de mayor a menor
+        puntaje (día + turno + docente + ruido de desempate) y se detiene en cuanto
+        ninguna de las restantes puede superar a la mejor propuesta. Como el ruido
+        se sortea antes de ordenar, la cota es exacta y basta con la primera
+        combinación factible. Los días preferidos solo suman puntaje, así que ya se
+        prueban primero y no hace falta una segunda pasada "sin preferencias".
+        La propuesta elegida se reserva en ``temp_occupied`` y se agrega a ``proposals``;
+        sin capa temporal se confirma directamente.
+        Los bloqueos se acumulan en ``diagnostics`` (``GroupDiagnostics``) si se pasa.
         """
-        course = group.course_offering.course
-        # Obtener docentes candidatos
+        course = group.course
+        # Obtener docentes candidatos (ids)
         candidates_teachers = self._get_teacher_candidates(course) if force_teacher is None else [force_teacher]
         best_proposal = None
         best_score = -float('inf')
-        fail_reasons = []
-        
-        def search_slots(teachers, ignore_day_preferences=False):
-            nonlocal best_proposal, best_score, fail_reasons
-            for day in self.days_indices:
-                score_day = self._score_day(course, day) if not ignore_day_preferences else 0
-                for start_h in self.time_slots:
-                        if start_h + total_duration > self.time_slots[-1] + 1:
-                            continue
-                        hours_range = list(range(start_h, start_h + total_duration))
-                        # Si temp_occupied está presente, usarlo para simulación
-                        teacher_occ = self.teacher_occupied.copy()
-                        room_occ = self.room_occupied.copy()
-                        cycle_occ = self.cycle_occupied.copy()
-                        if temp_occupied:
-                            teacher_occ.update(temp_occupied[0])
-                            room_occ.update(temp_occupied[1])
-                            cycle_occ.update(temp_occupied[2])
-                        if any((course.cycle, day, h) in cycle_occ for h in hours_range):
-                            fail_reasons.append(f"Cruce de ciclo en día {day}, horas {hours_range}")
-                            continue
-                        score_shift = self._score_shift(course, start_h)
-                        for teacher in teachers:
-                            if teacher is not None:
-                                if any((teacher.id, day, h) in teacher_occ for h in hours_range):
-                                    fail_reasons.append(f"Docente ocupado {teacher} en día {day}, horas {hours_range}")
-                                    continue
-                            score_teacher = self._score_teacher(course, teacher)
-                            room_allocation = []
-                            current_offset = 0
-                            possible_allocation = True
-                            for s_type, s_dur in structure:
-                                req_type = 'laboratorio' if s_type == 'practica' else 'aula'
-                                sub_range = hours_range[current_offset : current_offset + s_dur]
-                                found_room = self._find_free_room(req_type, day, sub_range, course)
-                                if found_room:
-                                    room_allocation.append({
-                                        'room': found_room,
-                                        'type': s_type,
-                                        'start': start_h + current_offset,
-                                        'duration': s_dur
-                                    })
-                                    current_offset += s_dur
-                                else:
-                                    possible_allocation = False
-                                    fail_reasons.append(f"No hay aula/lab libre tipo {req_type} día {day}, horas {sub_range}")
-                                    break
-                            if possible_allocation:
-                                total_score = score_day + score_shift + score_teacher + random.uniform(0, 0.5)
-                                if total_score > best_score:
-                                    best_score = total_score
-                                    best_proposal = {
-                                        'day': day,
-                                        'teacher': teacher,
-                                        'allocation': room_allocation
-                                    }
-                                    # Si temp_occupied está presente, registrar ocupación temporal
-                                    if temp_occupied is not None:
-                                        for h in hours_range:
-                                            if teacher and course.requires_teacher:
-                                                temp_occupied[0].add((teacher.id, day, h))
-                                            for alloc in room_allocation:
-                                                if alloc['room'] and (course.requires_room or course.requires_lab):
-                                                    temp_occupied[1].add((alloc['room'].id, day, h))
-                                            temp_occupied[2].add((course.cycle, day, h))
-        
-        # 1. Intentar con días preferidos
-        search_slots(candidates_teachers, ignore_day_preferences=False)
-        # 2. Si no hay propuesta, relajar: usar cualquier día disponible
-        if not best_proposal:
-            search_slots(candidates_teachers, ignore_day_preferences=True)
+        stats = self.search_stats
+        profiler = self.profiler
+        counting = profiler.enabled
+
+        # Ocupación a consultar: la capa temporal (que ya incluye la global) o la global
+        if temp_occupied is not None:
+            teacher_occ, room_occ, cycle_occ = temp_occupied
+        else:
+            teacher_occ, room_occ, cycle_occ = self.teacher_occupied, self.room_occupied, self.cycle_occupied
+
+        # Candidatos con su puntaje (cota superior de la propuesta que generen)
+        candidates = []
+        last_start = self.time_slots[-1] + 1 - total_duration
+        for day in self.days_indices:
+            score_day = self._score_day(course, day)
+            for start_h in self.time_slots:
+                if start_h > last_start:
+                    break
+                score_shift = self._score_shift(course, start_h)
+                for teacher in candidates_teachers:
+                    score = score_day + score_shift + self._score_teacher(course, teacher) + self.rng.uniform(0, SCORE_NOISE)
+                    candidates.append((score, day, start_h, teacher))
+        candidates.sort(key=lambda c: -c[0])
+
+        for index, (score, day, start_h, teacher) in enumerate(candidates):
+            if score <= best_score:
+                # Ningún candidato restante puede mejorar la propuesta actual
+                stats['pruned'] += len(candidates) - index
+                break
+            if self._group_budget is not None:
+                if self._group_budget <= 0:
+                    stats['capped'] += len(candidates) - index
+                    if diagnostics is not None:
+                        diagnostics.skip(len(candidates) - index)
+                    break
+                self._group_budget -= 1
+            stats['evaluated'] += 1
+            block = hours_mask(start_h, total_duration)
+            if not cycle_occ.is_free(course.cycle, day, block):
+                if counting:
+                    profiler.count('cycle_clashes')
+                if diagnostics is not None:
+                    # Solo las horas realmente en conflicto
+                    diagnostics.block(CYCLE, day, block & cycle_occ.mask(course.cycle, day))
+                continue
+            if teacher is not None and not teacher_occ.is_free(teacher, day, block):
+                if counting:
+                    profiler.count('teacher_clashes')
+                if diagnostics is not None:
+                    diagnostics.block(TEACHER, day, block & teacher_occ.mask(teacher, day), teacher)
+                continue
+            room_allocation = []
+            current_offset = 0
+            possible_allocation = True
+            for s_type, s_dur in structure:
+                req_type = self._required_room_type(course, s_type)
+                sub_block = hours_mask(start_h + current_offset, s_dur)
+                found_room = None
+                if req_type:
+                    found_room = self._best_free_room(req_type, day, sub_block, group, room_occ)
+                if found_room or not req_type:
+                    room_allocation.append({
+                        'room': found_room,
+                        'type': s_type,
+                        'start': start_h + current_offset,
+                        'duration': s_dur
+                    })
+                    current_offset += s_dur
+                else:
+                    possible_allocation = False
+                    if counting:
+                        profiler.count('room_clashes')
+                    if diagnostics is not None:
+                        diagnostics.block(ROOM, day, sub_block, (req_type, group.capacity or 1))
+                    break
+            if possible_allocation:
+                total_score = score
+                if total_score > best_score:
+                    best_score = total_score
+                    best_proposal = {
+                        'day': day,
+                        'teacher': teacher,
+                        'allocation': room_allocation,
+                        'block': block,
+                        'score': total_score,
+                    }
+
         if best_proposal:
-            self._commit_schedule(group, best_proposal)
-            return (True, '') if diagnostics else True
-        reason = '; '.join(set(fail_reasons)) if diagnostics else ''
-        return (False, reason) if diagnostics else False
+            # Reservar solo la propuesta elegida en la capa temporal
+            if temp_occupied is not None:
+                self._reserve(course, best_proposal, temp_occupied)
+                if proposals is not None:
+                    proposals.append(best_proposal)
+            else:
+                self._commit_schedule(group, best_proposal)
+                self._reserve(course, best_proposal, (self.teacher_occupied, self.room_occupied, self.cycle_occupied))
+                self.total_score += best_proposal['score']
+            return True
+        return False
+
+    @profiled('vacancies')
+    def vacancies(self):
+        """Espacios libres de aulas según la ocupación actual (ver ``VacancyMap``)."""
+        return VacancyMap.from_occupancy(self.snapshot.rooms, self.room_occupied, self.days_indices, self.time_slots)
 
     def _get_vacant_slots(self):
-        """Devuelve todos los espacios (día, hora, aula) que quedaron vacíos y no fueron usados."""
-        vacant = []
-        all_rooms = Room.objects.all()
-        for day in self.days_indices:
-            for h in self.time_slots:
-                for room in all_rooms:
-                    if not (room.id, day, h) in self.room_occupied:
-                        vacant.append({'room': str(room), 'day': day, 'hour': h})
-        return vacant
-
-    def _find_free_room(self, room_type, day, hour_list, course, group=None):
-        """Busca la primera aula/lab disponible que cumpla el tipo y capacidad real"""
-        # Si el curso no requiere aula/lab según el tipo, retorna None
-        if room_type == 'aula' and not course.requires_room:
-            return None
-        if room_type == 'laboratorio' and not course.requires_lab:
-            return None
-        # Capacidad real: usa la del grupo/oferta si existe
-        min_capacity = 1
-        if group and hasattr(group, 'capacity') and group.capacity:
-            min_capacity = group.capacity
-        elif hasattr(course, 'capacity') and course.capacity:
-            min_capacity = course.capacity
-        candidates = Room.objects.filter(room_type=room_type, capacity__gte=min_capacity)
-        for room in candidates:
-            if not any((room.id, day, h) in self.room_occupied for h in hour_list):
-                return room
+        """Espacios vacíos en forma compacta: tabla de aulas e intervalos libres por aula y día."""
+        return self.vacancies().to_dict()
+
+    def _required_room_type(self, course, session_type):
+        """Tipo de ambiente que necesita la sesión, o None si no necesita ninguno."""
+        if session_type == 'practica' and course.requires_lab:
+            return 'laboratorio'
+        if course.requires_room:
+            return 'aula'
         return None
 
+    def _find_free_room(self, room_type, day, hour_list, course, group=None, room_occ=None):
+        """Busca el aula/lab libre más pequeña del tipo que cubra la capacidad real del grupo"""
+        if room_occ is None:
+            room_occ = self.room_occupied
+        return self._best_free_room(room_type, day, hours_mask(hour_list[0], len(hour_list)), group, room_occ)
+
+    @profiled('find_free_room')
+    def _best_free_room(self, room_type, day, block, group, room_occ):
+        min_capacity = group.capacity if group and group.capacity else 1
+        stats = self.profiler.counters if self.profiler.enabled else None
+        return self.room_index.best_fit(room_type, min_capacity, day, block, room_occ, stats)
+
+    @profiled('commit_schedule')
     def _commit_schedule(self, group, proposal):
-        """Guarda en BD y actualiza memoria"""
+        """Encola las sesiones de la propuesta para el bulk_create final"""
         day = proposal['day']
         teacher = proposal['teacher']
-        course = group.course_offering.course
+        course = group.course
         for alloc in proposal['allocation']:
             start_t = time(alloc['start'], 0)
             end_t = time(alloc['start'] + alloc['duration'], 0)
             # Si el curso no requiere aula ni laboratorio, no asignar room
             room_to_assign = alloc['room'] if (course.requires_room or course.requires_lab) else None
-            Schedule.objects.create(
-                course=course,
-                group=group,
-                teacher=teacher if course.requires_teacher else None,
+            self._pending_schedules.append(Schedule(
+                course_id=course.id,
+                group_id=group.id,
+                teacher_id=teacher if course.requires_teacher else None,
                 day_of_week=day,
-                room=room_to_assign,
+                room_id=room_to_assign.id if room_to_assign else None,
                 start_time=start_t,
                 end_time=end_t,
                 session_type=alloc['type']
-            )
-            # Actualizar Sets de Ocupación
-            rng = range(alloc['start'], alloc['start'] + alloc['duration'])
-            if teacher and course.requires_teacher:
-                for h in rng:
-                    self.teacher_occupied.add((teacher.id, day, h))
-            if (room_to_assign and (course.requires_room or course.requires_lab)):
-                for h in rng:
-                    self.room_occupied.add((room_to_assign.id, day, h))
-            for h in rng:
-                self.cycle_occupied.add((course.cycle, day, h))
+            ))
+
+    def _reserve(self, course, proposal, occupied):
+        """Marca la propuesta en las ocupaciones dadas (docente, aula, ciclo)."""
+        teacher_occ, room_occ, cycle_occ = occupied
+        day = proposal['day']
+        teacher = proposal['teacher']
+        if teacher and course.requires_teacher:
+            teacher_occ.occupy(teacher, day, proposal['block'])
+        if course.requires_room or course.requires_lab:
+            for alloc in proposal['allocation']:
+                if alloc['room']:
+                    room_occ.occupy(alloc['room'].id, day, hours_mask(alloc['start'], alloc['duration']))
+        cycle_occ.occupy(course.cycle, day, proposal['block'])
 
     # --- HELPERS DE PUNTUACIÓN (SCORING) ---
 
@@ -322,21 +905,18 @@ class AlgorithmScheduler:
         # Si el curso no requiere docente, devolver [None]
         if not course.requires_teacher:
             return [None]
-        # Obtener todos los docentes que tienen preferencia para este curso
-        prefs = CourseTeacherPreference.objects.filter(course=course).select_related('teacher')
-        if prefs.exists():
-            return [p.teacher for p in prefs]
-        # Si no hay preferencias definidas, retornar lista vacía (no asignar docente)
-        return []
+        # Docentes (ids) que tienen preferencia para este curso; si no hay, lista vacía
+        return list(self.snapshot.teacher_prefs.get(course.id, ()))
+
+    def _teacher_label(self, teacher_id):
+        info = self.snapshot.teachers.get(teacher_id)
+        return info.label if info else str(teacher_id)
 
     def _score_day(self, course, day_idx):
         """Si el curso tiene preferencia de día, retorna puntos positivos; si no tiene preferencia para ese día, retorna 0."""
-        day_str = self.days_map[day_idx]
-        try:
-            course.day_preferences.get(day=day_str)
+        if day_idx in self.snapshot.day_prefs.get(course.id, ()):
             return 20  # Día preferido
-        except CourseDayPreference.DoesNotExist:
-            return 0  # No es preferido, pero permitido
+        return 0  # No es preferido, pero permitido
 
     def _score_shift(self, course, start_h):
         """Puntuación por turno - retorna 0 ya que no hay preferencias de turno definidas."""
@@ -346,8 +926,6 @@ class AlgorithmScheduler:
         """Si el docente está en las preferencias del curso, retorna puntos positivos; si no, retorna 0."""
         if not teacher:
             return 0
-        try:
-            course.teacher_preferences.get(teacher=teacher)
+        if teacher in self.snapshot.teacher_prefs.get(course.id, ()):
             return 40  # Docente preferido
-        except CourseTeacherPreference.DoesNotExist:
-            return 0  # No preferido
\ No newline at end of file
+        return 0  # No preferido
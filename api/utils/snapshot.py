@@ -0,0 +1,124 @@
+"""Foto en memoria del problema de horarios de un periodo.
+
+``ProblemSnapshot.load`` trae de la BD todo lo que el algoritmo necesita
+(grupos, cursos, aulas, preferencias, políticas de sesión e indisponibilidades)
+en un número fijo de consultas. A partir de ahí la búsqueda trabaja solo con
+tuplas y diccionarios y no vuelve a tocar la BD.
+"""
+from collections import namedtuple, defaultdict
+
+from api.models import (
+    CourseGroup, Room, GeneralScheduleConfig, CourseTeacherPreference,
+    CourseDayPreference, TeacherUnavailability
+)
+
+CourseInfo = namedtuple('CourseInfo', [
+    'id', 'code', 'name', 'cycle', 'theoretical_hours', 'practical_hours',
+    'requires_lab', 'requires_room', 'requires_teacher', 'policy',
+])
+GroupInfo = namedtuple('GroupInfo', ['id', 'code', 'course', 'capacity', 'label'])
+RoomInfo = namedtuple('RoomInfo', ['id', 'name', 'room_type', 'capacity', 'site_id', 'site_name', 'label'])
+TeacherInfo = namedtuple('TeacherInfo', ['id', 'label'])
+
+DAYS_MAP = {0: 'mon', 1: 'tue', 2: 'wed', 3: 'thu', 4: 'fri', 5: 'sat', 6: 'sun'}
+DAY_INDEX = {v: k for k, v in DAYS_MAP.items()}
+
+
+class ProblemSnapshot:
+    """Datos de solo lectura del periodo. No debe modificarse tras ``load``."""
+
+    def __init__(self, period_id, groups, rooms, teachers, teacher_prefs, day_prefs,
+                 unavailabilities, time_slots, days_indices):
+        self.period_id = period_id
+        self.groups = groups                      # tuple[GroupInfo]
+        self.rooms = rooms                        # tuple[RoomInfo]
+        self.teachers = teachers                  # {teacher_id: TeacherInfo}
+        self.teacher_prefs = teacher_prefs        # {course_id: tuple[teacher_id]}
+        self.day_prefs = day_prefs                # {course_id: frozenset[dia_int]}
+        self.unavailabilities = unavailabilities  # tuple[(teacher_id, dia_int, h_inicio, h_fin)]
+        self.time_slots = time_slots              # list[int]
+        self.days_indices = days_indices          # list[int]
+
+    @classmethod
+    def load(cls, period):
+        """Carga la foto del periodo con un número de consultas independiente del tamaño."""
+        # 1. Rango horario
+        config = GeneralScheduleConfig.objects.first()
+        start = config.start_time.hour if config else 7
+        end = config.end_time.hour if config else 22
+        time_slots = list(range(start, end))
+
+        # 2. Grupos con su curso, oferta y política de sesión
+        rows = CourseGroup.objects.filter(
+            course_offering__academic_period=period
+        ).values_list(
+            'id', 'code', 'capacity', 'course_offering__capacity',
+            'course_offering__course_id', 'course_offering__course__code',
+            'course_offering__course__name', 'course_offering__course__cycle',
+            'course_offering__course__theoretical_hours', 'course_offering__course__practical_hours',
+            'course_offering__course__requires_lab', 'course_offering__course__requires_room',
+            'course_offering__course__requires_teacher', 'course_offering__course__session_policy__mode',
+        ).order_by('id')
+        courses = {}
+        groups = []
+        for (gid, gcode, gcap, ocap, cid, ccode, cname, cycle, h_teo, h_prac,
+             req_lab, req_room, req_teacher, policy) in rows:
+            course = courses.get(cid)
+            if course is None:
+                course = courses[cid] = CourseInfo(
+                    cid, ccode, cname, cycle, h_teo, h_prac,
+                    req_lab, req_room, req_teacher, policy or 'separadas',
+                )
+            capacity = gcap if gcap is not None else ocap
+            groups.append(GroupInfo(gid, gcode, course, capacity, f"{ccode} - G{gcode}"))
+
+        # 3. Aulas y laboratorios
+        type_labels = dict(Room.ROOM_TYPE_CHOICES)
+        rooms = tuple(
+            RoomInfo(rid, name, rtype, cap, site_id, site_name,
+                     f"{name} ({type_labels.get(rtype, rtype)}) - Cap: {cap}")
+            for rid, name, rtype, cap, site_id, site_name in Room.objects.values_list(
+                'id', 'name', 'room_type', 'capacity', 'site_id', 'site__name'
+            ).order_by('id')
+        )
+
+        # 4. Docentes preferidos por curso (y nombres para reportes)
+        teacher_prefs = defaultdict(list)
+        teachers = {}
+        pref_rows = CourseTeacherPreference.objects.filter(
+            course__offerings__academic_period=period
+        ).values_list(
+            'course_id', 'teacher_id', 'teacher__person__first_name', 'teacher__person__last_name'
+        ).order_by('course_id', 'teacher_id').distinct()
+        for cid, tid, first_name, last_name in pref_rows:
+            teacher_prefs[cid].append(tid)
+            teachers[tid] = TeacherInfo(tid, f"{first_name} {last_name}")
+
+        # 5. Días preferidos por curso
+        day_prefs = defaultdict(set)
+        for cid, day in CourseDayPreference.objects.filter(
+            course__offerings__academic_period=period
+        ).values_list('course_id', 'day').distinct():
+            if day in DAY_INDEX:
+                day_prefs[cid].add(DAY_INDEX[day])
+
+        # 6. Indisponibilidad de docentes
+        unavailabilities = tuple(
+            (tid, DAY_INDEX[day], start_t.hour, end_t.hour)
+            for tid, day, start_t, end_t in TeacherUnavailability.objects.values_list(
+                'teacher_id', 'day', 'start_time', 'end_time'
+            )
+            if day in DAY_INDEX
+        )
+
+        return cls(
+            period_id=period.id,
+            groups=tuple(groups),
+            rooms=rooms,
+            teachers=teachers,
+            teacher_prefs={cid: tuple(tids) for cid, tids in teacher_prefs.items()},
+            day_prefs={cid: frozenset(days) for cid, days in day_prefs.items()},
+            unavailabilities=unavailabilities,
+            time_slots=time_slots,
+            days_indices=[0, 1, 2, 3, 4, 5],  # Lunes a Sábado
+        )
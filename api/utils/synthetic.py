@@ -0,0 +1,118 @@
+"""Instancias sintéticas para medir el scheduler a distintas escalas.
+
+``build_instance`` crea con ``bulk_create`` una facultad (o varias) completa:
+escuelas, planes, cursos con política y preferencias, oferta y grupos del
+periodo, sedes con aulas y laboratorios, y docentes con algo de
+indisponibilidad. Todo sale de una semilla, así que la misma talla produce
+siempre el mismo problema. ``SIZES`` define las tallas del benchmark.
+
+El scheduler ocupa un ciclo sin distinguir el plan, así que en las tallas con
+varias escuelas los ciclos se saturan y la mayoría de los grupos recorre la
+búsqueda completa sin agendarse: es a propósito el caso caro.
+"""
+import random
+from collections import namedtuple
+from datetime import datetime, time, timezone
+
+from api.models import (
+    AcademicPeriod, Course, CourseDayPreference, CourseGroup, CourseOffering, CourseSessionPolicy,
+    CourseTeacherPreference, Faculty, Person, Plan, Room, School, Site, Teacher, TeacherUnavailability,
+)
+
+InstanceSize = namedtuple('InstanceSize', 'faculties schools courses groups cycles')
+
+# talla -> facultades, escuelas por facultad, cursos por escuela, grupos por curso, ciclos por plan
+SIZES = {
+    'small': InstanceSize(1, 1, 20, 1, 10),
+    'medium': InstanceSize(1, 3, 40, 2, 10),
+    'large': InstanceSize(2, 4, 50, 2, 10),
+    'xlarge': InstanceSize(4, 5, 60, 2, 10),
+}
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+def build_instance(size, seed=0, prefix='SYN'):
+    """Crea una instancia de la talla ``size`` (nombre de ``SIZES`` o ``InstanceSize``) y devuelve el periodo."""
+    if isinstance(size, str):
+        size = SIZES[size]
+    rnd = random.Random(seed)
+    tag = f"{prefix}{seed}"
+
+    # El periodo primero: su señal solo abre cursos si ya hay dos planes activos
+    period = AcademicPeriod.objects.create(
+        year=2099, period='I',
+        start_schedule_creation=datetime(2099, 1, 1, tzinfo=timezone.utc),
+        end_schedule_creation=datetime(2099, 3, 1, tzinfo=timezone.utc),
+    )
+
+    faculties = Faculty.objects.bulk_create(
+        Faculty(name=f"{tag} Facultad {f + 1}") for f in range(size.faculties)
+    )
+    schools = School.objects.bulk_create(
+        School(name=f"{tag} Escuela {f + 1}.{s + 1}", faculty=faculty)
+        for f, faculty in enumerate(faculties) for s in range(size.schools)
+    )
+    plans = Plan.objects.bulk_create(
+        Plan(name=f"Plan {school.name}", school=school, start_year=2090, is_active=False) for school in schools
+    )
+
+    # Una sede por facultad; aulas y laboratorios en proporción a los grupos
+    n_groups = size.schools * size.courses * size.groups
+    sites = Site.objects.bulk_create(
+        Site(name=f"{tag} Sede {f + 1}", address="Sintética") for f in range(size.faculties)
+    )
+    rooms = []
+    for site in sites:
+        for i in range(max(n_groups // 8, 4)):
+            rooms.append(Room(name=f"A{i + 1}", room_type='aula', capacity=rnd.choice([30, 40, 50, 60]), site=site))
+        for i in range(max(n_groups // 20, 2)):
+            rooms.append(Room(name=f"L{i + 1}", room_type='laboratorio', capacity=rnd.choice([25, 35, 45]), site=site))
+    Room.objects.bulk_create(rooms)
+
+    # Docentes: unos seis grupos por docente
+    n_teachers = max(size.faculties * n_groups // 6, 4)
+    persons = Person.objects.bulk_create(
+        Person(
+            first_name=f"Docente{i + 1}", last_name=tag, middle_name="Sintético",
+            dni=f"{tag}-{i + 1}", email=f"docente{i + 1}@{tag.lower()}.test", phone="000000000",
+        )
+        for i in range(n_teachers)
+    )
+    teachers = Teacher.objects.bulk_create(
+        Teacher(person=person, contract_type=rnd.choice(['contratado', 'nombrado']), min_weekly_hours=10)
+        for person in persons
+    )
+    TeacherUnavailability.objects.bulk_create(
+        TeacherUnavailability(
+            teacher=teacher, day=rnd.choice(DAYS), start_time=time(start), end_time=time(start + rnd.choice([2, 3, 4])),
+        )
+        for teacher in teachers if rnd.random() < 0.3
+        for start in [rnd.randrange(7, 16)]
+    )
+
+    courses = Course.objects.bulk_create(
+        Course(
+            code=f"{tag}-{p + 1}-{c + 1}", name=f"Curso {c + 1}", credits=rnd.choice([3, 4]),
+            cycle=c % size.cycles + 1, theoretical_hours=rnd.choice([2, 3, 4]), practical_hours=rnd.choice([0, 2, 2]),
+            plan=plan, requires_lab=rnd.random() < 0.4,
+        )
+        for p, plan in enumerate(plans) for c in range(size.courses)
+    )
+    CourseSessionPolicy.objects.bulk_create(
+        CourseSessionPolicy(course=course, mode=rnd.choice(['juntas', 'separadas'])) for course in courses
+    )
+    CourseDayPreference.objects.bulk_create(
+        CourseDayPreference(course=course, day=day) for course in courses for day in rnd.sample(DAYS, 2)
+    )
+    CourseTeacherPreference.objects.bulk_create(
+        CourseTeacherPreference(course=course, teacher=teacher)
+        for course in courses for teacher in rnd.sample(teachers, min(3, len(teachers)))
+    )
+    offerings = CourseOffering.objects.bulk_create(
+        CourseOffering(course=course, academic_period=period, capacity=rnd.choice([30, 35, 40])) for course in courses
+    )
+    CourseGroup.objects.bulk_create(
+        CourseGroup(course_offering=offering, code=str(g + 1)) for offering in offerings for g in range(size.groups)
+    )
+    return period
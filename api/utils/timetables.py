@@ -0,0 +1,247 @@
+"""Horarios materializados por docente, aula y ciclo (``TimetableDocument``).
+
+Cada documento guarda las sesiones ya serializadas (mismo formato que
+``/api/timetable/``) de una clave (periodo, tipo, id), así que leer el horario
+de un docente es una sola consulta por índice único. Se reconstruyen en bloque
+tras cada corrida del scheduler (``rebuild_period``) y de forma puntual cuando se
+edita una sesión: las señales de ``Schedule`` solo anotan la fila (sin consultas)
+y los documentos afectados se refrescan una vez al confirmar la transacción
+(``flush_pending``). Los caminos en bloque (scheduler, reconciliación de grupos)
+trabajan dentro de ``manual_refresh`` y reconstruyen ellos mismos.
+"""
+import threading
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+
+from api.models import (
+    AcademicPeriod, Course, CourseGroup, CourseOffering, Schedule, ScheduleChangeRequest, TimetableDocument
+)
+from api.serializers.TimetableSerializer import TimetableSerializer
+
+# tipo de documento -> campo de Schedule que lo identifica
+DOCUMENT_FIELDS = {
+    'teacher': 'teacher_id',
+    'room': 'room_id',
+    'cycle': 'course__cycle',
+}
+
+
+def _schedules(period_id):
+    return Schedule.objects.select_related(
+        'teacher__person', 'room__site', 'group__course_offering', 'course'
+    ).filter(
+        group__course_offering__academic_period_id=period_id
+    ).order_by('day_of_week', 'start_time', 'id')
+
+
+def _documents(period_id, schedules, wanted=None):
+    """Documentos nuevos (sin guardar) para las sesiones dadas; ``wanted`` limita las claves."""
+    sessions = defaultdict(list)
+    for schedule in schedules:
+        for kind, key in (('teacher', schedule.teacher_id), ('room', schedule.room_id), ('cycle', schedule.course.cycle)):
+            if key is not None and (wanted is None or (kind, key) in wanted):
+                sessions[kind, key].append(schedule)
+    return [
+        TimetableDocument(
+            academic_period_id=period_id, kind=kind, key=key,
+            data=TimetableSerializer(items, many=True).data,
+        )
+        for (kind, key), items in sessions.items()
+    ]
+
+
+def rebuild_period(period_id):
+    """Reemplaza todos los documentos del periodo: una lectura, un borrado y un bulk_create."""
+    documents = _documents(period_id, _schedules(period_id))
+    TimetableDocument.objects.filter(academic_period_id=period_id).delete()
+    return TimetableDocument.objects.bulk_create(documents)
+
+
+def refresh_documents(period_id, keys):
+    """Reconstruye solo los documentos ``keys`` = {(tipo, id)} del periodo."""
+    if not keys:
+        return []
+    by_schedule = Q()
+    by_document = Q()
+    for kind, key in keys:
+        by_schedule |= Q(**{DOCUMENT_FIELDS[kind]: key})
+        by_document |= Q(kind=kind, key=key)
+    documents = _documents(period_id, _schedules(period_id).filter(by_schedule), wanted=keys)
+    TimetableDocument.objects.filter(by_document, academic_period_id=period_id).delete()
+    return TimetableDocument.objects.bulk_create(documents)
+
+
+def schedule_document_keys(schedule_id):
+    """Claves {(periodo, tipo, id)} de la sesión guardada ``schedule_id`` (una consulta)."""
+    row = Schedule.objects.filter(pk=schedule_id).values_list(
+        'group__course_offering__academic_period_id', 'teacher_id', 'room_id', 'course__cycle'
+    ).first()
+    if row is None:
+        return set()
+    return _keys(*row)
+
+
+def _keys(period_id, teacher_id, room_id, cycle):
+    keys = {(period_id, 'cycle', cycle)}
+    if teacher_id is not None:
+        keys.add((period_id, 'teacher', teacher_id))
+    if room_id is not None:
+        keys.add((period_id, 'room', room_id))
+    return keys
+
+
+def groups_document_keys(group_ids):
+    """Claves {(periodo, tipo, id)} de todas las sesiones de ``group_ids`` (una consulta)."""
+    rows = Schedule.objects.filter(group_id__in=group_ids).values_list(
+        'group__course_offering__academic_period_id', 'teacher_id', 'room_id', 'course__cycle'
+    ).distinct()
+    keys = set()
+    for row in rows:
+        keys |= _keys(*row)
+    return keys
+
+
+def refresh_keys(keys):
+    """Reconstruye los documentos ``keys`` = {(periodo, tipo, id)}, un lote por periodo."""
+    by_period = defaultdict(set)
+    for period_id, kind, key in keys:
+        by_period[period_id].add((kind, key))
+    for period_id, period_keys in by_period.items():
+        refresh_documents(period_id, period_keys)
+
+
+# Sesiones tocadas por las señales en la transacción en curso (por hilo)
+_state = threading.local()
+
+
+@contextmanager
+def manual_refresh():
+    """Las señales de Schedule no anotan nada dentro del bloque: quien borra o inserta
+    en bloque llama a ``rebuild_period``/``refresh_documents`` por su cuenta."""
+    previous = getattr(_state, 'manual', False)
+    _state.manual = True
+    try:
+        yield
+    finally:
+        _state.manual = previous
+
+
+def delete_schedules(schedules):
+    """Borra las sesiones del queryset con dos sentencias, sin cargar filas ni disparar señales.
+
+    Las solicitudes de cambio que apuntan a ellas quedan sin sesión (el SET_NULL del modelo)
+    con un UPDATE filtrado por subconsulta, y luego un único DELETE. Quien llama refresca
+    los documentos afectados (``rebuild_period``/``refresh_keys``). Devuelve las filas borradas.
+    """
+    ScheduleChangeRequest.objects.filter(schedule__in=schedules.values('pk')).update(schedule=None)
+    # _raw_delete: el borrado de QuerySet recolectaría y cargaría cada fila por las señales de Schedule
+    return schedules._raw_delete(schedules.db)
+
+
+def queue_schedule(schedule, old_keys=(), origin=None, using=DEFAULT_DB_ALIAS):
+    """Anota ``schedule`` (guardada o borrada) para refrescar sus documentos al confirmar.
+
+    No hace consultas: el periodo y el ciclo se resuelven en ``flush_pending`` para
+    todas las sesiones anotadas en la transacción, una sola vez. ``origin`` es el objeto
+    cuyo borrado arrastró a la sesión (señal ``post_delete``): si es el periodo, sus
+    documentos ya se borraron en la misma cascada; si es una oferta o un grupo, la
+    oferta sirve para ubicar el periodo aunque el grupo ya no exista.
+    """
+    if getattr(_state, 'manual', False) or isinstance(origin, AcademicPeriod):
+        return
+    if isinstance(origin, CourseOffering):
+        offering_id = origin.pk
+    elif isinstance(origin, CourseGroup):
+        offering_id = origin.course_offering_id
+    else:
+        offering_id = None
+    pending = _pending(using)
+    register = pending is None
+    if register:
+        pending = {'rows': set(), 'keys': set()}
+    pending['rows'].add((schedule.group_id, offering_id, schedule.teacher_id, schedule.room_id, schedule.course_id))
+    pending['keys'].update(old_keys)
+    if register:
+        def flush():
+            flush_pending(pending, using)
+
+        # La marca de la conexión es el propio callback, referenciado débilmente: si la
+        # transacción (o el savepoint que lo registró) se revierte, Django lo descarta y
+        # la marca muere con él. Sin transacción en curso on_commit lo ejecuta en el acto
+        _registered(using)[:] = [pending, weakref.ref(flush)]
+        transaction.on_commit(flush, using=using)
+
+
+def _registered(using):
+    """[pending, ref al callback] registrado en la conexión ``using`` de este hilo."""
+    if not hasattr(_state, 'registered'):
+        _state.registered = {}
+    return _state.registered.setdefault(using, [None, None])
+
+
+def _pending(using):
+    """Anotaciones de la transacción en curso de ``using``, o None si no hay un flush vivo."""
+    pending, flush = _registered(using)
+    if pending is None or flush() is None:
+        return None
+    return pending
+
+
+def flush_pending(pending, using=DEFAULT_DB_ALIAS):
+    """Refresca una sola vez los documentos de las sesiones anotadas (consultas por conjunto)."""
+    registered = _registered(using)
+    if registered[0] is pending:
+        registered[:] = [None, None]
+    rows, keys = pending['rows'], set(pending['keys'])
+    if not rows:
+        return
+    groups = {
+        group_id: (period_id, cycle)
+        for group_id, period_id, cycle in CourseGroup.objects.filter(
+            pk__in={row[0] for row in rows}
+        ).values_list('pk', 'course_offering__academic_period_id', 'course_offering__course__cycle')
+    }
+    offering_ids = {row[1] for row in rows if row[1] is not None and row[0] not in groups}
+    offerings = {}
+    if offering_ids:
+        offerings = {
+            offering_id: (period_id, cycle)
+            for offering_id, period_id, cycle in CourseOffering.objects.filter(
+                pk__in=offering_ids
+            ).values_list('pk', 'academic_period_id', 'course__cycle')
+        }
+    orphans = []
+    for group_id, offering_id, teacher_id, room_id, course_id in rows:
+        # Por el grupo; si se borró, por la oferta que originó el borrado
+        place = groups.get(group_id) or offerings.get(offering_id)
+        if place is not None:
+            keys |= _keys(place[0], teacher_id, room_id, place[1])
+        else:
+            orphans.append((teacher_id, room_id, course_id))
+    if orphans:
+        keys |= _orphan_keys(orphans)
+    refresh_keys(keys)
+
+
+def _orphan_keys(orphans):
+    """Documentos que podían contener sesiones sin grupo ni oferta que las ubique (borrado
+    de un curso o por queryset): los de sus docentes, aulas y ciclos en cualquier periodo."""
+    teacher_ids = {teacher_id for teacher_id, _, _ in orphans if teacher_id is not None}
+    room_ids = {room_id for _, room_id, _ in orphans if room_id is not None}
+    course_ids = {course_id for _, _, course_id in orphans}
+    cycles = dict(Course.objects.filter(pk__in=course_ids).values_list('pk', 'cycle'))
+    documents = Q(kind='teacher', key__in=teacher_ids) | Q(kind='room', key__in=room_ids) | Q(
+        kind='cycle', key__in=set(cycles.values())
+    )
+    keys = set(TimetableDocument.objects.filter(documents).values_list('academic_period_id', 'kind', 'key'))
+    if len(cycles) < len(course_ids):
+        # Curso borrado: no se sabe su ciclo, se refrescan los ciclos de los periodos afectados
+        periods = {period_id for period_id, _, _ in keys}
+        keys |= set(TimetableDocument.objects.filter(
+            kind='cycle', academic_period_id__in=periods
+        ).values_list('academic_period_id', 'kind', 'key'))
+    return keys
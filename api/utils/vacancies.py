@@ -0,0 +1,100 @@
+"""Espacios libres de aulas tras generar un horario, en forma compacta.
+
+En vez de una fila por aula × día × hora, cada aula guarda por día la lista de
+intervalos libres ``[inicio, fin)`` (en horas) y los datos del aula van una sola
+vez en una tabla aparte. ``VacancyMap.filter`` y ``page`` recorren esos
+intervalos bajo demanda, filtrando por sede, tipo, día o capacidad.
+"""
+
+
+def free_intervals(mask, start_h, end_h):
+    """Intervalos [inicio, fin) de horas libres (bit en 0) de ``mask`` dentro de [start_h, end_h)."""
+    intervals = []
+    h = start_h
+    while h < end_h:
+        if mask >> h & 1:
+            h += 1
+            continue
+        start = h
+        while h < end_h and not mask >> h & 1:
+            h += 1
+        intervals.append((start, h))
+    return intervals
+
+
+class VacancyMap:
+
+    def __init__(self, rooms, free):
+        self.rooms = rooms  # {room_id: {'name', 'room_type', 'capacity', 'site_id', 'site_name'}}
+        self.free = free    # {room_id: {dia: [(inicio, fin), ...]}}
+
+    @classmethod
+    def from_occupancy(cls, rooms, room_occupied, days, time_slots):
+        """Construye el mapa desde la ocupación en memoria (``OccupancyGrid`` de aulas)."""
+        start_h, end_h = time_slots[0], time_slots[-1] + 1
+        table = {}
+        free = {}
+        for room in rooms:
+            table[room.id] = {
+                'name': room.name, 'room_type': room.room_type, 'capacity': room.capacity,
+                'site_id': room.site_id, 'site_name': room.site_name,
+            }
+            by_day = {}
+            for day in days:
+                intervals = free_intervals(room_occupied.mask(room.id, day), start_h, end_h)
+                if intervals:
+                    by_day[day] = intervals
+            free[room.id] = by_day
+        return cls(table, free)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverso de ``to_dict`` (las claves JSON llegan como texto)."""
+        rooms = {int(room_id): info for room_id, info in data.get('rooms', {}).items()}
+        free = {
+            int(room_id): {int(day): [tuple(i) for i in intervals] for day, intervals in by_day.items()}
+            for room_id, by_day in data.get('free', {}).items()
+        }
+        return cls(rooms, free)
+
+    def to_dict(self):
+        return {
+            'rooms': {str(room_id): info for room_id, info in self.rooms.items()},
+            'free': {
+                str(room_id): {str(day): [list(i) for i in intervals] for day, intervals in by_day.items()}
+                for room_id, by_day in self.free.items() if by_day
+            },
+        }
+
+    def filter(self, site=None, room_type=None, day=None, min_capacity=None):
+        """Itera (room_id, info, dia, inicio, fin) por aula y día. ``site`` es el id o el nombre de la sede."""
+        for room_id in sorted(self.free):
+            info = self.rooms[room_id]
+            if site is not None and str(site) not in (str(info['site_id']), info['site_name']):
+                continue
+            if room_type is not None and info['room_type'] != room_type:
+                continue
+            if min_capacity is not None and info['capacity'] < min_capacity:
+                continue
+            by_day = self.free[room_id]
+            for d in sorted(by_day) if day is None else [day]:
+                for start, end in by_day.get(d, ()):
+                    yield room_id, info, d, start, end
+
+    def page(self, page=1, page_size=50, **filters):
+        """Una página de intervalos libres con el total de resultados."""
+        offset = (page - 1) * page_size
+        results = []
+        count = 0
+        for room_id, info, day, start, end in self.filter(**filters):
+            if offset <= count < offset + page_size:
+                results.append({
+                    'room_id': room_id, 'room': info['name'], 'room_type': info['room_type'],
+                    'capacity': info['capacity'], 'site': info['site_name'],
+                    'day': day, 'start': start, 'end': end,
+                })
+            count += 1
+        return {'count': count, 'page': page, 'page_size': page_size, 'results': results}
+
+    def total_hours(self):
+        return sum(end - start for by_day in self.free.values() for intervals in by_day.values() for start, end in intervals)
@@ -7,8 +7,8 @@ class CourseGroupListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = CourseGroupSerializer
 
     def get_queryset(self):
-        queryset = CourseGroup.objects.all().select_related('course')
+        queryset = CourseGroup.objects.all().select_related('course_offering__course')
         course_id = self.request.query_params.get('course')
         if course_id is not None:
-            queryset = queryset.filter(course_id=course_id)
+            queryset = queryset.filter(course_offering__course_id=course_id)
         return queryset
@@ -0,0 +1,24 @@
+from rest_framework import viewsets, status
+from rest_framework.response import Response
+from rest_framework.decorators import action
+from api.serializers.CourseOfferingBulkOpenSerializer import CourseOfferingBulkOpenSerializer
+from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
+from api.utils.offerings import open_offerings
+
+class CourseOfferingBulkOpenViewSet(viewsets.ViewSet):
+    """
+    Endpoint para abrir varios cursos de una vez: cada elemento de 'courses' es
+    {course_id, offering_type, num_groups}. Las ofertas que ya existen se reutilizan y,
+    si se indica num_groups, sus grupos se ajustan a ese número.
+    """
+    @action(detail=False, methods=['post'])
+    def open_courses(self, request):
+        serializer = CourseOfferingBulkOpenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = [
+            (item['course_id'], item['offering_type'], item['num_groups'])
+            for item in serializer.validated_data['courses']
+        ]
+        offerings, created = open_offerings(serializer.validated_data['academic_period_id'], items)
+        data = CourseOfferingListSerializer(offerings, many=True).data
+        return Response({'added': data, 'created': len(created)}, status=status.HTTP_201_CREATED)
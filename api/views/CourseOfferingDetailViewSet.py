@@ -3,5 +3,5 @@ from api.models import CourseOffering
 from api.serializers.CourseOfferingDetailSerializer import CourseOfferingDetailSerializer
 
 class CourseOfferingDetailViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
-    queryset = CourseOffering.objects.all().select_related('course', 'academic_period')
+    queryset = CourseOffering.objects.all().select_related('course', 'academic_period').prefetch_related('groups')
     serializer_class = CourseOfferingDetailSerializer
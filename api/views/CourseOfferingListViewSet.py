@@ -1,7 +1,8 @@
+from django.db.models import Count
 from rest_framework import viewsets, mixins
 from api.models import CourseOffering
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
 
 class CourseOfferingListViewSet(mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
-    queryset = CourseOffering.objects.all().select_related('course', 'academic_period')
+    queryset = CourseOffering.objects.all().select_related('course', 'academic_period').annotate(num_groups=Count('groups'))
     serializer_class = CourseOfferingListSerializer
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.models import Course, CourseOffering, AcademicPeriod
+from api.models import AcademicPeriod
 from api.serializers.CourseOfferingAddSerializer import CourseOfferingAddSerializer
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
+from api.utils.offerings import open_offerings
 from django.db import transaction
 
 class CourseOfferingManualAddViewSet(viewsets.ViewSet):
@@ -27,11 +28,7 @@ class CourseOfferingManualAddViewSet(viewsets.ViewSet):
             return Response({'detail': 'Periodo inválido.'}, status=400)
 
         # Solo agregar cursos que no tengan offering manual de este tipo en este periodo
-        added = []
-        for cid in course_ids:
-            exists = CourseOffering.objects.filter(course_id=cid, academic_period=period, offering_type=offering_type).exists()
-            if not exists:
-                co = CourseOffering.objects.create(course_id=cid, academic_period=period, offering_type=offering_type)
-                added.append(co)
+        offerings, created = open_offerings(period, [(cid, offering_type, None) for cid in course_ids])
+        added = [co for co in offerings if co.id in created]
         data = CourseOfferingListSerializer(added, many=True).data
         return Response({'added': data}, status=status.HTTP_201_CREATED)
@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.models import Course, CourseOffering, AcademicPeriod
+from api.models import AcademicPeriod
 from api.serializers.CourseOfferingAddSerializer import CourseOfferingAddSerializer
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
+from api.utils.offerings import open_offerings
 from django.db import transaction
 
 class CourseOfferingManualNormalViewSet(viewsets.ViewSet):
@@ -18,11 +19,7 @@ class CourseOfferingManualNormalViewSet(viewsets.ViewSet):
         course_ids = serializer.validated_data['course_ids']
         period_id = serializer.validated_data['academic_period_id']
         period = AcademicPeriod.objects.get(id=period_id)
-        added = []
-        for cid in course_ids:
-            exists = CourseOffering.objects.filter(course_id=cid, academic_period=period, offering_type='normal').exists()
-            if not exists:
-                co = CourseOffering.objects.create(course_id=cid, academic_period=period, offering_type='normal')
-                added.append(co)
+        offerings, created = open_offerings(period, [(cid, 'normal', None) for cid in course_ids])
+        added = [co for co in offerings if co.id in created]
         data = CourseOfferingListSerializer(added, many=True).data
         return Response({'added': data}, status=status.HTTP_201_CREATED)
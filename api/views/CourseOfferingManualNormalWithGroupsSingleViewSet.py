@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.models import Course, CourseOffering, AcademicPeriod, CourseGroupConfig
+from api.models import AcademicPeriod
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
 from api.serializers.CourseOfferingAddNormalWithGroupsSerializer import CourseOfferingAddNormalWithGroupsSerializer
+from api.utils.offerings import open_offerings
 from django.db import transaction
 
 class CourseOfferingManualNormalWithGroupsSingleViewSet(viewsets.ViewSet):
@@ -22,12 +23,6 @@ class CourseOfferingManualNormalWithGroupsSingleViewSet(viewsets.ViewSet):
             period = AcademicPeriod.objects.get(id=period_id)
         except AcademicPeriod.DoesNotExist:
             return Response({'detail': 'Periodo académico no encontrado.'}, status=404)
-        co, created = CourseOffering.objects.get_or_create(
-            course_id=course_id, academic_period=period, offering_type='normal'
-        )
-        CourseGroupConfig.objects.update_or_create(
-            course_offering=co,
-            defaults={'num_groups': num_groups}
-        )
+        (co,), _ = open_offerings(period, [(course_id, 'normal', num_groups)])
         data = CourseOfferingListSerializer(co).data
         return Response({'added': [data]}, status=status.HTTP_201_CREATED)
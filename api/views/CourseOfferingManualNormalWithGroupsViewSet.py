@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.models import Course, CourseOffering, AcademicPeriod, CourseGroupConfig
+from api.models import AcademicPeriod
 from api.serializers.CourseOfferingAddSerializer import CourseOfferingAddSerializer
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
+from api.utils.offerings import open_offerings
 from django.db import transaction
 
 class CourseOfferingManualNormalWithGroupsViewSet(viewsets.ViewSet):
@@ -21,19 +22,7 @@ class CourseOfferingManualNormalWithGroupsViewSet(viewsets.ViewSet):
         if not num_groups or not isinstance(num_groups, int) or num_groups < 1:
             return Response({'detail': 'num_groups debe ser un entero positivo.'}, status=400)
         period = AcademicPeriod.objects.get(id=period_id)
-        added = []
-        for cid in course_ids:
-            exists = CourseOffering.objects.filter(course_id=cid, academic_period=period, offering_type='normal').exists()
-            if not exists:
-                co = CourseOffering.objects.create(course_id=cid, academic_period=period, offering_type='normal')
-                added.append(co)
-            else:
-                co = CourseOffering.objects.get(course_id=cid, academic_period=period, offering_type='normal')
-                added.append(co)
-            # Establecer el número de grupos
-            CourseGroupConfig.objects.update_or_create(
-                course_id=cid,
-                defaults={'num_groups': num_groups}
-            )
+        # Crear las ofertas que falten y establecer el número de grupos, en bloque
+        added, _ = open_offerings(period, [(cid, 'normal', num_groups) for cid in course_ids])
         data = CourseOfferingListSerializer(added, many=True).data
         return Response({'added': data}, status=status.HTTP_201_CREATED)
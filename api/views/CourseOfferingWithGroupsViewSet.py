@@ -1,9 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from api.models import Course, CourseOffering, AcademicPeriod, CourseGroupConfig
+from api.models import AcademicPeriod
 from api.serializers.CourseOfferingAddSerializer import CourseOfferingAddSerializer
 from api.serializers.CourseOfferingListSerializer import CourseOfferingListSerializer
+from api.utils.offerings import open_offerings
 from django.db import transaction
 
 class CourseOfferingWithGroupsViewSet(viewsets.ViewSet):
@@ -29,16 +30,7 @@ class CourseOfferingWithGroupsViewSet(viewsets.ViewSet):
         else:
             return Response({'detail': 'Periodo inválido.'}, status=400)
 
-        added = []
-        for cid in course_ids:
-            co, created = CourseOffering.objects.get_or_create(
-                course_id=cid, academic_period=period, offering_type=offering_type
-            )
-            # Establecer el número de grupos
-            CourseGroupConfig.objects.update_or_create(
-                course_offering=co,
-                defaults={'num_groups': num_groups}
-            )
-            added.append(co)
+        # Crear las ofertas que falten y establecer el número de grupos, en bloque
+        added, _ = open_offerings(period, [(cid, offering_type, num_groups) for cid in course_ids])
         data = CourseOfferingListSerializer(added, many=True).data
         return Response({'added': data}, status=status.HTTP_201_CREATED)
@@ -1,6 +1,8 @@
 from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from api.serializers.PlanImportSerializer import PlanImportSerializer
+from api.serializers.PlanImportSerializer import PlanImportSerializer, PlanFileImportSerializer
 
 
 class PlanImportViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
@@ -15,6 +17,9 @@ class PlanImportViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
       "end_year": null,
       "courses": [ { ... }, { ... } ]
     }
+
+    POST /file/ (multipart): los mismos campos del plan y ``file`` con la
+    plantilla CSV o XLSX (docs/plan_import_template.csv).
     """
     serializer_class = PlanImportSerializer
 
@@ -22,8 +27,15 @@ class PlanImportViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
         data = request.data
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
-        result = serializer.save()
+        return self._created(serializer.save())
+
+    @action(detail=False, methods=['post'], url_path='file', parser_classes=[MultiPartParser, FormParser])
+    def file(self, request):
+        serializer = PlanFileImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self._created(serializer.save())
 
+    def _created(self, result):
         plan = result.get('plan')
         created = result.get('created_courses', [])
         errors = result.get('errors', [])
@@ -22,7 +22,7 @@ class CourseDayPreferenceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='complete')
     def complete(self, request):
-        preferences = self.get_queryset().order_by('id')
+        preferences = self.get_queryset().select_related('course').order_by('id')
         page = self.paginate_queryset(preferences)
         result = []
         for pref in page:
@@ -48,7 +48,7 @@ class CourseTeacherPreferenceViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='complete/(?P<id_teacher>[^/.]+)')
     def complete(self, request, id_teacher=None):
-        preferences = self.get_queryset().order_by('id')
+        preferences = self.get_queryset().select_related('course', 'teacher__person').order_by('id')
         if id_teacher is not None:
             preferences = preferences.filter(teacher_id=id_teacher)
         page = self.paginate_queryset(preferences)
@@ -60,7 +60,6 @@ class CourseTeacherPreferenceViewSet(viewsets.ModelViewSet):
                 'id': pref.id,
                 'course': course_data,
                 'teacher': teacher_data,
-                'notes': pref.notes
             })
         return self.get_paginated_response(result)
 
@@ -0,0 +1,21 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from api.middleware import request_stats
+
+
+class RequestStatsViewSet(viewsets.ViewSet):
+    """Consultas y latencia acumuladas por endpoint (QueryTimingMiddleware); solo administradores.
+
+    Las estadísticas son del proceso que atiende el request: con varios workers cada uno lleva las suyas.
+    """
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        return Response(request_stats.snapshot())
+
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        request_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
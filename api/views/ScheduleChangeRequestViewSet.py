@@ -0,0 +1,31 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from api.models import ScheduleChangeRequest
+from api.serializers.ScheduleChangeRequestSerializer import ScheduleChangeRequestSerializer
+from api.utils.change_requests import ConflictChecker, evaluate_pending
+
+class ScheduleChangeRequestViewSet(viewsets.ModelViewSet):
+    """Solicitudes de cambio de horario y evaluación de sus cruces (docente, aula, ciclo)."""
+    queryset = ScheduleChangeRequest.objects.all().order_by('-created_at')
+    serializer_class = ScheduleChangeRequestSerializer
+    filterset_fields = ['request_type', 'status', 'requested_by', 'schedule']
+
+    @action(detail=True, methods=['get'])
+    def conflicts(self, request, pk=None):
+        change_request = self.get_object()
+        period_id = ScheduleChangeRequest.objects.filter(pk=change_request.pk).values_list(
+            'schedule__group__course_offering__academic_period_id', flat=True
+        ).first()
+        if period_id is None:
+            return Response({'detail': 'La solicitud no tiene una sesión asociada.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ConflictChecker(period_id).evaluate(change_request))
+
+    @action(detail=False, methods=['get'])
+    def evaluate(self, request):
+        """Evalúa en una sola pasada todas las solicitudes pendientes (opcional: ?period=<id>)."""
+        period = request.query_params.get('period')
+        if period is not None and not period.isdigit():
+            return Response({'detail': 'Periodo inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+        results = evaluate_pending(int(period) if period else None)
+        return Response({'count': len(results), 'results': results})
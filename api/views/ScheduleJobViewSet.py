@@ -0,0 +1,52 @@
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from api.models import ScheduleJob
+from api.serializers.ScheduleJobSerializer import ScheduleJobSerializer
+from api.utils.jobs import cancel_job
+from api.utils.vacancies import VacancyMap
+
+class ScheduleJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Encola generaciones de horario (las ejecuta procesar_trabajos_horario) y expone su progreso."""
+    queryset = ScheduleJob.objects.select_related('academic_period').defer('report')
+    serializer_class = ScheduleJobSerializer
+    filterset_fields = ['academic_period', 'status']
+
+    def perform_create(self, serializer):
+        user = self.request.user if self.request.user.is_authenticated else None
+        serializer.save(requested_by=user)
+
+    @action(detail=True, methods=['get'])
+    def report(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'completado':
+            return Response({'detail': 'El trabajo aún no tiene reporte.', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        return Response(ScheduleJob.objects.values_list('report', flat=True).get(pk=job.pk))
+
+    @action(detail=True, methods=['get'])
+    def vacancies(self, request, pk=None):
+        """Intervalos libres de aulas del reporte, paginados y filtrables por site, room_type, day y min_capacity."""
+        job = self.get_object()
+        if job.status != 'completado':
+            return Response({'detail': 'El trabajo aún no tiene reporte.', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        data = ScheduleJob.objects.values_list('report__vacant_slots', flat=True).get(pk=job.pk) or {}
+        params = request.query_params
+        try:
+            page = max(int(params.get('page', 1)), 1)
+            page_size = min(max(int(params.get('page_size', 50)), 1), 1000)
+            day = int(params['day']) if 'day' in params else None
+            min_capacity = int(params['min_capacity']) if 'min_capacity' in params else None
+        except ValueError:
+            return Response({'detail': 'Parámetros numéricos inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(VacancyMap.from_dict(data).page(
+            page=page, page_size=page_size, site=params.get('site'), room_type=params.get('room_type'),
+            day=day, min_capacity=min_capacity,
+        ))
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        job = self.get_object()
+        if job.status not in ('pendiente', 'en_proceso'):
+            return Response({'detail': 'El trabajo ya terminó.', 'status': job.status}, status=status.HTTP_409_CONFLICT)
+        job = cancel_job(job)
+        return Response(self.get_serializer(job).data)
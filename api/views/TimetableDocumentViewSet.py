@@ -0,0 +1,20 @@
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from api.models import TimetableDocument
+
+
+class TimetableDocumentViewSet(viewsets.ViewSet):
+    """Horario materializado de un docente, aula o ciclo: una sola consulta por índice único."""
+
+    @action(detail=False, methods=['get'], url_path=r'(?P<period>\d+)/(?P<kind>teacher|room|cycle)/(?P<key>\d+)')
+    def document(self, request, period=None, kind=None, key=None):
+        row = TimetableDocument.objects.filter(
+            academic_period_id=period, kind=kind, key=key
+        ).values_list('data', 'updated_at').first()
+        # Sin documento: la entidad no tiene sesiones en el periodo
+        data, updated_at = row if row is not None else ([], None)
+        return Response({
+            'period': int(period), 'kind': kind, 'key': int(key),
+            'updated_at': updated_at, 'sessions': data,
+        })
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+
+from django.http import FileResponse, StreamingHttpResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from api.models import AcademicPeriod, Schedule
+from api.serializers.TimetableSerializer import TimetableSerializer
+from api.utils import exports
+
+# Filtros por query param -> campo del queryset
+TIMETABLE_FILTERS = {
+    'period': 'group__course_offering__academic_period_id',
+    'cycle': 'course__cycle',
+    'teacher': 'teacher_id',
+    'room': 'room_id',
+    'site': 'room__site_id',
+    'day': 'day_of_week',
+    'group': 'group_id',
+    'course': 'course_id',
+}
+
+# Agrupaciones de /grouped/: campo clave y cómo rotular cada grupo
+TIMETABLE_GROUPINGS = {
+    'teacher': ('teacher_id', lambda s: f"{s.teacher.person.first_name} {s.teacher.person.last_name}" if s.teacher else None),
+    'room': ('room_id', lambda s: s.room.name if s.room else None),
+    'site': ('room__site_id', lambda s: s.room.site.name if s.room else None),
+    'cycle': ('course__cycle', lambda s: f"Ciclo {s.course.cycle}"),
+    'group': ('group_id', lambda s: f"{s.course.code} - G{s.group.code}"),
+}
+
+
+class TimetableViewSet(viewsets.ReadOnlyModelViewSet):
+    """Horario generado, de solo lectura. Todas las relaciones que usa el serializer
+    vienen en la misma consulta (select_related), sin consultas por fila."""
+    serializer_class = TimetableSerializer
+
+    def get_queryset(self):
+        queryset = Schedule.objects.select_related(
+            'teacher__person', 'room__site', 'group__course_offering', 'course'
+        ).order_by('day_of_week', 'start_time', 'id')
+        params = self.request.query_params
+        # Todos los filtros son ids o números: un valor no entero es 400, no un error de la BD
+        filters = {field: _int_param(params, name) for name, field in TIMETABLE_FILTERS.items() if params.get(name)}
+        return queryset.filter(**filters)
+
+    @action(detail=False, methods=['get'])
+    def grouped(self, request):
+        """Sesiones agrupadas por entidad: ?by=teacher|room|site|cycle|group (más los filtros de la lista)."""
+        by = request.query_params.get('by', 'teacher')
+        if by not in TIMETABLE_GROUPINGS:
+            return Response(
+                {'detail': f"'by' debe ser uno de: {', '.join(TIMETABLE_GROUPINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        field, label = TIMETABLE_GROUPINGS[by]
+        queryset = self.get_queryset().order_by(field, 'day_of_week', 'start_time', 'id')
+        groups = OrderedDict()
+        for schedule in queryset:
+            key = _resolve(schedule, field)
+            entry = groups.get(key)
+            if entry is None:
+                entry = groups[key] = {'key': key, 'label': label(schedule), 'sessions': []}
+            entry['sessions'].append(schedule)
+        for entry in groups.values():
+            entry['sessions'] = TimetableSerializer(entry['sessions'], many=True).data
+        return Response({'by': by, 'count': len(groups), 'results': list(groups.values())})
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Descarga el horario de un periodo: ?period=&by=cycle|teacher|room&output=xlsx|csv.
+
+        En XLSX hay una hoja por ciclo, docente o aula y una de grupos no asignados.
+        """
+        period, output, error = _export_params(request)
+        if error:
+            return error
+        by = request.query_params.get('by', 'cycle')
+        if by not in exports.SHEET_KEYS:
+            return Response(
+                {'detail': f"'by' debe ser uno de: {', '.join(exports.SHEET_KEYS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filename = f"horario_{period}_{by}.{output}"
+        if output == 'csv':
+            return _csv_response(exports.timetable_csv(period, by), filename)
+        try:
+            xlsx = exports.timetable_xlsx_file(period, by)
+        except ImportError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return FileResponse(xlsx, as_attachment=True, filename=filename)
+
+    @action(detail=False, methods=['get'])
+    def unassigned(self, request):
+        """Descarga los grupos sin sesiones de un periodo: ?period=&output=csv|xlsx."""
+        period, output, error = _export_params(request)
+        if error:
+            return error
+        filename = f"no_asignados_{period}.{output}"
+        if output == 'csv':
+            return _csv_response(exports.unassigned_csv(period), filename)
+        try:
+            xlsx = exports.unassigned_xlsx_file(period)
+        except ImportError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return FileResponse(xlsx, as_attachment=True, filename=filename)
+
+
+def _int_param(params, name):
+    """Query param entero; si no lo es, ValidationError (400) con el nombre del parámetro."""
+    try:
+        value = int(params[name])
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Debe ser un número entero.'})
+    # Fuera de un bigint la BD falla al comparar (OverflowError/DataError)
+    if not -2 ** 63 <= value < 2 ** 63:
+        raise ValidationError({name: 'Debe ser un número entero.'})
+    return value
+
+
+def _export_params(request):
+    """(period, output, error_response) de las descargas; 'format' lo reserva DRF, por eso 'output'."""
+    params = request.query_params
+    output = params.get('output', 'xlsx')
+    if not params.get('period'):
+        return None, None, Response({'detail': "Indique 'period' (id del periodo)."}, status=status.HTTP_400_BAD_REQUEST)
+    period = _int_param(params, 'period')
+    if output not in ('xlsx', 'csv'):
+        return None, None, Response({'detail': "'output' debe ser xlsx o csv"}, status=status.HTTP_400_BAD_REQUEST)
+    if not AcademicPeriod.objects.filter(pk=period).exists():
+        return None, None, Response({'detail': 'Periodo no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+    return period, output, None
+
+
+def _csv_response(lines, filename):
+    response = StreamingHttpResponse(lines, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _resolve(obj, field):
+    """Valor de un lookup 'a__b' sobre el objeto ya cargado (sin consultas)."""
+    for part in field.split('__'):
+        if obj is None:
+            return None
+        obj = getattr(obj, part)
+    return obj
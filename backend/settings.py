@@ -91,6 +91,8 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    # Consultas, tiempo de BD y Server-Timing por request (va primero para medir toda la cadena)
+    'api.middleware.QueryTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -101,6 +103,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Requests que superen alguno de estos presupuestos se registran en el logger 'api.performance'
+REQUEST_QUERY_BUDGET = int(os.getenv("REQUEST_QUERY_BUDGET", 50))
+REQUEST_TIME_BUDGET_MS = int(os.getenv("REQUEST_TIME_BUDGET_MS", 500))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://localhost:5173",
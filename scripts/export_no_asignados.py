@@ -6,19 +6,21 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 import django
 django.setup()
 
+from api.models import AcademicPeriod
+from api.utils.exports import unassigned_csv
+
 
 if __name__ == "__main__":
-    resultado = .generate()
-    print("Resultado de la generación de horarios:")
-    print(resultado)
+    # Uso: python scripts/export_no_asignados.py [periodo_id] [salida.csv]
+    if len(sys.argv) > 1:
+        period = AcademicPeriod.objects.get(pk=int(sys.argv[1]))
+    else:
+        period = AcademicPeriod.objects.order_by('-start_schedule_creation').first()
+    if period is None:
+        sys.exit("No hay periodos académicos.")
 
-    # Guardar cursos/grupos no asignados y motivos en un txt
-    output_path = "no_asignados.txt"
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write("Cursos/Grupos NO asignados:\n")
-        for error in resultado.get("errors", []):
-            f.write(f"{error}\n")
-        f.write("\nMotivos detallados:\n")
-        for diag in resultado.get("diagnostics", []):
-            f.write(f"{diag}\n")
-    print(f"Resumen guardado en: {os.path.abspath(output_path)}")
+    # Grupos del horario guardado sin ninguna sesión, con el motivo del último trabajo
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "no_asignados.csv"
+    with open(output_path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(unassigned_csv(period.id))
+    print(f"Cursos/grupos no asignados de {period} guardados en: {os.path.abspath(output_path)}")
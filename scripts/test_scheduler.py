@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 
@@ -12,10 +13,28 @@ django.setup()
 from api.utils.scheduler import AlgorithmScheduler
 
 if __name__ == "__main__":
-    scheduler = AlgorithmScheduler()  # Usa el periodo actual automáticamente
-    resultado = scheduler.generate()
+    parser = argparse.ArgumentParser(description="Genera el horario del periodo actual")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para reproducir una corrida")
+    parser.add_argument("--starts", type=int, default=1, help="Número de pasadas con semillas distintas (multi-start)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool de multi-start")
+    parser.add_argument("--max-candidates", type=int, default=None, help="Tope de combinaciones evaluadas por grupo")
+    parser.add_argument("--improve-seconds", type=float, default=0, help="Segundos de búsqueda local tras el greedy (0 = sin mejora)")
+    parser.add_argument("--ordering", choices=["static", "dynamic"], default="static", help="Orden de grupos: por ciclo (static) o más restringido primero (dynamic)")
+    parser.add_argument("--incremental", action="store_true", help="Reprogramar solo los grupos afectados por cambios")
+    parser.add_argument("--profile", nargs="?", const="perfil_horario.json", default=None, metavar="RUTA", help="Medir tiempos por fase y contadores y guardarlos en JSON")
+    args = parser.parse_args()
+
+    scheduler = AlgorithmScheduler(seed=args.seed, max_candidates=args.max_candidates, ordering=args.ordering, profile=args.profile is not None)  # Usa el periodo actual automáticamente
+    if args.incremental:
+        resultado = scheduler.generate_incremental()
+    else:
+        resultado = scheduler.generate(starts=args.starts, workers=args.workers, improve_seconds=args.improve_seconds)
     print("Resultado de la generación de horarios:")
     print(resultado)
+    print(f"Semilla: {resultado['seed']} (usa --seed {resultado['seed']} para reproducirla)")
+    if args.profile:
+        scheduler.profiler.dump(args.profile)
+        print(f"Perfil guardado en: {os.path.abspath(args.profile)}")
 
     # Guardar cursos/grupos no asignados y motivos en un txt
     output_path = "no_asignados.txt"